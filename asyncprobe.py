@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+
+import ssl
+import time
+import asyncio
+import threading
+import contextlib
+from collections import Counter, OrderedDict
+from urllib.parse import urlparse, urljoin
+
+from reporter import TIMEOUT, USER_AGENT
+from ratelimit import get_limiter
+from liveness import get_liveness
+from dnsresolver import get_resolver
+import metrics
+
+# Upper bound on probes in flight on the loop at once (each one holds a socket).
+MAX_INFLIGHT = 2000
+MAX_REDIRECTS = 10
+HEADER_LIMIT = 1024 * 1024
+
+_ssl_ctx = None
+
+def _ssl_context():
+    global _ssl_ctx
+    if _ssl_ctx is None:
+        _ssl_ctx = ssl.create_default_context()
+    return _ssl_ctx
+
+# ================= HTTP/1.1 CLIENT =================
+
+def _split_url(url):
+    parsed = urlparse(url)
+    tls = parsed.scheme == "https"
+    host = parsed.hostname
+    port = parsed.port or (443 if tls else 80)
+    path = parsed.path or "/"
+    if parsed.query:
+        path += "?" + parsed.query
+    return host, port, tls, path, parsed.netloc
+
+def _parse_head(raw):
+    lines = raw.decode("latin-1").split("\r\n")
+    status = int(lines[0].split(" ", 2)[1])
+    headers = {}
+    for line in lines[1:]:
+        if not line or ":" not in line:
+            continue
+        k, v = line.split(":", 1)
+        k, v = k.strip(), v.strip()
+        # folded duplicates the same way requests does
+        headers[k] = f"{headers[k]}, {v}" if k in headers else v
+    return status, headers
+
+def _request_bytes(method, path, netloc, keep_alive=False):
+    return (
+        f"{method} {path} HTTP/1.1\r\n"
+        f"Host: {netloc}\r\n"
+        f"User-Agent: {USER_AGENT}\r\n"
+        "Accept: */*\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    ).encode("latin-1")
+
+async def _open(host, port, tls, timeout):
+    address = await get_resolver().address_async(host)
+    return await asyncio.wait_for(
+        asyncio.open_connection(
+            address, port,
+            ssl=_ssl_context() if tls else None,
+            server_hostname=host if tls else None,
+            limit=HEADER_LIMIT,
+        ),
+        timeout,
+    )
+
+async def _close(writer):
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except (OSError, ssl.SSLError):
+        # the peer dropped it first; the transport is closed either way
+        pass
+
+async def _skip(reader, n):
+    while n > 0:
+        chunk = await reader.read(min(n, 65536))
+        if not chunk:
+            raise asyncio.IncompleteReadError(b"", n)
+        metrics.add("bytes_in", len(chunk))
+        n -= len(chunk)
+
+async def _skip_chunked(reader):
+    while True:
+        line = await reader.readline()
+        metrics.add("bytes_in", len(line))
+        size = int(line.split(b";")[0].strip() or b"0", 16)
+        if size == 0:
+            # trailers until the blank line
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            return
+        await _skip(reader, size + 2)
+
+async def _read_response(reader, method, timeout):
+    # Reads one response and drains its body so the connection can carry the
+    # next one. Returns (status, headers, keep_alive).
+    raw = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout)
+    metrics.add("bytes_in", len(raw))
+    status, headers = _parse_head(raw)
+    lower = {k.lower(): v.lower() for k, v in headers.items()}
+    if raw.startswith(b"HTTP/1.0"):
+        keep = lower.get("connection") == "keep-alive"
+    else:
+        keep = lower.get("connection") != "close"
+
+    if method == "HEAD" or status in (204, 304) or 100 <= status < 200:
+        return status, headers, keep
+    if "chunked" in lower.get("transfer-encoding", ""):
+        await asyncio.wait_for(_skip_chunked(reader), timeout)
+    elif "content-length" in lower:
+        await asyncio.wait_for(_skip(reader, int(lower["content-length"])), timeout)
+    else:
+        # body is delimited by EOF, the socket is done after this response
+        keep = False
+    return status, headers, keep
+
+async def request_head(url, method="GET", timeout=TIMEOUT, pool=None):
+    # without a pool the socket is closed after the one response
+    return await _pooled_request(pool or ConnPool(pool_size=0), url, method, timeout)
+
+def _header(headers, name):
+    return next((v for k, v in headers.items() if k.lower() == name), None)
+
+def _redirect(url, status, headers):
+    location = _header(headers, "location")
+    if status in (301, 302, 303, 307, 308) and location:
+        return urljoin(url, location)
+    return None
+
+async def fetch_async(url, timeout=TIMEOUT, pool=None):
+    try:
+        for _ in range(MAX_REDIRECTS + 1):
+            status, headers = await request_head(url, timeout=timeout, pool=pool)
+            nxt = _redirect(url, status, headers)
+            if nxt:
+                url = nxt
+                continue
+            return {"status": status, "headers": headers}
+        return {"error": f"Exceeded {MAX_REDIRECTS} redirects."}
+    except Exception as e:
+        return {"error": str(e) or type(e).__name__}
+
+# ================= KEEP-ALIVE POOL =================
+
+# Idle keep-alive sockets kept per host, and sockets open per host at once.
+POOL_SIZE = 4
+PER_HOST = 4
+# Hosts with idle sockets kept; the least recently used one's are closed
+# past this, so a batch of one fetch per host does not hold a socket each.
+POOL_HOSTS = 32
+
+class _Conn:
+    def __init__(self, reader, writer, reused=False):
+        self.reader = reader
+        self.writer = writer
+        self.reused = reused
+        self.reusable = False
+
+class ConnPool:
+    def __init__(self, pool_size=POOL_SIZE, per_host=PER_HOST, max_hosts=POOL_HOSTS):
+        self.pool_size = pool_size
+        self.per_host = per_host
+        self.max_hosts = max_hosts
+        self.idle = OrderedDict()
+        self.limits = {}
+        self.active = Counter()
+        self.stats = {"opened": 0, "reused": 0, "requests": 0, "evicted": 0}
+
+    @contextlib.asynccontextmanager
+    async def connection(self, host, port, tls, timeout=TIMEOUT):
+        key = (host, port, tls)
+        sem = self.limits.setdefault(key, asyncio.Semaphore(self.per_host))
+        self.active[key] += 1
+        try:
+            async with sem:
+                conn = None
+                idle = self.idle.get(key)
+                while idle and conn is None:
+                    c = idle.pop()
+                    if c.reader.at_eof():
+                        await _close(c.writer)
+                        continue
+                    conn = c
+                    conn.reused = True
+                    self.stats["reused"] += 1
+                if not idle:
+                    self.idle.pop(key, None)
+                if conn is None:
+                    conn = _Conn(*await _open(host, port, tls, timeout))
+                    self.stats["opened"] += 1
+                    metrics.add("connections")
+
+                conn.reusable = False
+                try:
+                    yield conn
+                finally:
+                    idle = self.idle.get(key, [])
+                    if conn.reusable and len(idle) < self.pool_size:
+                        idle.append(conn)
+                        self.idle[key] = idle
+                        self.idle.move_to_end(key)
+                    else:
+                        await _close(conn.writer)
+                    await self._evict()
+        finally:
+            self.active[key] -= 1
+            if not self.active[key]:
+                del self.active[key]
+                if key not in self.idle:
+                    self.limits.pop(key, None)
+
+    async def _evict(self):
+        while len(self.idle) > self.max_hosts:
+            key, conns = self.idle.popitem(last=False)
+            self.stats["evicted"] += len(conns)
+            if key not in self.active:
+                self.limits.pop(key, None)
+            await asyncio.gather(*(_close(c.writer) for c in conns))
+
+    def snapshot(self):
+        total = self.stats["opened"] + self.stats["reused"]
+        return dict(self.stats, reuse_ratio=round(self.stats["reused"] / total, 3) if total else 0.0)
+
+    async def close(self):
+        idle = [c for conns in self.idle.values() for c in conns]
+        self.idle.clear()
+        for key in [k for k in self.limits if k not in self.active]:
+            del self.limits[key]
+        await asyncio.gather(*(_close(c.writer) for c in idle))
+
+async def _pooled_request(pool, url, method, timeout):
+    # Paced by the shared per-host limiter and timed by the liveness tracker,
+    # the same as a request through pool.HostPool.
+    host, port, tls, path, netloc = _split_url(url)
+    live = get_liveness()
+    timeout = live.tighten(host, timeout)
+    connect_timeout, read_timeout = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+    request = _request_bytes(method, path, netloc, keep_alive=True)
+    async with get_limiter().aslot(host) as slot:
+        for attempt in (0, 1):
+            async with pool.connection(host, port, tls, connect_timeout) as conn:
+                start = time.perf_counter()
+                try:
+                    conn.writer.write(request)
+                    await conn.writer.drain()
+                    metrics.add("bytes_out", len(request))
+                    status, headers, keep = await _read_response(conn.reader, method, read_timeout)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    # the server may have dropped an idle socket, retry once fresh
+                    if conn.reused and attempt == 0:
+                        metrics.add("retries")
+                        continue
+                    raise
+                except asyncio.TimeoutError:
+                    live.observe(host, time.perf_counter() - start, "response")
+                    raise
+                live.observe(host, time.perf_counter() - start, "response")
+                slot.status(status, _header(headers, "retry-after"))
+                conn.reusable = keep
+                pool.stats["requests"] += 1
+                return status, headers
+
+# ================= SHARED LOOP =================
+
+class AsyncHTTP:
+    # One event loop on a daemon thread, with one keep-alive pool, for the
+    # Pipeline's HTTP stage under --async-http. Stage workers hand fetches to
+    # the loop and move on, so in-flight requests cost a socket and a
+    # coroutine each, not a thread.
+    def __init__(self, inflight=MAX_INFLIGHT):
+        self.loop = asyncio.new_event_loop()
+        self.pool = ConnPool()
+        self.inflight = inflight
+        self.sem = None
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    async def fetch(self, url, timeout=TIMEOUT):
+        if self.sem is None:
+            self.sem = asyncio.Semaphore(self.inflight)
+        async with self.sem:
+            return await fetch_async(url, timeout, self.pool)
+
+    def submit(self, coro):
+        # concurrent.futures.Future for a coroutine run on the loop
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def snapshot(self):
+        return self.pool.snapshot()
+
+    def close(self):
+        # idle keep-alive sockets; the loop stays up for the next Pipeline
+        self.submit(self.pool.close()).result()
+
+_default = None
+_default_lock = threading.Lock()
+
+def get_async_http():
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = AsyncHTTP()
+        return _default
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# Journal append throughput with group commit versus one fsync per record.
+#
+#   python3 bench/bench_journal.py --records 50000 --threads 16
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from journal import Journal, replay
+
+STAGES = ("DNS", "Liveness", "HTTP", "TLS", "Directories")
+
+def record(i):
+    return {"status": 200, "headers": {"Server": "nginx", "Content-Type": "text/html", "X-Seq": str(i)}}
+
+def run(path, records, threads, **kwargs):
+    journal = Journal(path, "2", **kwargs)
+    per = records // threads
+
+    def worker(n):
+        for i in range(per):
+            journal.stage(f"host{n}-{i // len(STAGES)}.bench.local", STAGES[i % len(STAGES)], record(i))
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    journal.close()
+    seconds = time.perf_counter() - start
+
+    compact_start = time.perf_counter()
+    Journal(path, "2", resume=True).compact()
+    return {
+        "records": per * threads,
+        "seconds": round(seconds, 3),
+        "records_per_sec": round(per * threads / seconds),
+        "fsyncs": journal.syncs,
+        "compact_seconds": round(time.perf_counter() - compact_start, 3),
+        "replayed_targets": len(replay(path)[1]),
+    }
+
+def run_naive(path, records, threads):
+    # the baseline: write, flush and fsync every record before returning
+    lock = threading.Lock()
+    per = records // threads
+    with open(path, "ab") as f:
+        def worker(n):
+            for i in range(per):
+                line = (json.dumps({"type": "stage", "target": f"host{n}", "stage": "HTTP",
+                                    "data": record(i)}) + "\n").encode()
+                with lock:
+                    f.write(line)
+                    f.flush()
+                    os.fsync(f.fileno())
+
+        start = time.perf_counter()
+        workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+        seconds = time.perf_counter() - start
+    return {"records": per * threads, "seconds": round(seconds, 3), "records_per_sec": round(per * threads / seconds)}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=50000)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--unbatched", type=int, default=2000, help="records for the fsync-per-record run")
+    parser.add_argument("--dir", help="where to write (default: a temp dir; use the real disk to be honest)")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="blacktrace-journal-", dir=args.dir)
+    try:
+        print(json.dumps({
+            "group_commit": run(os.path.join(tmp, "batched.jsonl"), args.records, args.threads),
+            "fsync_each": run_naive(os.path.join(tmp, "each.jsonl"), args.unbatched, args.threads),
+        }, indent=2))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# PDF render benchmark on a synthetic nmap result.
+#
+#   python3 bench/bench_pdf.py --lines 10000
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+from reportlab.lib.pagesizes import A4
+
+import reporter
+
+SERVICES = ["ftp", "ssh", "telnet", "http", "https", "microsoft-ds", "ms-wbt-server", "unknown"]
+
+def synthetic_data(lines):
+    ports = [{
+        "host": "10.0.0.1",
+        "hostname": "bench.local",
+        "port": 1 + i % 65535,
+        "protocol": "tcp",
+        "state": "open" if i % 3 else "filtered",
+        "service": SERVICES[i % len(SERVICES)],
+        "product": "nginx" if i % 5 == 0 else None,
+        "version": "1.25.3" if i % 5 == 0 else None,
+    } for i in range(lines)]
+    headers = {f"X-Bench-{i}": "v" * 40 for i in range(200)}
+    return {
+        "DNS": {"name": "bench.local", "A": ["10.0.0.1"], "AAAA": [], "CNAME": [], "MX": [], "TXT": [], "NS": []},
+        "HTTP": {"status": 200, "headers": headers},
+        "Nmap": {"ports": ports},
+    }
+
+def legacy_pdf(path, data):
+    # the old layout: one Paragraph + Spacer per nmap line
+    st = reporter.pdf_styles()
+    elements = []
+    for line in reporter.nmap_lines(data["Nmap"]):
+        color = reporter.port_color(line)
+        text = f'<font color="{color}">{line}</font>' if color else line
+        elements.append(Paragraph(text, st["mono_plain"]))
+        elements.append(Spacer(1, 3))
+    SimpleDocTemplate(path, pagesize=A4).build(elements)
+
+def measure(func):
+    # timed without tracemalloc (it slows reportlab several times over),
+    # then run again under it for the allocation peak
+    start = time.perf_counter()
+    func()
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"seconds": round(seconds, 3), "peak_mb": round(peak / 1e6, 1)}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=10000)
+    parser.add_argument("--legacy", action="store_true", help="also time the per-line Paragraph layout")
+    parser.add_argument("--out", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    data = synthetic_data(args.lines)
+    results = {"lines": args.lines}
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        results["streaming"] = measure(lambda: reporter.generate_pdf("bench", data))
+        if args.legacy:
+            results["legacy"] = measure(lambda: legacy_pdf(os.path.join(tmp, "legacy.pdf"), data))
+
+    print(json.dumps(results, indent=2))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
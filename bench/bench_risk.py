@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# Risk scoring throughput on synthetic findings.
+#
+#   python3 bench/bench_risk.py --targets 1000 --ports 100
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import riskscore
+
+SERVICES = ["ftp", "ssh", "telnet", "http", "https", "microsoft-ds", "ms-wbt-server", "unknown"]
+PATHS = ["/admin", "/login", "/.git", "/.env", "/backup", "/api", "/static"]
+
+def synthetic_results(targets, ports, seed=1):
+    rnd = random.Random(seed)
+    return {f"host{i}.bench.local": {
+        "HTTP": {"status": 200, "headers": {"Server": "nginx"}},
+        "TLS": {"valid_to": "Jan  1 00:00:00 2027 GMT"},
+        "Directories": {p: rnd.choice((200, 301, 403, 404)) for p in PATHS},
+        "Nmap": {"ports": [{"port": rnd.randrange(1, 65536), "protocol": "tcp", "state": "open",
+                            "service": rnd.choice(SERVICES)} for _ in range(ports)]},
+    } for i in range(targets)}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--targets", type=int, default=1000)
+    parser.add_argument("--ports", type=int, default=100, help="open ports per target")
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    results = synthetic_results(args.targets, args.ports)
+    riskscore.score_batch(results)
+    times = []
+    for _ in range(args.rounds):
+        start = time.perf_counter()
+        riskscore.score_batch(results)
+        times.append(time.perf_counter() - start)
+    print(json.dumps({
+        "targets": args.targets,
+        "findings": args.targets * (args.ports + len(PATHS) + 3),
+        "best_ms": round(min(times) * 1000, 1),
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# End-to-end scan benchmark against local stand-in services.
+#
+#   python3 bench/bench_scan.py                              # 1, 100 and 10000 targets
+#   python3 bench/bench_scan.py --sizes 1 100 --latency 0.02 --soft404 --header-bytes 4096
+#   python3 bench/bench_scan.py --compare bench/results/<older>.json
+#
+# Each size runs in its own process so peak RSS and the shared caches,
+# limiters and metrics start clean. Results go to bench/results/ as JSON,
+# named by commit, for comparing across commits.
+
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import platform
+import datetime
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+
+RESULTS_DIR = os.path.join(HERE, "results")
+SIZES = (1, 100, 10000)
+
+# ================= ONE SIZE (child process) =================
+
+def run_one(args):
+    import tempfile
+    from standins import StandIns
+
+    st = StandIns(latency=args.latency, soft404=args.soft404, header_bytes=args.header_bytes,
+                  nmap_delay=args.nmap_delay, tls=not args.no_tls)
+    import reporter
+    from pipeline import Pipeline
+    from metrics import get_metrics
+    from nmapxml import ShardBatcher
+
+    reporter.console.quiet = True
+    targets = st.targets(args.one)
+    shards = ShardBatcher(args.nmap_shard) if args.nmap_shard else None
+    try:
+        # the same engine as a CLI run, without its Report stage (PDFs are
+        # timed separately below)
+        start = time.perf_counter()
+        results = Pipeline(args.level, async_http=args.async_http, nmap_shards=shards).run(targets)
+        seconds = time.perf_counter() - start
+
+        stages = get_metrics().summary()
+        pdf_targets = targets[:args.pdf_sample]
+        os.chdir(tempfile.mkdtemp(dir=st.tmp))
+        pdf_start = time.perf_counter()
+        for t in pdf_targets:
+            reporter.generate_pdf(reporter.target_host(t), results[t])
+        pdf_seconds = time.perf_counter() - pdf_start
+        report = get_metrics().summary().get("Report", {})
+    finally:
+        if shards:
+            shards.close()
+        st.close()
+
+    errors = sum(1 for data in results.values() for v in data.values() if isinstance(v, dict) and "error" in v)
+    return {
+        "targets": args.one,
+        "seconds": round(seconds, 3),
+        "targets_per_sec": round(args.one / seconds, 2) if seconds else None,
+        "stage_errors": errors,
+        "stages": {name: {k: s[k] for k in ("calls", "errors", "p50", "p99", "max")}
+                   for name, s in stages.items() if name != "Report"},
+        "pdf": {"reports": len(pdf_targets), "seconds": round(pdf_seconds, 3),
+                "p50": report.get("p50"), "p99": report.get("p99")},
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+# ================= DRIVER =================
+
+def commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def child_args(args, size):
+    argv = [sys.executable, os.path.abspath(__file__), "--one", str(size), "--level", args.level,
+            "--nmap-shard", str(args.nmap_shard), "--latency", str(args.latency),
+            "--header-bytes", str(args.header_bytes), "--nmap-delay", str(args.nmap_delay),
+            "--pdf-sample", str(args.pdf_sample)]
+    if args.soft404:
+        argv.append("--soft404")
+    if args.no_tls:
+        argv.append("--no-tls")
+    if args.async_http:
+        argv.append("--async-http")
+    return argv
+
+def compare(old, new):
+    before = {r["targets"]: r for r in old["runs"]}
+    print(f"\ncompared with {old.get('commit')} ({old.get('date')}):")
+    for run in new["runs"]:
+        prev = before.get(run["targets"])
+        if not prev:
+            continue
+        ratio = run["targets_per_sec"] / prev["targets_per_sec"] if prev["targets_per_sec"] else 0
+        print(f"  {run['targets']:>6} targets: {prev['targets_per_sec']} -> {run['targets_per_sec']} "
+              f"targets/s ({ratio:.2f}x), RSS {prev['peak_rss_mb']} -> {run['peak_rss_mb']} MB")
+        for name, s in run["stages"].items():
+            p = prev["stages"].get(name)
+            if p:
+                print(f"         {name:<12} p50 {p['p50']} -> {s['p50']}  p99 {p['p99']} -> {s['p99']}")
+        print(f"         {'PDF':<12} p50 {prev['pdf']['p50']} -> {run['pdf']['p50']}  "
+              f"p99 {prev['pdf']['p99']} -> {run['pdf']['p99']}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES))
+    parser.add_argument("--level", default="3", choices=["1", "2", "3"])
+    parser.add_argument("--async-http", action="store_true", help="HTTP stage on the asyncio client")
+    parser.add_argument("--nmap-shard", type=int, default=0, help="hosts per nmap process (0: one per host)")
+    parser.add_argument("--latency", type=float, default=0.005, help="seconds added to every HTTP response")
+    parser.add_argument("--soft404", action="store_true", help="unknown paths answer 200")
+    parser.add_argument("--header-bytes", type=int, default=0, help="padding header size per response")
+    parser.add_argument("--nmap-delay", type=float, default=0.0, help="seconds the fake nmap takes per run")
+    parser.add_argument("--pdf-sample", type=int, default=50, help="reports rendered per size")
+    parser.add_argument("--no-tls", action="store_true", help="plain HTTP targets")
+    parser.add_argument("--out", help="result file (default: bench/results/scan-<commit>-<time>.json)")
+    parser.add_argument("--compare", help="earlier result file to diff against")
+    parser.add_argument("--one", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.one is not None:
+        print(json.dumps(run_one(args)))
+        return
+
+    results = {
+        "commit": commit(),
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "config": {k: getattr(args, k) for k in ("level", "async_http", "nmap_shard", "latency", "soft404",
+                                                 "header_bytes", "nmap_delay", "pdf_sample", "no_tls")},
+        "runs": [],
+    }
+    for size in args.sizes:
+        print(f"[*] {size} target(s)...", file=sys.stderr)
+        out = subprocess.run(child_args(args, size), capture_output=True, text=True)
+        if out.returncode:
+            sys.stderr.write(out.stderr)
+            sys.exit(f"run with {size} targets failed")
+        results["runs"].append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    print(json.dumps(results, indent=2))
+    path = args.out or os.path.join(RESULTS_DIR, f"scan-{results['commit']}-"
+                                                 f"{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"[*] saved {path}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# Startup cost of the headless passive entry point, from python -X importtime.
+#
+#   python3 bench/bench_startup.py                  # fails (exit 1) over budget
+#   python3 bench/bench_startup.py --budget-ms 250 --runs 9 --top 15
+#
+# Runs `reporter.py --level 1 --no-pdf --quiet` against a closed local port,
+# so the scan itself returns at once and what is left is interpreter and
+# import time. Modules in HEAVY must not load at all in this mode.
+
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# total import time allowed for the passive headless run, in ms
+BUDGET_MS = 350
+# only needed for PDFs, pretty console output or the Parquet history
+HEAVY = ("reportlab", "rich", "pyarrow", "multiprocessing", "PIL")
+
+LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+def command():
+    return [sys.executable, "-X", "importtime", os.path.join(ROOT, "reporter.py"),
+            "--target", "http://127.0.0.1:1", "--level", "1",
+            "--no-pdf", "--no-cache", "--quiet", "--output", "out"]
+
+def parse(stderr):
+    # {module: cumulative us} for top-level imports, and every module seen
+    top, seen = {}, set()
+    for line in stderr.splitlines():
+        m = LINE.match(line)
+        if not m:
+            continue
+        _self_us, cumulative, indent, name = m.groups()
+        seen.add(name)
+        if len(indent) == 1:
+            top[name] = top.get(name, 0) + int(cumulative)
+    return top, seen
+
+def run_once():
+    cwd = tempfile.mkdtemp(prefix="blacktrace-startup-")
+    try:
+        start = time.perf_counter()
+        out = subprocess.run(command(), cwd=cwd, capture_output=True, text=True)
+        wall = time.perf_counter() - start
+    finally:
+        shutil.rmtree(cwd, ignore_errors=True)
+    if out.returncode:
+        sys.stderr.write(out.stderr[-2000:])
+        sys.exit(f"reporter.py exited with {out.returncode}")
+    top, seen = parse(out.stderr)
+    return wall, top, seen
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=BUDGET_MS)
+    parser.add_argument("--top", type=int, default=10, help="slowest top-level imports to list")
+    args = parser.parse_args()
+
+    run_once()  # warm the page cache and __pycache__
+    walls, totals, tops, heavy = [], [], [], set()
+    for _ in range(args.runs):
+        wall, top, seen = run_once()
+        walls.append(wall)
+        totals.append(sum(top.values()) / 1000)
+        tops.append(top)
+        heavy |= {name.split(".")[0] for name in seen} & set(HEAVY)
+
+    median = {name: statistics.median(t.get(name, 0) for t in tops) / 1000 for name in tops[-1]}
+    slowest = sorted(median.items(), key=lambda kv: -kv[1])[:args.top]
+    result = {
+        "runs": args.runs,
+        "import_ms": round(statistics.median(totals), 1),
+        "wall_ms": round(statistics.median(walls) * 1000, 1),
+        "budget_ms": args.budget_ms,
+        "slowest": {name: round(ms, 1) for name, ms in slowest},
+        "heavy_loaded": sorted(heavy),
+    }
+    print(json.dumps(result, indent=2))
+
+    failed = []
+    if result["import_ms"] > args.budget_ms:
+        failed.append(f"imports took {result['import_ms']} ms, budget {args.budget_ms} ms")
+    if heavy:
+        failed.append(f"heavy modules loaded: {', '.join(sorted(heavy))}")
+    if failed:
+        sys.exit("; ".join(failed))
+
+if __name__ == "__main__":
+    main()
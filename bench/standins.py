@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# Local stand-ins for the services a scan talks to: an HTTP/HTTPS server,
+# a stub DNS server and a fake nmap binary. Used by bench_scan.py and tests/.
+
+import os
+import ssl
+import time
+import socket
+import struct
+import shutil
+import tempfile
+import threading
+import subprocess
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ZONE = "bench.test"
+
+# ================= HTTP / HTTPS =================
+
+# path -> status; anything else is 404, or a 200 page when soft-404 is on
+EXISTING = {"/": 200, "/admin": 200, "/login": 200, "/.git": 403, "/api": 401}
+
+class FakeWeb(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, latency=0.0, soft404=False, header_bytes=0, body_bytes=2048, cert=None):
+        self.latency = latency
+        self.soft404 = soft404
+        self.padding = "x" * header_bytes
+        self.body = b"<html>" + b"." * body_bytes + b"</html>"
+        self.tls = None
+        if cert:
+            self.tls = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            self.tls.load_cert_chain(*cert)
+        super().__init__(("127.0.0.1", 0), _WebHandler)
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def finish_request(self, request, client_address):
+        # handshake on the handler thread, not the accept loop
+        if self.tls:
+            try:
+                request = self.tls.wrap_socket(request, server_side=True)
+            except (ssl.SSLError, OSError):
+                return
+        super().finish_request(request, client_address)
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+class _WebHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _respond(self, body):
+        srv = self.server
+        if srv.latency:
+            time.sleep(srv.latency)
+        path = self.path.split("?")[0]
+        status = EXISTING.get(path)
+        if status is None:
+            status = 200 if srv.soft404 else 404
+            # soft-404 pages echo the path, like most real ones
+            payload = b"<html>Sorry, " + path.encode() + b" was not found." + srv.body + b"</html>"
+        else:
+            payload = srv.body
+        self.send_response(status)
+        self.send_header("Server", "bench")
+        self.send_header("Content-Type", "text/html")
+        if srv.padding:
+            self.send_header("X-Pad", srv.padding)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        if body:
+            self.wfile.write(payload)
+
+    def do_GET(self):
+        self._respond(True)
+
+    def do_HEAD(self):
+        self._respond(False)
+
+    def log_message(self, *args):
+        pass
+
+def self_signed_cert(directory):
+    # (certfile, keyfile) for *.bench.test, or None without the openssl CLI
+    if not shutil.which("openssl"):
+        return None
+    cert, key = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "2",
+                    "-keyout", key, "-out", cert, "-subj", f"/CN={ZONE}",
+                    "-addext", f"subjectAltName=DNS:*.{ZONE},DNS:{ZONE}"],
+                   check=True, capture_output=True)
+    return cert, key
+
+# ================= DNS =================
+
+class StubDNS:
+    # Answers A 127.0.0.1 for every name under ZONE and NOERROR/empty for
+    # other types, NXDOMAIN for names outside it, over UDP on a random local
+    # port.
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.port = self.sock.getsockname()[1]
+        self.queries = 0
+
+    def _answer(self, packet):
+        qid = struct.unpack("!H", packet[:2])[0]
+        end = 12
+        while packet[end]:
+            end += packet[end] + 1
+        question = packet[12:end + 5]
+        qtype = struct.unpack("!H", packet[end + 1:end + 3])[0]
+        labels, i = [], 12
+        while packet[i]:
+            labels.append(packet[i + 1:i + 1 + packet[i]].decode("latin-1").lower())
+            i += packet[i] + 1
+        name = ".".join(labels)
+        answers = b""
+        if name != ZONE and not name.endswith("." + ZONE):
+            flags = 0x8183
+        else:
+            flags = 0x8180
+            if qtype == 1:
+                answers = struct.pack("!HHHIH", 0xC00C, 1, 1, self.ttl, 4) + socket.inet_aton("127.0.0.1")
+        header = struct.pack("!HHHHHH", qid, flags, 1, 1 if answers else 0, 0, 0)
+        return header + question + answers
+
+    def serve(self):
+        while True:
+            try:
+                packet, addr = self.sock.recvfrom(512)
+            except OSError:
+                return
+            self.queries += 1
+            try:
+                self.sock.sendto(self._answer(packet), addr)
+            except (IndexError, struct.error):
+                pass
+
+    def start(self):
+        threading.Thread(target=self.serve, daemon=True).start()
+        return self
+
+    def close(self):
+        self.sock.close()
+
+# ================= NMAP =================
+
+FAKE_NMAP = r'''#!/usr/bin/env python3
+import sys, time
+args = sys.argv[1:]
+hosts, skip = [], False
+for a in args:
+    if skip:
+        skip = False
+    elif a in ("-p", "-oX", "--max-rate", "--initial-rtt-timeout", "--max-rtt-timeout"):
+        skip = True
+    elif not a.startswith("-"):
+        hosts.append(a)
+time.sleep({delay})
+out = ['<?xml version="1.0"?><nmaprun>']
+for h in hosts:
+    out.append('<host><address addr="127.0.0.1" addrtype="ipv4"/><hostnames>'
+               '<hostname name="%s" type="user"/></hostnames><ports>' % h)
+    for port, svc in ((22, "ssh"), (80, "http"), (443, "https"), (8080, "http-proxy")):
+        out.append('<port protocol="tcp" portid="%d"><state state="open"/>'
+                   '<service name="%s" product="bench" version="1.0"/></port>' % (port, svc))
+    out.append("</ports></host>")
+out.append("</nmaprun>")
+sys.stdout.write("".join(out))
+'''
+
+def fake_nmap(directory, delay=0.0):
+    # writes an `nmap` that answers instantly (after `delay`) with four open
+    # ports per host; put `directory` first on PATH to use it
+    path = os.path.join(directory, "nmap")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(FAKE_NMAP.replace("{delay}", repr(delay)))
+    os.chmod(path, 0o755)
+    return path
+
+# ================= ENVIRONMENT =================
+
+def _serve(conn, latency, soft404, header_bytes, cert):
+    web = FakeWeb(latency, soft404, header_bytes, cert=cert).start()
+    dns = StubDNS().start()
+    conn.send((web.port, dns.port))
+    conn.recv()
+    web.shutdown()
+    dns.close()
+
+class StandIns:
+    # Starts the servers in a separate process, so they do not compete with
+    # the scanner for the GIL, and points this process at them:
+    #   - the shared resolver (which the stages also dial through) asks
+    #     StubDNS, with no search list,
+    #   - names under ZONE resolve to 127.0.0.1 in getaddrinfo too, for
+    #     anything that still goes through the OS resolver,
+    #   - the TLS trust store and PATH point at the stand-ins.
+    def __init__(self, latency=0.0, soft404=False, header_bytes=0, nmap_delay=0.0, tls=True):
+        import multiprocessing
+
+        self.tmp = tempfile.mkdtemp(prefix="blacktrace-bench-")
+        cert = self_signed_cert(self.tmp) if tls else None
+        self.scheme = "https" if cert else "http"
+        ctx = multiprocessing.get_context("spawn")
+        self.conn, child = ctx.Pipe()
+        self.proc = ctx.Process(target=_serve, args=(child, latency, soft404, header_bytes, cert), daemon=True)
+        self.proc.start()
+        self.web_port, self.dns_port = self.conn.recv()
+        fake_nmap(self.tmp, nmap_delay)
+
+        import reporter
+        import dnsresolver
+
+        # what close() puts back
+        self.saved_env = {k: os.environ.get(k) for k in ("PATH", "SSL_CERT_FILE", "REQUESTS_CA_BUNDLE")}
+        self.saved = (socket.getaddrinfo, dnsresolver._default, reporter.TLS_PORT)
+        self.cert = cert
+
+        os.environ["PATH"] = self.tmp + os.pathsep + os.environ.get("PATH", "")
+        if cert:
+            os.environ["SSL_CERT_FILE"] = cert[0]
+            os.environ["REQUESTS_CA_BUNDLE"] = cert[0]
+
+        real = socket.getaddrinfo
+
+        def getaddrinfo(host, *args, **kwargs):
+            if isinstance(host, str) and host.endswith("." + ZONE):
+                host = "127.0.0.1"
+            return real(host, *args, **kwargs)
+        socket.getaddrinfo = getaddrinfo
+
+        dnsresolver._default = dnsresolver.Resolver(nameservers=["127.0.0.1"], port=self.dns_port, search=[])
+        reporter.TLS_PORT = self.web_port
+
+    def targets(self, n):
+        return [f"{self.scheme}://t{i}.{ZONE}:{self.web_port}" for i in range(n)]
+
+    def close(self):
+        import reporter
+        import dnsresolver
+
+        self.conn.send("stop")
+        self.proc.join(5)
+        socket.getaddrinfo, dnsresolver._default, reporter.TLS_PORT = self.saved
+        for k, v in self.saved_env.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+        shutil.rmtree(self.tmp, ignore_errors=True)
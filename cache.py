@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import time
+import inspect
+import sqlite3
+import hashlib
+import threading
+
+CACHE_PATH = os.path.join(".blacktrace", "cache.sqlite")
+
+# Seconds a stage result stays fresh. Anything older is collected again.
+STAGE_TTL = {
+    "DNS": 3600,
+    "HTTP": 6 * 3600,
+    "TLS": 24 * 3600,
+    "Directories": 24 * 3600,
+    "Nmap": 24 * 3600,
+}
+DEFAULT_TTL = 3600
+
+# ================= RESULT CACHE =================
+
+class ResultCache:
+    # Stage outputs keyed by (target, stage, parameters). refresh=True skips
+    # every read but still stores what the scan collects. Rows older than
+    # max_age (default: the longest TTL) are deleted on open and close.
+    def __init__(self, path=CACHE_PATH, ttls=None, refresh=False, max_age=None):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.ttls = dict(STAGE_TTL, **(ttls or {}))
+        self.max_age = max_age or max(self.ttls.values())
+        self.refresh = refresh
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " target TEXT, stage TEXT, params TEXT, stored REAL, value TEXT,"
+            " PRIMARY KEY (target, stage, params))"
+        )
+        self.stats = {"hits": 0, "misses": 0, "stored": 0, "pruned": 0}
+        self.prune()
+
+    @staticmethod
+    def params_key(params):
+        raw = json.dumps(params, sort_keys=True, default=str)
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    def get(self, target, stage, params=None):
+        if self.refresh:
+            return None
+        ttl = self.ttls.get(stage, DEFAULT_TTL)
+        with self.lock:
+            row = self.db.execute(
+                "SELECT stored, value FROM results WHERE target=? AND stage=? AND params=?",
+                (target, stage, self.params_key(params)),
+            ).fetchone()
+            if row is None or time.time() - row[0] > ttl:
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+        return json.loads(row[1])
+
+    def put(self, target, stage, params, value):
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                (target, stage, self.params_key(params), time.time(), json.dumps(value, default=str)),
+            )
+            self.db.commit()
+            self.stats["stored"] += 1
+
+    def wrap(self, target, stage, params, func):
+        def keep(value):
+            # errors are worth retrying next run, don't pin them
+            if not (isinstance(value, dict) and "error" in value):
+                self.put(target, stage, params, value)
+            return value
+
+        if inspect.iscoroutinefunction(func):
+            async def cached_async(arg):
+                hit = self.get(target, stage, params)
+                return hit if hit is not None else keep(await func(arg))
+            return cached_async
+
+        def cached(arg):
+            hit = self.get(target, stage, params)
+            return hit if hit is not None else keep(func(arg))
+        return cached
+
+    def prune(self):
+        # drop rows no read would use any more
+        cutoff = time.time() - self.max_age
+        with self.lock:
+            gone = self.db.execute("DELETE FROM results WHERE stored < ?", (cutoff,)).rowcount
+            self.db.commit()
+            self.stats["pruned"] += gone
+        return gone
+
+    def close(self):
+        self.prune()
+        with self.lock:
+            self.db.close()
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# Headless entry point, also reached as `python3 reporter.py <args>`:
+#
+#   python3 cli.py --targets-file scope.txt --level 2 --output out/
+#   python3 cli.py --daemon --spool .blacktrace/spool --socket .blacktrace/blacktrace.sock
+
+import os
+import sys
+import argparse
+
+from reporter import REPORT_DIR, console, archive, report_metrics
+
+def build_parser():
+    p = argparse.ArgumentParser(
+        prog="reporter.py",
+        description="BLACKTRACE headless scan. Run without arguments for the interactive menu. "
+                    "Only scan targets you are authorized to test.")
+    p.add_argument("--target", action="append", default=[], help="domain or URL to scan; repeatable")
+    p.add_argument("--targets-file", help="scope file, one target per line, # comments; - reads stdin")
+    p.add_argument("--level", default="1", choices=["1", "2", "3"],
+                   help="1 passive, 2 extended (directories), 3 full active (nmap)")
+    p.add_argument("--wordlist", help="paths to probe at levels 2 and 3, one per line (default: a built-in short list)")
+    p.add_argument("--output", default=REPORT_DIR, help="directory for reports, JSONL and metrics")
+    p.add_argument("--no-pdf", action="store_true", help="skip PDF/text reports")
+    p.add_argument("--no-text", action="store_true", help="PDF reports only, no .txt copies")
+    p.add_argument("--jsonl", action="store_true", help="stream stage results to <output>/results-*.jsonl")
+    p.add_argument("--compress", choices=["gzip", "zstd"], help="compression for --jsonl")
+    p.add_argument("--archive", action="store_true", help="also append results to the Parquet history (needs pyarrow)")
+    p.add_argument("--changed-only", action="store_true", help="only report targets that changed since the last scan")
+    p.add_argument("--journal", help="checkpoint journal (default <output>/journal.jsonl)")
+    p.add_argument("--no-journal", action="store_true", help="do not checkpoint results")
+    p.add_argument("--resume", action="store_true", help="continue an interrupted run from its journal")
+    p.add_argument("--fresh", action="store_true", help="start a new journal over an interrupted run's")
+    p.add_argument("--refresh", action="store_true", help="ignore cached stage results (still stores new ones)")
+    p.add_argument("--no-cache", action="store_true", help="neither read nor write the result cache")
+    p.add_argument("--cache-max-age", type=float, metavar="SECONDS",
+                   help="delete cached results older than this (default: the longest stage TTL, 24h)")
+    p.add_argument("--max-rate", type=float, help="per-host request rate ceiling (req/s)")
+    p.add_argument("--max-concurrency", type=int, help="per-host in-flight request ceiling")
+    p.add_argument("--max-per-address", type=int,
+                   help="in-flight requests to one IP across all names on it (default: no cap)")
+    p.add_argument("--async-http", action="store_true",
+                   help="fetch HTTP headers on one asyncio event loop instead of a thread per request")
+    p.add_argument("--quiet", action="store_true", help="no console output")
+
+    n = p.add_argument_group("nmap (level 3)")
+    n.add_argument("--nmap-shard", type=int, metavar="N",
+                   help="scan up to N hosts per nmap process instead of one process per host")
+    n.add_argument("--nmap-workers", type=int, help="nmap processes at once with --nmap-shard (default: cores)")
+    n.add_argument("--nmap-max-rate", type=int, help="packets/s for all nmap processes together, with --nmap-shard")
+
+    e = p.add_argument_group("scope expansion")
+    e.add_argument("--scope-allowlist", help="domains/CIDRs, one per line; scan in-scope names found in "
+                                             "certificate SANs and CNAME/NS/MX records in the same run")
+    e.add_argument("--expand-depth", type=int, help="hops from a seed target to follow (default 2)")
+    e.add_argument("--expand-max", type=int, help="new targets one run may add (default 1000)")
+
+    d = p.add_argument_group("daemon")
+    d.add_argument("--daemon", action="store_true", help="run until SIGTERM, scanning jobs from --spool/--socket")
+    d.add_argument("--spool", nargs="?", const="", help="job spool directory (default .blacktrace/spool)")
+    d.add_argument("--socket", nargs="?", const="", help="Unix socket for jobs (default .blacktrace/blacktrace.sock)")
+    d.add_argument("--poll", type=float, help="seconds between spool scans")
+    d.add_argument("--metrics-port", type=int, help="also serve /metrics on 127.0.0.1:PORT")
+    return p
+
+def read_targets(args):
+    from engine import load_scope
+
+    targets = list(args.target)
+    if args.targets_file == "-":
+        targets += [line.split("#", 1)[0].strip() for line in sys.stdin]
+    elif args.targets_file:
+        targets += load_scope(args.targets_file)
+    return [t for t in dict.fromkeys(targets) if t]
+
+def open_outputs(args):
+    # (cache, sink, store) shared by both modes
+    from cache import ResultCache
+    from jsonl_sink import JSONLSink
+    from diffscan import SnapshotStore
+
+    cache = None if args.no_cache else ResultCache(refresh=args.refresh, max_age=args.cache_max_age)
+    sink = JSONLSink(args.output, compress=args.compress) if args.jsonl else None
+    store = SnapshotStore() if args.changed_only else None
+    return cache, sink, store
+
+def close_outputs(cache, sink, store):
+    if store:
+        store.flush()
+    if sink:
+        sink.close()
+    if cache:
+        cache.close()
+
+# ================= ONE-SHOT =================
+
+def open_expander(args):
+    from expansion import MAX_DEPTH, MAX_NEW, Allowlist, Expander
+
+    if not args.scope_allowlist:
+        return None
+    allowlist = Allowlist.load(args.scope_allowlist)
+    console.print(f"[cyan][*] Scope expansion: {len(allowlist)} allowlist entr(ies)[/cyan]")
+    return Expander(allowlist,
+                    max_depth=MAX_DEPTH if args.expand_depth is None else args.expand_depth,
+                    max_new=MAX_NEW if args.expand_max is None else args.expand_max)
+
+def open_journal(args, targets, expander=None):
+    # (journal, prefilled, finished); a run without --resume starts a new
+    # journal, which needs --fresh when the old one was never compacted
+    from journal import JOURNAL_NAME, Journal, resume_state
+    from reporter import target_host
+
+    if args.no_journal:
+        return None, {}, set()
+    path = args.journal or os.path.join(args.output, JOURNAL_NAME)
+    prefilled, finished = {}, set()
+    if args.resume:
+        # names the interrupted run discovered come back as targets of their own
+        include = (lambda t: expander.allowlist.allows(target_host(t))) if expander else None
+        prefilled, finished = resume_state(path, args.level, targets, include=include)
+        seeds = set(targets)
+        targets += [t for t in prefilled if t not in seeds]
+        partial = sum(1 for t in prefilled if t not in finished)
+        console.print(f"[cyan][*] Resuming from {path}: {len(finished)} target(s) done, "
+                      f"{partial} partly done, {len(targets) - len(finished) - partial} not started[/cyan]")
+    return Journal(path, args.level, resume=args.resume, fresh=args.fresh), prefilled, finished
+
+def open_shards(args):
+    if not args.nmap_shard:
+        return None
+    from nmapxml import ShardBatcher
+    from ratelimit import get_limiter
+    return ShardBatcher(args.nmap_shard, args.nmap_workers, args.nmap_max_rate, limiter=get_limiter())
+
+def scan(args, targets):
+    from pipeline import Pipeline
+    from diffscan import changed_only, diff_batch
+    from jsonl_sink import tee
+
+    try:
+        expander = open_expander(args)
+        journal, prefilled, finished = open_journal(args, targets, expander)
+    except (OSError, ValueError) as e:
+        console.print(f"[red][!] {e}[/red]")
+        return 2
+    cache, sink, store = open_outputs(args)
+    shards = open_shards(args)
+    farm = None
+    if not args.no_pdf:
+        from render_farm import RenderFarm
+        farm = RenderFarm(text=not args.no_text, directory=args.output)
+    try:
+        report = None
+        if farm:
+            report = changed_only(farm.render, store) if store else farm.render
+        pipe = Pipeline(args.level, report=report, cache=cache, sink=tee(sink, journal),
+                        workers={"Report": farm.workers} if farm else None, expander=expander,
+                        async_http=args.async_http, wordlist=args.wordlist, nmap_shards=shards)
+        results = pipe.run(targets, monitor=None if args.quiet else 5, prefilled=prefilled, finished=finished)
+        if expander:
+            console.print(f"[cyan][*] Expansion added {len(results) - len(targets)} target(s)"
+                          f"{f', {expander.capped} over --expand-max' if expander.capped else ''}[/cyan]")
+        if journal:
+            compacted = journal.compact()
+            console.print(f"[dim][*] Journal compacted: {compacted['targets']} target(s) in {journal.path}[/dim]")
+        if store and not farm:
+            changes = diff_batch(store, results)
+            console.print(f"[*] {len(changes)} of {len(results)} target(s) changed")
+        if not args.quiet:
+            pipe.print_stats()
+        report_metrics(os.path.join(args.output, "metrics.prom"))
+        if args.archive:
+            archive(results)
+        if farm:
+            written = [p for p in pipe.reports.values() if p]
+            console.print(f"[green][*] {len(written)} report(s) in {args.output}[/green]")
+            if len(targets) > 1 and written:
+                console.print(f"[green][*] portfolio: {farm.portfolio()}[/green]")
+    finally:
+        if shards:
+            shards.close()
+        if farm:
+            farm.close()
+        if journal:
+            journal.close()
+        close_outputs(cache, sink, store)
+    return 0
+
+# ================= DAEMON =================
+
+def daemon(args):
+    from jobqueue import POLL, SOCKET_PATH, SPOOL_DIR, Daemon, Spool, serve
+    from render_farm import RenderFarm
+    from metrics import get_metrics
+
+    if args.spool is None and args.socket is None:
+        args.spool = ""
+    cache, sink, store = open_outputs(args)
+    shards = open_shards(args)
+    farm = None if args.no_pdf else RenderFarm(text=not args.no_text, directory=args.output)
+    metrics_server = get_metrics().serve(args.metrics_port) if args.metrics_port else None
+    try:
+        d = Daemon(args.level, args.output, cache=cache, sink=sink, farm=farm, store=store,
+                   async_http=args.async_http, wordlist=args.wordlist, nmap_shards=shards)
+        spool = None
+        if args.spool is not None:
+            spool = Spool(d, args.spool or SPOOL_DIR, args.poll or POLL)
+        serve(d, spool, None if args.socket is None else (args.socket or SOCKET_PATH))
+    finally:
+        if metrics_server:
+            metrics_server.shutdown()
+        if shards:
+            shards.close()
+        if farm:
+            farm.close()
+        close_outputs(cache, sink, store)
+    return 0
+
+# ================= ENTRY =================
+
+def cli(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.quiet:
+        console.quiet = True
+    if args.compress and not args.jsonl:
+        parser.error("--compress needs --jsonl")
+    if (args.resume or args.fresh) and args.no_journal:
+        parser.error("--resume and --fresh need the journal")
+    if args.resume and args.fresh:
+        parser.error("--resume and --fresh are opposites")
+    if (args.nmap_workers or args.nmap_max_rate) and not args.nmap_shard:
+        parser.error("--nmap-workers and --nmap-max-rate need --nmap-shard")
+    if args.wordlist and not os.path.isfile(args.wordlist):
+        parser.error(f"no such wordlist: {args.wordlist}")
+    if args.max_rate or args.max_concurrency or args.max_per_address:
+        from ratelimit import MAX_CONCURRENCY, MAX_RATE, configure
+        configure(max_rate=args.max_rate or MAX_RATE, max_concurrency=args.max_concurrency or MAX_CONCURRENCY,
+                  max_per_address=args.max_per_address)
+
+    if args.daemon:
+        if args.target or args.targets_file:
+            parser.error("--daemon takes targets from --spool/--socket jobs, not --target/--targets-file")
+        if args.resume or args.fresh or args.journal:
+            parser.error("--resume, --fresh and --journal are for one-shot runs; the daemon requeues unfinished spool jobs")
+        if args.scope_allowlist:
+            parser.error("--scope-allowlist is for one-shot runs")
+        return daemon(args)
+
+    if args.spool is not None or args.socket is not None or args.metrics_port:
+        parser.error("--spool, --socket and --metrics-port need --daemon")
+    if (args.expand_depth is not None or args.expand_max is not None) and not args.scope_allowlist:
+        parser.error("--expand-depth and --expand-max need --scope-allowlist")
+    try:
+        targets = read_targets(args)
+    except OSError as e:
+        parser.error(str(e))
+    if not targets:
+        parser.error("nothing to scan: give --target or --targets-file")
+    return scan(args, targets)
+
+if __name__ == "__main__":
+    sys.exit(cli())
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+
+import os
+import ssl
+import uuid
+import datetime
+
+from riskscore import EXPOSED_DENIED
+
+COLUMNAR_DIR = os.path.join(".blacktrace", "columnar")
+
+# One dataset per table, hive-partitioned by scan date:
+#   <root>/<table>/date=YYYY-MM-DD/part-<time>-<id>.parquet
+TABLES = ("dns", "http", "headers", "tls", "dirs", "nmap")
+
+def _arrow():
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.dataset
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("the columnar store needs 'pyarrow' (pip install pyarrow)")
+    return pyarrow
+
+def _cert_time(value):
+    if not value:
+        return None
+    try:
+        return datetime.datetime.fromtimestamp(ssl.cert_time_to_seconds(value), datetime.timezone.utc)
+    except (ValueError, TypeError):
+        pass
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except (ValueError, TypeError):
+        return None
+
+def _error(v):
+    return str(v["error"]) if isinstance(v, dict) and "error" in v else None
+
+# ================= NORMALIZE =================
+
+def rows(target, data):
+    # Flattens one target's data dict into {table: [row, ...]}.
+    out = {t: [] for t in TABLES}
+
+    dns = data.get("DNS")
+    if isinstance(dns, dict):
+        for rtype, values in dns.items():
+            if isinstance(values, list):
+                for v in values:
+                    value = f"{v['preference']} {v['exchange']}" if isinstance(v, dict) else str(v)
+                    out["dns"].append({"target": target, "rtype": rtype, "value": value})
+
+    http = data.get("HTTP")
+    if isinstance(http, dict):
+        headers = http.get("headers") or {}
+        lower = {k.lower() for k in headers}
+        out["http"].append({
+            "target": target,
+            "status": http.get("status"),
+            "error": _error(http),
+            "server": headers.get("Server") or headers.get("server"),
+            "hsts": "strict-transport-security" in lower,
+            "csp": "content-security-policy" in lower,
+        })
+        for k, v in headers.items():
+            out["headers"].append({"target": target, "name": k.lower(), "value": str(v)})
+
+    tls = data.get("TLS")
+    if isinstance(tls, dict):
+        out["tls"].append({
+            "target": target,
+            "issuer": None if tls.get("issuer") is None else str(tls.get("issuer")),
+            "valid_from": _cert_time(tls.get("valid_from")),
+            "valid_to": _cert_time(tls.get("valid_to")),
+            "error": _error(tls),
+        })
+
+    dirs = data.get("Directories")
+    if isinstance(dirs, dict) and "error" not in dirs:
+        for path, status in dirs.items():
+            out["dirs"].append({
+                "target": target,
+                "path": path,
+                "status": status if isinstance(status, int) else None,
+                "error": None if isinstance(status, int) else str(status),
+            })
+
+    nmap = data.get("Nmap")
+    if isinstance(nmap, dict):
+        for p in nmap.get("ports", []):
+            out["nmap"].append({"target": target, **{k: p.get(k) for k in
+                               ("host", "port", "protocol", "state", "service", "product", "version")}})
+    return out
+
+def _schemas(pa):
+    ts = pa.timestamp("us", tz="UTC")
+    common = [("scanned_at", ts), ("target", pa.string())]
+    return {
+        "dns": pa.schema(common + [("rtype", pa.string()), ("value", pa.string())]),
+        "http": pa.schema(common + [("status", pa.int32()), ("error", pa.string()), ("server", pa.string()),
+                                    ("hsts", pa.bool_()), ("csp", pa.bool_())]),
+        "headers": pa.schema(common + [("name", pa.string()), ("value", pa.string())]),
+        "tls": pa.schema(common + [("issuer", pa.string()), ("valid_from", ts), ("valid_to", ts),
+                                   ("error", pa.string())]),
+        "dirs": pa.schema(common + [("path", pa.string()), ("status", pa.int32()), ("error", pa.string())]),
+        "nmap": pa.schema(common + [("host", pa.string()), ("port", pa.int32()), ("protocol", pa.string()),
+                                    ("state", pa.string()), ("service", pa.string()),
+                                    ("product", pa.string()), ("version", pa.string())]),
+    }
+
+# ================= STORE =================
+
+class ColumnarStore:
+    def __init__(self, root=COLUMNAR_DIR):
+        self.pa = _arrow()
+        self.root = root
+        self.schemas = _schemas(self.pa)
+
+    def write(self, results, scanned_at=None):
+        # results: {target: data}. Writes one Parquet file per table for the batch.
+        pa = self.pa
+        scanned_at = scanned_at or datetime.datetime.now(datetime.timezone.utc)
+        day = scanned_at.strftime("%Y-%m-%d")
+        stamp = f"{scanned_at.strftime('%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+        columns = {t: [] for t in TABLES}
+        for target, data in results.items():
+            for table, found in rows(target, data).items():
+                columns[table].extend(found)
+
+        written = {}
+        for table, found in columns.items():
+            if not found:
+                continue
+            schema = self.schemas[table]
+            for r in found:
+                r["scanned_at"] = scanned_at
+            arrays = {name: [r.get(name) for r in found] for name in schema.names}
+            batch = pa.Table.from_pydict(arrays, schema=schema)
+            directory = os.path.join(self.root, table, f"date={day}")
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"part-{stamp}.parquet")
+            pa.parquet.write_table(batch, path, compression="zstd")
+            written[table] = path
+        return written
+
+    def dataset(self, table):
+        pa = self.pa
+        partitioning = pa.dataset.partitioning(pa.schema([("date", pa.string())]), flavor="hive")
+        path = os.path.join(self.root, table)
+        if not os.path.isdir(path):
+            return None
+        return pa.dataset.dataset(path, format="parquet", partitioning=partitioning,
+                                  schema=self.schemas[table].append(pa.field("date", pa.string())))
+
+    def query(self, table, filter=None, columns=None, since=None, until=None):
+        # filter: a pyarrow.compute expression, e.g. field("path") == "/.env".
+        # since/until: "YYYY-MM-DD", matched against the date partition so
+        # whole days are skipped without opening their files.
+        pa = self.pa
+        ds = self.dataset(table)
+        if ds is None:
+            return self.schemas[table].empty_table()
+        field = pa.dataset.field
+        expr = filter
+        for cond in ((field("date") >= since) if since else None,
+                     (field("date") <= until) if until else None):
+            if cond is not None:
+                expr = cond if expr is None else expr & cond
+        return ds.to_table(columns=columns, filter=expr)
+
+    def aggregate(self, table, group_by, aggregations, **query):
+        # aggregations: [(column, "count"|"sum"|"min"|"max"|"mean"|"count_distinct"), ...]
+        return self.query(table, **query).group_by(group_by).aggregate(aggregations)
+
+    # ---------- canned questions ----------
+
+    def hosts_with_path(self, path, since=None, until=None, exposed=True):
+        pa = self.pa
+        field = pa.dataset.field
+        expr = field("path") == path
+        if exposed:
+            # riskscore.exposed() as an expression
+            expr = expr & ((field("status") < 400) | field("status").isin(EXPOSED_DENIED))
+        found = self.query("dirs", filter=expr, columns=["target"], since=since, until=until)
+        return sorted(pa.compute.unique(found["target"]).to_pylist())
+
+    def cert_expiry_histogram(self, since=None, until=None, latest=True):
+        # {"YYYY-MM": certificates expiring that month}; latest=True counts
+        # each target once, by its most recent scan
+        pa = self.pa
+        pc = pa.compute
+        tls = self.query("tls", columns=["target", "scanned_at", "valid_to"], since=since, until=until)
+        tls = tls.filter(pc.is_valid(tls["valid_to"]))
+        if latest and tls.num_rows:
+            newest = tls.group_by("target").aggregate([("scanned_at", "max")])
+            tls = tls.join(newest, keys=["target", "scanned_at"],
+                           right_keys=["target", "scanned_at_max"], join_type="inner")
+        months = pc.strftime(tls["valid_to"], format="%Y-%m")
+        counts = pc.value_counts(months).to_pylist()
+        return dict(sorted((c["values"], c["counts"]) for c in counts))
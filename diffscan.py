@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import hashlib
+import threading
+
+from reporter import report_name
+from riskscore import exposed
+
+SNAPSHOT_DIR = os.path.join(".blacktrace", "snapshots")
+
+# Headers that change on every response and say nothing about the target.
+VOLATILE_HEADERS = {
+    "date", "expires", "age", "set-cookie", "etag", "last-modified", "content-length",
+    "x-request-id", "x-amz-request-id", "x-amz-cf-id", "cf-ray", "server-timing",
+    "report-to", "nel", "x-served-by", "x-cache", "x-cache-hits", "x-timer", "via",
+}
+
+# ================= NORMALIZE =================
+
+def _norm_section(section, content):
+    if not isinstance(content, dict) or "error" in content:
+        return content
+    if section == "HTTP":
+        headers = {k.lower(): v for k, v in (content.get("headers") or {}).items()
+                   if k.lower() not in VOLATILE_HEADERS}
+        return {"status": content.get("status"), "headers": dict(sorted(headers.items()))}
+    if section == "Liveness":
+        # rtt_ms moves every run
+        return {"state": content.get("state"), "ports": content.get("ports")}
+    if section == "DNS":
+        return {k: sorted(json.dumps(x, sort_keys=True) if isinstance(x, dict) else str(x) for x in v)
+                for k, v in sorted(content.items()) if isinstance(v, list)}
+    if section == "Nmap" and "ports" in content:
+        return {f"{p['port']}/{p['protocol']}": {
+                    "state": p["state"], "service": p.get("service"),
+                    "product": p.get("product"), "version": p.get("version")}
+                for p in sorted(content["ports"], key=lambda p: (p["port"], p["protocol"]))}
+    if section == "Expansion":
+        # which names a target got to queue depends on scan order
+        return {k: v for k, v in sorted(content.items()) if k != "queued"}
+    return json.loads(json.dumps(content, sort_keys=True, default=str))
+
+# Sections worked out from the others; they move when those do (or, for
+# certificate expiry, every day) and would only repeat their changes.
+DERIVED = ("Risk",)
+
+def normalize(data):
+    return {section: _norm_section(section, content) for section, content in data.items()
+            if section not in DERIVED}
+
+def section_hashes(norm):
+    return {section: hashlib.sha1(json.dumps(v, sort_keys=True, default=str).encode()).hexdigest()
+            for section, v in norm.items()}
+
+# ================= FIELD DIFFS =================
+
+def _dict_delta(old, new):
+    old, new = old or {}, new or {}
+    delta = {}
+    added = {k: new[k] for k in new if k not in old}
+    removed = {k: old[k] for k in old if k not in new}
+    changed = {k: {"old": old[k], "new": new[k]} for k in new if k in old and old[k] != new[k]}
+    if added:
+        delta["added"] = added
+    if removed:
+        delta["removed"] = removed
+    if changed:
+        delta["changed"] = changed
+    return delta
+
+def diff_section(section, old, new):
+    if not isinstance(old, dict) or not isinstance(new, dict) or "error" in old or "error" in new:
+        return {"old": old, "new": new}
+
+    if section == "Nmap":
+        open_old = {k for k, v in old.items() if v.get("state") == "open"}
+        open_new = {k for k, v in new.items() if v.get("state") == "open"}
+        delta = {}
+        if open_new - open_old:
+            delta["new_open_ports"] = sorted(open_new - open_old)
+        if open_old - open_new:
+            delta["closed_ports"] = sorted(open_old - open_new)
+        services = {k: {"old": old[k], "new": new[k]} for k in open_old & open_new if old[k] != new[k]}
+        if services:
+            delta["service_changes"] = services
+        return delta
+
+    if section == "HTTP":
+        delta = {}
+        if old.get("status") != new.get("status"):
+            delta["status"] = {"old": old.get("status"), "new": new.get("status")}
+        headers = _dict_delta(old.get("headers"), new.get("headers"))
+        if headers:
+            delta["headers"] = headers
+        return delta
+
+    if section == "TLS":
+        delta = _dict_delta(old, new)
+        if any(k in delta.get("changed", {}) for k in ("valid_to", "valid_from", "issuer")):
+            delta["rotated"] = True
+        return delta
+
+    if section == "Directories":
+        delta = _dict_delta(old, new)
+        fresh = sorted(p for p, s in new.items() if exposed(s) and not exposed(old.get(p)))
+        if fresh:
+            delta["newly_exposed"] = fresh
+        return delta
+
+    return _dict_delta(old, new)
+
+# ================= SNAPSHOT STORE =================
+
+class SnapshotStore:
+    # index.json holds the per-section hashes of every target, so an unchanged
+    # target is settled by comparing a few hex strings; the full previous
+    # snapshot is only read for sections whose hash moved.
+    def __init__(self, root=SNAPSHOT_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self.index_path = os.path.join(root, "index.json")
+        self.lock = threading.Lock()
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                self.index = json.load(f)
+        except (OSError, ValueError):
+            self.index = {}
+
+    def _path(self, target):
+        # readable name plus a hash of the raw target: targets that sanitize
+        # alike (a.b/x, a.b_x) keep their own baselines
+        digest = hashlib.sha1(target.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.root, f"{report_name(target)}-{digest}.json")
+
+    def load(self, target):
+        # falls back to the name older versions saved under
+        for path in (self._path(target), os.path.join(self.root, report_name(target) + ".json")):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                continue
+        return {}
+
+    def save(self, target, norm, hashes):
+        tmp = self._path(target) + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(norm, f, separators=(",", ":"), default=str)
+        os.replace(tmp, self._path(target))
+        with self.lock:
+            self.index[target] = hashes
+
+    def flush(self):
+        with self.lock:
+            tmp = self.index_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.index, f, separators=(",", ":"))
+            os.replace(tmp, self.index_path)
+
+    def diff(self, target, data, save=True):
+        # {} when nothing changed; otherwise {section: delta}. A target seen
+        # for the first time reports {"new_target": True}.
+        norm = normalize(data)
+        hashes = section_hashes(norm)
+        with self.lock:
+            before = self.index.get(target)
+
+        if before is None:
+            delta = {"new_target": True}
+        else:
+            moved = [s for s in hashes if before.get(s) != hashes[s]]
+            gone = [s for s in before if s not in hashes]
+            delta = {}
+            if moved or gone:
+                previous = self.load(target)
+                for s in moved:
+                    d = diff_section(s, previous.get(s), norm[s])
+                    if d:
+                        delta[s] = d
+                for s in gone:
+                    delta[s] = {"removed": True}
+
+        if save and before != hashes:
+            self.save(target, norm, hashes)
+        return delta
+
+def diff_batch(store, results):
+    changes = {}
+    for target, data in results.items():
+        delta = store.diff(target, data)
+        if delta:
+            changes[target] = delta
+    store.flush()
+    return changes
+
+def changed_only(report, store):
+    # Wraps a report(target, data) callable so it only runs for targets whose
+    # data moved since the last snapshot, with the deltas added as a section.
+    def run(target, data):
+        delta = store.diff(target, data)
+        if not delta:
+            return None
+        return report(target, dict(data, Changes=delta))
+    return run
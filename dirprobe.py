@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+
+import uuid
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from urllib.parse import urljoin
+
+from pool import HostPool
+from reporter import TIMEOUT, USER_AGENT
+
+WORKERS = 16
+# Bytes of body pulled when a response has to be compared against the soft-404.
+PREFIX_BYTES = 1024
+SOFT404_SAMPLES = 2
+MIN_COMPARE = 64
+# HEAD answers that mean "ask again with GET".
+HEAD_UNSUPPORTED = (400, 403, 405, 501)
+
+# ================= WORDLIST =================
+
+def iter_wordlist(path, max_paths=None):
+    # Lines are read lazily so a 100k+ wordlist never sits in memory.
+    count = 0
+    with open(path, encoding="utf-8", errors="ignore") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            yield line if line.startswith("/") else "/" + line
+            count += 1
+            if max_paths and count >= max_paths:
+                return
+
+# ================= REQUESTS =================
+
+class ProbeStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {"head": 0, "get": 0, "body_bytes": 0, "soft404": 0, "hits": 0, "errors": 0}
+
+    def add(self, field, n=1):
+        with self.lock:
+            self.counts[field] += n
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.counts)
+
+def _head(session, url, stats):
+    stats.add("head")
+    return session.head(url, timeout=TIMEOUT, allow_redirects=False,
+                        headers={"User-Agent": USER_AGENT})
+
+def _ranged_get(session, url, stats):
+    # Range keeps compliant servers to PREFIX_BYTES; stream=True plus an early
+    # close keeps the rest off the wire for the ones that ignore it.
+    stats.add("get")
+    r = session.get(url, timeout=TIMEOUT, allow_redirects=False, stream=True,
+                    headers={"User-Agent": USER_AGENT,
+                             "Range": f"bytes=0-{PREFIX_BYTES - 1}"})
+    try:
+        prefix = r.raw.read(PREFIX_BYTES, decode_content=True) or b""
+    finally:
+        r.close()
+    stats.add("body_bytes", len(prefix))
+    return r, prefix
+
+def _length(r):
+    try:
+        return int(r.headers.get("Content-Length"))
+    except (TypeError, ValueError):
+        return None
+
+def _location(r, path):
+    loc = r.headers.get("Location")
+    return loc.replace(path, "{}") if loc else None
+
+def _masked(prefix, path):
+    masked = prefix.replace(path.encode(), b"{}")
+    if len(prefix) >= PREFIX_BYTES:
+        # body was cut off; a reflection of the path may be cut in half at the
+        # end and so escape masking, drop that tail
+        masked = masked[:max(0, len(masked) - len(path))]
+    return masked
+
+def _same_prefix(a, b):
+    n = min(len(a), len(b))
+    # a short prefix on one side only counts if it is the whole body on both
+    if n < MIN_COMPARE and len(a) != len(b):
+        return False
+    return a[:n] == b[:n]
+
+# ================= SOFT-404 =================
+
+class Soft404:
+    # What the host answers for paths that cannot exist. A response is treated
+    # as soft-404 when it matches on status plus redirect target, length or
+    # body prefix (with the requested path masked out in each).
+    def __init__(self):
+        self.statuses = set()
+        self.locations = set()
+        self.lengths = set()
+        self.prefixes = []
+
+    def learn(self, base, session, stats, samples=SOFT404_SAMPLES):
+        for _ in range(samples):
+            path = "/" + uuid.uuid4().hex
+            try:
+                r, prefix = _ranged_get(session, urljoin(base, path), stats)
+            except Exception:
+                continue
+            # Range on a missing path is normally ignored; status 206 is rare
+            # here but fold it back so it compares with HEAD results
+            status = 200 if r.status_code == 206 else r.status_code
+            self.statuses.add(status)
+            loc = _location(r, path)
+            if loc:
+                self.locations.add(loc)
+            n = _length(r)
+            if n is not None and r.status_code != 206:
+                self.lengths.add(n - len(path))
+                self.lengths.add(n)
+            self.prefixes.append(_masked(prefix, path))
+        return self
+
+    def needs_body(self, status, r, path):
+        # None: decided soft-404; False: real hit; True: compare body prefix
+        if status not in self.statuses:
+            return False
+        if 300 <= status < 400:
+            return None if _location(r, path) in self.locations else False
+        n = _length(r)
+        if n is not None and (n in self.lengths or n - len(path) in self.lengths):
+            return None
+        return True
+
+    def matches_prefix(self, prefix, path):
+        masked = _masked(prefix, path)
+        return any(_same_prefix(masked, fp) for fp in self.prefixes)
+
+# ================= PROBING =================
+
+# What a miss is reported as under misses=True; a soft-404 answer (often a
+# 200) is reported as what it means, not as what it said.
+MISS = 404
+
+def probe_path(base, path, session, soft, stats, misses=False):
+    url = urljoin(base, path)
+    try:
+        r = _head(session, url, stats)
+        status = r.status_code
+        if status in HEAD_UNSUPPORTED and status not in soft.statuses:
+            r, prefix = _ranged_get(session, url, stats)
+            status = 200 if r.status_code == 206 else r.status_code
+        else:
+            prefix = None
+
+        if status == 404:
+            return MISS if misses else None
+        verdict = soft.needs_body(status, r, path)
+        if verdict is True:
+            if prefix is None:
+                r, prefix = _ranged_get(session, url, stats)
+            verdict = None if soft.matches_prefix(prefix, path) else False
+        if verdict is None:
+            stats.add("soft404")
+            return MISS if misses else None
+
+        stats.add("hits")
+        return status
+    except Exception:
+        stats.add("errors")
+        return "error"
+
+def dirscan(base, wordlist, session=None, max_paths=None, workers=WORKERS, stats=None, misses=False):
+    # wordlist: path to a file, or any iterable of paths. Only hits (and
+    # errors) are kept, so the result grows with findings, not with the list;
+    # misses=True lists every path, misses as MISS, for short fixed lists.
+    own = session is None
+    session = session or HostPool(per_host=workers)
+    stats = stats or ProbeStats()
+    paths = iter_wordlist(wordlist, max_paths) if isinstance(wordlist, str) else iter(wordlist)
+    results = {}
+
+    try:
+        soft = Soft404().learn(base, session, stats)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            # keep at most 2*workers paths in flight; the iterator feeds the rest.
+            # Each probe runs in a copy of this context, so its bytes and
+            # connections are credited to the stage being measured.
+            inflight = {}
+            for path in paths:
+                ctx = contextvars.copy_context()
+                inflight[pool.submit(ctx.run, probe_path, base, path, session, soft, stats, misses)] = path
+                if len(inflight) >= workers * 2:
+                    done, _ = wait(inflight, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        _collect(results, inflight.pop(fut), fut.result())
+            for fut in list(inflight):
+                _collect(results, inflight.pop(fut), fut.result())
+    finally:
+        if own:
+            session.close()
+    return results
+
+def _collect(results, path, status):
+    if status is not None:
+        results[path] = status
@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+
+import time
+import random
+import socket
+import struct
+import asyncio
+import threading
+import ipaddress
+
+import metrics
+
+NAMESERVERS = None          # None: read /etc/resolv.conf
+QUERY_TIMEOUT = 2.0
+ATTEMPTS = 2
+NEGATIVE_TTL = 60           # NXDOMAIN/NODATA without an SOA to take it from
+MAX_TTL = 86400
+CONCURRENCY = 100          # names in flight; each name is up to 6 queries
+
+TYPES = {"A": 1, "NS": 2, "CNAME": 5, "SOA": 6, "MX": 15, "TXT": 16, "AAAA": 28}
+TYPE_NAMES = {v: k for k, v in TYPES.items()}
+RECORD_TYPES = ("A", "AAAA", "CNAME", "MX", "TXT", "NS")
+ADDRESS_TYPES = ("A", "AAAA")
+
+NOERROR, SERVFAIL, NXDOMAIN = 0, 2, 3
+RCODES = {1: "FORMERR", 2: "SERVFAIL", 3: "NXDOMAIN", 4: "NOTIMP", 5: "REFUSED"}
+
+# ================= CONFIG =================
+
+def resolv_conf(path="/etc/resolv.conf"):
+    # nameservers, search list and ndots, read the way the libc stub resolver
+    # reads them (the last search/domain line wins)
+    conf = {"nameservers": [], "search": [], "ndots": 1}
+    try:
+        with open(path) as f:
+            for line in f:
+                parts = line.split("#", 1)[0].split()
+                if len(parts) < 2:
+                    continue
+                if parts[0] == "nameserver":
+                    conf["nameservers"].append(parts[1])
+                elif parts[0] in ("search", "domain"):
+                    conf["search"] = [d.rstrip(".").lower() for d in parts[1:]]
+                elif parts[0] == "options":
+                    for opt in parts[1:]:
+                        if opt.startswith("ndots:") and opt[6:].isdigit():
+                            conf["ndots"] = min(int(opt[6:]), 15)
+    except OSError:
+        pass
+    conf["nameservers"] = conf["nameservers"] or ["127.0.0.1"]
+    return conf
+
+def hosts_file(path="/etc/hosts"):
+    found = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                parts = line.split("#", 1)[0].split()
+                for name in parts[1:]:
+                    found.setdefault(name.lower(), []).append(parts[0])
+    except OSError:
+        pass
+    return found
+
+# ================= WIRE FORMAT =================
+
+def encode_name(name):
+    out = b""
+    for label in name.rstrip(".").split("."):
+        raw = label.encode("idna") if label else b""
+        out += bytes([len(raw)]) + raw
+    return out + b"\0"
+
+def build_query(qid, name, qtype):
+    header = struct.pack("!HHHHHH", qid, 0x0100, 1, 0, 0, 0)  # RD set
+    return header + encode_name(name) + struct.pack("!HH", qtype, 1)
+
+def _read_name(msg, off):
+    labels = []
+    jumped = False
+    end = off
+    for _ in range(128):
+        n = msg[off]
+        if n & 0xC0 == 0xC0:
+            if not jumped:
+                end = off + 2
+            off = ((n & 0x3F) << 8) | msg[off + 1]
+            jumped = True
+            continue
+        if n == 0:
+            if not jumped:
+                end = off + 1
+            return ".".join(labels), end
+        labels.append(msg[off + 1:off + 1 + n].decode("latin-1"))
+        off += n + 1
+    raise ValueError("name compression loop")
+
+def _rdata(msg, rtype, off, length):
+    if rtype == 1:
+        return socket.inet_ntop(socket.AF_INET, msg[off:off + 4])
+    if rtype == 28:
+        return socket.inet_ntop(socket.AF_INET6, msg[off:off + 16])
+    if rtype in (2, 5):
+        return _read_name(msg, off)[0]
+    if rtype == 15:
+        pref = struct.unpack("!H", msg[off:off + 2])[0]
+        return {"preference": pref, "exchange": _read_name(msg, off + 2)[0]}
+    if rtype == 16:
+        parts, i = [], off
+        while i < off + length:
+            n = msg[i]
+            parts.append(msg[i + 1:i + 1 + n].decode("utf-8", "replace"))
+            i += n + 1
+        return "".join(parts)
+    if rtype == 6:
+        _mname, i = _read_name(msg, off)
+        _rname, i = _read_name(msg, i)
+        return {"minimum": struct.unpack("!5I", msg[i:i + 20])[4]}
+    return msg[off:off + length].hex()
+
+def parse_response(msg):
+    qid, flags, qd, an, ns, _ar = struct.unpack("!HHHHHH", msg[:12])
+    off = 12
+    for _ in range(qd):
+        _, off = _read_name(msg, off)
+        off += 4
+    sections = []
+    for count in (an, ns):
+        records = []
+        for _ in range(count):
+            name, off = _read_name(msg, off)
+            rtype, _cls, ttl, length = struct.unpack("!HHIH", msg[off:off + 10])
+            off += 10
+            records.append((name, rtype, ttl, _rdata(msg, rtype, off, length)))
+            off += length
+        sections.append(records)
+    return {
+        "id": qid,
+        "truncated": bool(flags & 0x0200),
+        "rcode": flags & 0x000F,
+        "answers": sections[0],
+        "authority": sections[1],
+    }
+
+# ================= TRANSPORT =================
+
+class _UDPProtocol(asyncio.DatagramProtocol):
+    def __init__(self):
+        self.pending = {}
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        if len(data) < 12:
+            return
+        fut = self.pending.pop(struct.unpack("!H", data[:2])[0], None)
+        if fut and not fut.done():
+            fut.set_result(data)
+
+    def error_received(self, exc):
+        pass
+
+async def _query_tcp(ns, port, packet, timeout):
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(ns, port), timeout)
+    try:
+        writer.write(struct.pack("!H", len(packet)) + packet)
+        await writer.drain()
+        size = struct.unpack("!H", await asyncio.wait_for(reader.readexactly(2), timeout))[0]
+        return await asyncio.wait_for(reader.readexactly(size), timeout)
+    finally:
+        writer.close()
+
+# ================= RESOLVER =================
+
+class Resolver:
+    # One shared instance (see get_resolver) holds the cache for every stage.
+    # The cache and the per-loop UDP sockets are guarded by a lock because
+    # stages call in from worker threads, each on its own event loop.
+    def __init__(self, nameservers=None, port=53, timeout=QUERY_TIMEOUT, attempts=ATTEMPTS,
+                 search=None, ndots=None):
+        conf = resolv_conf()
+        self.nameservers = nameservers or NAMESERVERS or conf["nameservers"]
+        self.search = conf["search"] if search is None else list(search)
+        self.ndots = conf["ndots"] if ndots is None else ndots
+        self.port = port
+        self.timeout = timeout
+        self.attempts = attempts
+        self.hosts = hosts_file()
+        self.cache = {}
+        self.lock = threading.Lock()
+        self.endpoints = {}
+        self.stats = {"queries": 0, "cache_hits": 0, "negative_hits": 0, "tcp": 0, "timeouts": 0}
+
+    # ---------- cache ----------
+
+    def _cached(self, key):
+        with self.lock:
+            hit = self.cache.get(key)
+            if hit is None:
+                return None
+            if hit[0] < time.monotonic():
+                del self.cache[key]
+                return None
+            self.stats["cache_hits"] += 1
+            if hit[1] != NOERROR or not hit[2]:
+                self.stats["negative_hits"] += 1
+            return hit[1], hit[2]
+
+    def _store(self, key, rcode, records, ttl):
+        with self.lock:
+            self.cache[key] = (time.monotonic() + min(ttl, MAX_TTL), rcode, records)
+
+    def purge(self):
+        now = time.monotonic()
+        with self.lock:
+            for key in [k for k, v in self.cache.items() if v[0] < now]:
+                del self.cache[key]
+
+    # ---------- wire ----------
+
+    async def _endpoint(self, ns):
+        loop = asyncio.get_running_loop()
+        key = (id(loop), ns)
+        with self.lock:
+            ep = self.endpoints.get(key)
+        if ep is None or ep[0] is not loop or ep[1].transport.is_closing():
+            family = socket.AF_INET6 if ":" in ns else socket.AF_INET
+            _t, proto = await loop.create_datagram_endpoint(
+                _UDPProtocol, remote_addr=(ns, self.port), family=family)
+            ep = (loop, proto)
+            # only this loop's coroutines use this key, and they run one at a time
+            with self.lock:
+                self.endpoints[key] = ep
+        return ep[1]
+
+    async def _exchange(self, name, qtype):
+        last = None
+        for attempt in range(self.attempts):
+            for ns in self.nameservers:
+                proto = await self._endpoint(ns)
+                qid = random.randrange(65536)
+                while qid in proto.pending:
+                    qid = random.randrange(65536)
+                packet = build_query(qid, name, qtype)
+                fut = asyncio.get_running_loop().create_future()
+                proto.pending[qid] = fut
+                with self.lock:
+                    self.stats["queries"] += 1
+                try:
+                    proto.transport.sendto(packet)
+                    metrics.add("bytes_out", len(packet))
+                    data = await asyncio.wait_for(fut, self.timeout)
+                    metrics.add("bytes_in", len(data))
+                    resp = parse_response(data)
+                except asyncio.TimeoutError:
+                    proto.pending.pop(qid, None)
+                    with self.lock:
+                        self.stats["timeouts"] += 1
+                    metrics.add("retries")
+                    last = "timed out"
+                    continue
+                if resp["truncated"]:
+                    with self.lock:
+                        self.stats["tcp"] += 1
+                    metrics.add("connections")
+                    metrics.add("bytes_out", len(packet) + 2)
+                    data = await _query_tcp(ns, self.port, packet, self.timeout)
+                    metrics.add("bytes_in", len(data) + 2)
+                    resp = parse_response(data)
+                if resp["rcode"] == SERVFAIL:
+                    metrics.add("retries")
+                    last = "SERVFAIL"
+                    continue
+                return resp
+        raise OSError(f"{name}: {last or 'no nameserver answered'}")
+
+    async def query(self, name, rtype):
+        name = name.rstrip(".").lower()
+        key = (name, rtype)
+        hit = self._cached(key)
+        if hit is not None:
+            return hit
+
+        qtype = TYPES[rtype]
+        resp = await self._exchange(name, qtype)
+        records = [r[3] for r in resp["answers"] if r[1] == qtype]
+        if records:
+            ttl = min(r[2] for r in resp["answers"] if r[1] == qtype)
+        else:
+            # negative answer: RFC 2308, SOA minimum capped by the SOA's own TTL
+            soa = [r for r in resp["authority"] if r[1] == TYPES["SOA"]]
+            ttl = min(soa[0][2], soa[0][3]["minimum"]) if soa else NEGATIVE_TTL
+        self._store(key, resp["rcode"], records, ttl)
+        return resp["rcode"], records
+
+    def candidates(self, name):
+        # resolv.conf order: a name with at least ndots dots is tried as given
+        # first, a shorter one through the search list first; a trailing dot
+        # turns the search list off
+        if name.endswith("."):
+            return [name.rstrip(".")]
+        searched = [f"{name}.{domain}" for domain in self.search]
+        return [name] + searched if name.count(".") >= self.ndots else searched + [name]
+
+    async def _resolve_as(self, name, qname, types):
+        # None on NXDOMAIN, so the next search candidate is tried
+        result = {"name": name}
+        if qname != name:
+            result["fqdn"] = qname
+        found = await asyncio.gather(*(self.query(qname, t) for t in types), return_exceptions=True)
+        for t, r in zip(types, found):
+            if isinstance(r, Exception):
+                result[t] = []
+                result.setdefault("errors", {})[t] = str(r)
+                continue
+            rcode, records = r
+            if rcode == NXDOMAIN:
+                return None
+            result[t] = records
+        if "errors" in result and not any(result[t] for t in types):
+            return {"error": next(iter(result["errors"].values()))}
+        return result
+
+    async def resolve(self, name, types=RECORD_TYPES):
+        try:
+            addrs = [str(ipaddress.ip_address(name))]
+        except ValueError:
+            addrs = self.hosts.get(name.rstrip(".").lower())
+        if addrs:
+            # literals and /etc/hosts entries never go on the wire
+            result = {"name": name}
+            result.update({t: [] for t in types})
+            result["A"] = [a for a in addrs if ":" not in a]
+            result["AAAA"] = [a for a in addrs if ":" in a]
+            return result
+
+        # the first candidate with records wins; NODATA everywhere gives the
+        # first name that exists
+        nodata = None
+        for qname in self.candidates(name):
+            result = await self._resolve_as(name, qname, types)
+            if result is None:
+                continue
+            if "error" in result or any(result[t] for t in types):
+                return result
+            nodata = nodata or result
+        return nodata or {"error": f"{name}: NXDOMAIN"}
+
+    async def resolve_many(self, names, types=RECORD_TYPES, concurrency=CONCURRENCY):
+        sem = asyncio.Semaphore(concurrency)
+
+        async def one(n):
+            async with sem:
+                return await self.resolve(n, types)
+
+        names = list(dict.fromkeys(names))
+        return dict(zip(names, await asyncio.gather(*(one(n) for n in names))))
+
+    async def _closing(self, coro):
+        # asyncio.run() throws the loop away afterwards, drop its sockets too
+        try:
+            return await coro
+        finally:
+            loop_id = id(asyncio.get_running_loop())
+            with self.lock:
+                mine = [self.endpoints.pop(k) for k in list(self.endpoints) if k[0] == loop_id]
+            for _loop, proto in mine:
+                proto.transport.close()
+
+    def lookup(self, name, types=RECORD_TYPES):
+        return asyncio.run(self._closing(self.resolve(name, types)))
+
+    # ---------- sockets ----------
+
+    def address(self, name):
+        # where a socket for `name` connects: the lowest A (else AAAA)
+        # address, from the cache the DNS stage filled, so every stage uses
+        # the answer the report shows. A name this resolver cannot answer
+        # comes back as it is, for the system resolver to try.
+        try:
+            return str(ipaddress.ip_address(name))
+        except ValueError:
+            pass
+        try:
+            return _pick_address(name, self.lookup(name, ADDRESS_TYPES))
+        except Exception:
+            return name
+
+    async def address_async(self, name):
+        # address() for a coroutine on a long-lived loop (asyncprobe's)
+        try:
+            return str(ipaddress.ip_address(name))
+        except ValueError:
+            pass
+        try:
+            return _pick_address(name, await self.resolve(name, ADDRESS_TYPES))
+        except Exception:
+            return name
+
+    def lookup_many(self, names, types=RECORD_TYPES, concurrency=CONCURRENCY):
+        return asyncio.run(self._closing(self.resolve_many(names, types, concurrency)))
+
+_default = None
+_default_lock = threading.Lock()
+
+def get_resolver():
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = Resolver()
+        return _default
+
+def _pick_address(name, result):
+    for rtype in ADDRESS_TYPES:
+        found = sorted(result.get(rtype) or (), key=ipaddress.ip_address)
+        if found:
+            return found[0]
+    return name
@@ -0,0 +1,14 @@
+#!/usr/bin/env python3
+
+# ================= SCOPE =================
+
+def load_scope(path):
+    targets = []
+    seen = set()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line and line not in seen:
+                seen.add(line)
+                targets.append(line)
+    return targets
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+
+import math
+import hashlib
+import ipaddress
+import threading
+
+# Bounds on how far one run can fan out from its seed targets.
+MAX_DEPTH = 2           # names found from names found from a seed
+MAX_NEW = 1000          # new targets queued per run
+EXACT_LIMIT = 100000    # names held exactly before the seen-set goes Bloom-only
+BLOOM_CAPACITY = 1000000
+BLOOM_ERROR = 0.001
+SHOWN = 50              # out-of-scope names kept in a target's section
+
+# ================= ALLOWLIST =================
+
+class Allowlist:
+    # Operator scope: domains (the name and everything under it) and CIDRs
+    # (IP literals, e.g. IP SANs). A hostname is judged by name only; the
+    # address it resolves to is not checked against the CIDRs.
+    def __init__(self, entries=()):
+        self.domains = set()
+        networks = []
+        for entry in entries:
+            entry = entry.split("#", 1)[0].strip().lower().rstrip(".")
+            if not entry:
+                continue
+            try:
+                networks.append(ipaddress.ip_network(entry, strict=False))
+            except ValueError:
+                self.domains.add(entry[2:] if entry.startswith("*.") else entry)
+        self.networks = {4: [], 6: []}
+        for net in networks:
+            self.networks[net.version].append(net)
+        for v in self.networks:
+            self.networks[v] = list(ipaddress.collapse_addresses(self.networks[v]))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            return cls(f)
+
+    def __len__(self):
+        return len(self.domains) + len(self.networks[4]) + len(self.networks[6])
+
+    def allows(self, name):
+        try:
+            ip = ipaddress.ip_address(name)
+        except ValueError:
+            labels = name.split(".")
+            # one set lookup per suffix: a.b.example.com, b.example.com, ...
+            return any(".".join(labels[i:]) in self.domains for i in range(len(labels)))
+        return any(ip in net for net in self.networks[ip.version])
+
+# ================= SEEN SET =================
+
+class BloomFilter:
+    def __init__(self, capacity=BLOOM_CAPACITY, error_rate=BLOOM_ERROR):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        # double hashing over one 128-bit digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for p in self._positions(key):
+            self.bits[p >> 3] |= 1 << (p & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+class SeenSet:
+    # Exact up to exact_limit names, then the Bloom filter alone, so memory
+    # stays bounded however wide the fan-out. A name is never scanned twice;
+    # past the limit a new name is taken for seen with probability
+    # ~error_rate and dropped.
+    def __init__(self, exact_limit=EXACT_LIMIT, capacity=BLOOM_CAPACITY, error_rate=BLOOM_ERROR):
+        self.exact_limit = exact_limit
+        self.exact = set()
+        self.bloom = BloomFilter(capacity, error_rate)
+        self.lock = threading.Lock()
+
+    def add(self, name):
+        # True if the name was not seen before
+        with self.lock:
+            if name in self.exact:
+                return False
+            if len(self.exact) >= self.exact_limit and name in self.bloom:
+                return False
+            self.bloom.add(name)
+            if len(self.exact) < self.exact_limit:
+                self.exact.add(name)
+            return True
+
+# ================= EXPANDER =================
+
+def clean_name(name):
+    return str(name).strip().lower().rstrip(".")
+
+def discovered_names(data):
+    # (names, wildcards) from certificate SANs, CNAME targets and NS/MX hosts
+    names, wildcards = [], []
+    tls = data.get("TLS")
+    if isinstance(tls, dict):
+        names += tls.get("san") or []
+    dns = data.get("DNS")
+    if isinstance(dns, dict):
+        names += dns.get("CNAME") or []
+        names += dns.get("NS") or []
+        names += [mx.get("exchange") if isinstance(mx, dict) else mx for mx in dns.get("MX") or []]
+    out = []
+    for n in dict.fromkeys(clean_name(n) for n in names if n):
+        if n.startswith("*."):
+            wildcards.append(n)
+        elif n:
+            out.append(n)
+    return out, wildcards
+
+class Expander:
+    # Feeds in-scope names found while scanning one target back into the
+    # same run (see Pipeline's Expansion stage). Seeds are marked seen first.
+    def __init__(self, allowlist, max_depth=MAX_DEPTH, max_new=MAX_NEW, seen=None):
+        self.allowlist = allowlist
+        self.max_depth = max_depth
+        self.max_new = max_new
+        self.seen = seen or SeenSet()
+        self.lock = threading.Lock()
+        self.queued = 0
+        self.capped = 0
+
+    def seed(self, targets):
+        from reporter import target_host
+        for t in targets:
+            self.seen.add(target_host(t))
+
+    def expand(self, data, depth=0):
+        # (section, new targets to queue)
+        names, wildcards = discovered_names(data)
+        in_scope = [n for n in names if self.allowlist.allows(n)]
+        allowed = set(in_scope)
+        out_of_scope = sorted(n for n in names if n not in allowed)
+        queued = []
+        if depth < self.max_depth:
+            for n in in_scope:
+                if not self.seen.add(n):
+                    continue
+                with self.lock:
+                    if self.queued >= self.max_new:
+                        self.capped += 1
+                        continue
+                    self.queued += 1
+                queued.append(n)
+        section = {
+            "names": sorted(in_scope),
+            "queued": sorted(queued),
+            "out_of_scope": out_of_scope[:SHOWN],
+        }
+        if len(out_of_scope) > SHOWN:
+            section["out_of_scope_total"] = len(out_of_scope)
+        if wildcards:
+            section["wildcards"] = sorted(wildcards)
+        if depth >= self.max_depth and in_scope:
+            section["depth_limit"] = True
+        return section, queued
+
+    def stats(self):
+        with self.lock:
+            return {"queued": self.queued, "capped": self.capped}
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+
+import time
+import ipaddress
+import threading
+
+# Stages that talk to an address rather than a name run once per IP and
+# their result is copied to every name on it. HTTP (Host header), TLS (SNI)
+# and directory probes stay per name.
+SHARED = ("Liveness", "Nmap")
+
+# How long one address's result is handed to further names. Covers a batch;
+# a daemon job much later scans the address again.
+SHARE_TTL = 900
+
+def addresses(dns):
+    # IPv4 first, each family in address order, from a resolve_dns result
+    if not isinstance(dns, dict) or "error" in dns:
+        return []
+    found = []
+    for rtype in ("A", "AAAA"):
+        ips = []
+        for a in dns.get(rtype) or ():
+            try:
+                ips.append(ipaddress.ip_address(a))
+            except ValueError:
+                continue
+        found += [str(ip) for ip in sorted(set(ips))]
+    return found
+
+def is_ip(host):
+    try:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
+        return False
+
+# ================= INDEX =================
+
+class HostIndex:
+    # One shared instance (see get_index). observe() learns name -> address
+    # from DNS results; share() wraps a stage so concurrent and later calls
+    # for names on the same address wait for and reuse one run.
+    def __init__(self, ttl=SHARE_TTL):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.address = {}
+        self.names = {}
+        self.results = {}
+        self.running = {}
+        self.runs = 0
+        self.reused = 0
+
+    def observe(self, host, dns):
+        found = addresses(dns)
+        if not found or is_ip(host):
+            return
+        # the lowest address, so names behind the same round-robin set agree
+        ip = found[0]
+        with self.lock:
+            old = self.address.get(host)
+            if old and old != ip:
+                self.names[old].discard(host)
+            self.address[host] = ip
+            self.names.setdefault(ip, set()).add(host)
+
+    def observing(self, func):
+        def observed(host):
+            result = func(host)
+            self.observe(host, result)
+            return result
+        return observed
+
+    def ip(self, host):
+        # the address a name is scanned as; the name itself until DNS is in
+        with self.lock:
+            return self.address.get(host, host)
+
+    def hosts(self, ip):
+        with self.lock:
+            return sorted(self.names.get(ip, ()))
+
+    def forget(self, host):
+        # a name no longer being scanned; once no name is left on its address
+        # the address's shared results go too, so the next scan of it runs
+        # (and records, e.g. a liveness verdict) afresh
+        with self.lock:
+            ip = self.address.pop(host, host)
+            names = self.names.get(ip)
+            if names is not None:
+                names.discard(host)
+                if names:
+                    return
+                del self.names[ip]
+            for key in [k for k in self.results if k[1] == ip]:
+                del self.results[key]
+
+    def once(self, key, compute):
+        while True:
+            with self.lock:
+                hit = self.results.get(key)
+                if hit and hit[0] > time.monotonic():
+                    self.reused += 1
+                    return hit[1]
+                running = self.running.get(key)
+                if running is None:
+                    running = self.running[key] = threading.Event()
+                    break
+            running.wait()
+        result = None
+        try:
+            result = compute()
+            return result
+        finally:
+            # a run that raised stores nothing, and the waiters try themselves
+            with self.lock:
+                if result is not None:
+                    self.results[key] = (time.monotonic() + self.ttl, result)
+                    self.runs += 1
+                del self.running[key]
+            running.set()
+
+    def share(self, section, func, params=None):
+        # func(address) once per (section, address, params); each name gets
+        # its own copy, with the address when it differs from the name
+        def shared(host):
+            ip = self.ip(host)
+            result = self.once((section, ip, params), lambda: func(ip))
+            if not isinstance(result, dict):
+                return result
+            return dict(result, address=ip) if ip != host else dict(result)
+        return shared
+
+    def purge(self):
+        now = time.monotonic()
+        with self.lock:
+            for key in [k for k, v in self.results.items() if v[0] < now]:
+                del self.results[key]
+
+    def summary(self):
+        with self.lock:
+            return {
+                "names": len(self.address),
+                "addresses": len(self.names),
+                "shared_addresses": sum(1 for n in self.names.values() if len(n) > 1),
+                "runs": self.runs,
+                "reused": self.reused,
+            }
+
+_default = None
+_default_lock = threading.Lock()
+
+def get_index():
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = HostIndex()
+        return _default
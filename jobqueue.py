@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import time
+import uuid
+import signal
+import sqlite3
+import datetime
+import threading
+import socketserver
+from collections import Counter
+from functools import partial
+
+from pipeline import Pipeline
+from render_farm import summarize
+from metrics import get_metrics
+from hostindex import get_index
+from liveness import get_liveness
+from ratelimit import get_limiter
+from dnsresolver import get_resolver
+from reporter import REPORT_DIR, console, report_name, target_host
+
+SPOOL_DIR = os.path.join(".blacktrace", "spool")
+SOCKET_PATH = os.path.join(".blacktrace", "blacktrace.sock")
+POLL = 2.0
+
+# Spool layout. Writers drop a job into incoming/ with a rename (dot-files
+# and *.tmp are ignored until then); a daemon claims it by renaming it into
+# working/ under its pid, so several daemons can share one spool.
+#
+#   incoming/<id>.json   {"targets": [...], "level": "2"}   (level optional)
+#   incoming/<id>.txt    one target per line, # comments, daemon's level
+#   working/<pid>-<id>.* being scanned; requeued at startup if <pid> is gone
+#   done/<id>.json       result record, see Job.record()
+#   failed/<id>.*        unreadable jobs, with failed/<id>.error
+SPOOL_SUBDIRS = ("incoming", "working", "done", "failed")
+
+def parse_job(raw, level, job_id=None):
+    # a JSON object or a plain target list; raises ValueError
+    raw = raw.strip()
+    if raw.startswith("{"):
+        spec = json.loads(raw)
+        targets = spec.get("targets")
+        if isinstance(targets, str):
+            targets = [targets]
+        level = str(spec.get("level", level))
+        job_id = report_name(str(spec["id"])) if spec.get("id") else job_id
+    else:
+        targets = [line.split("#", 1)[0].strip() for line in raw.splitlines()]
+    targets = [t for t in dict.fromkeys(targets or ()) if isinstance(t, str) and t.strip()]
+    if not targets:
+        raise ValueError("job has no targets")
+    if level not in ("1", "2", "3"):
+        raise ValueError(f"unknown level: {level}")
+    return Job(job_id or new_id(), targets, level)
+
+def new_id():
+    return f"{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+# ================= JOB =================
+
+class Job:
+    def __init__(self, job_id, targets, level):
+        self.id = job_id
+        self.targets = targets
+        self.level = level
+        self.pending = set(targets)
+        self.results = {}
+        self.received = time.time()
+        self.done = threading.Event()
+        self.on_finish = []
+
+    def finish(self, target, data, report):
+        # True once the last target is in
+        self.results[target] = dict(summarize(target, data), report=report)
+        self.pending.discard(target)
+        return not self.pending
+
+    def record(self):
+        return {
+            "id": self.id,
+            "level": self.level,
+            "received": datetime.datetime.fromtimestamp(self.received).isoformat(timespec="seconds"),
+            "finished": datetime.datetime.now().isoformat(timespec="seconds"),
+            "seconds": round(time.time() - self.received, 1),
+            "targets": {t: self.results.get(t) for t in self.targets},
+        }
+
+# ================= DAEMON =================
+
+class Daemon:
+    # One long-lived Pipeline per scan level, fed by the spool and the
+    # socket. A target already in flight at the same level is not scanned
+    # twice: every job waiting on it gets the one result.
+    def __init__(self, level="1", output=REPORT_DIR, cache=None, sink=None, farm=None, store=None,
+                 async_http=False, wordlist=None, nmap_shards=None):
+        self.level = level
+        self.async_http = async_http
+        self.wordlist = wordlist
+        self.nmap_shards = nmap_shards
+        self.output = output
+        self.cache = cache
+        self.sink = sink
+        self.farm = farm
+        self.store = store
+        self.pipes = {}
+        self.waiting = {}
+        self.hosts = Counter()
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.idle = threading.Condition(self.lock)
+        self.stopping = threading.Event()
+        self.done_jobs = 0
+
+    def _pipeline(self, level):
+        with self.lock:
+            pipe = self.pipes.get(level)
+            if pipe is None:
+                report = None
+                if self.farm:
+                    report = self.farm.render
+                    if self.store:
+                        from diffscan import changed_only
+                        report = changed_only(report, self.store)
+                pipe = Pipeline(level, report=report, cache=self.cache, sink=self.sink,
+                                workers={"Report": self.farm.workers} if self.farm else None,
+                                on_done=partial(self._done, level), async_http=self.async_http,
+                                wordlist=self.wordlist, nmap_shards=self.nmap_shards)
+                pipe.start()
+                self.pipes[level] = pipe
+            return pipe
+
+    def submit(self, job):
+        pipe = self._pipeline(job.level)
+        fresh = []
+        with self.lock:
+            if self.stopping.is_set():
+                raise RuntimeError("daemon is shutting down")
+            self.jobs[job.id] = job
+            for t in job.targets:
+                key = (job.level, t)
+                if key not in self.waiting:
+                    fresh.append(t)
+                    self.hosts[target_host(t)] += 1
+                self.waiting.setdefault(key, []).append(job)
+        for t in fresh:
+            pipe.submit(t)
+        console.print(f"[cyan][*] job {job.id}: {len(job.targets)} target(s) at level {job.level}"
+                      f"{f', {len(job.targets) - len(fresh)} already in flight' if len(fresh) < len(job.targets) else ''}"
+                      f"[/cyan]")
+        return job
+
+    def _done(self, level, pipe_job):
+        # runs on a pipeline worker thread; must not raise
+        finished = []
+        host = target_host(pipe_job["target"])
+        with self.lock:
+            for job in self.waiting.pop((level, pipe_job["target"]), []):
+                if job.finish(pipe_job["target"], pipe_job["data"], pipe_job.get("report")):
+                    self.jobs.pop(job.id, None)
+                    finished.append(job)
+            self.hosts[host] -= 1
+            idle = self.hosts[host] <= 0
+            if idle:
+                del self.hosts[host]
+        if idle:
+            self._forget(host)
+        for job in finished:
+            for callback in job.on_finish:
+                try:
+                    callback(job)
+                except Exception as e:
+                    console.print(f"[red][!] job {job.id}: {e}[/red]")
+            job.done.set()
+        if finished:
+            self._checkpoint()
+            with self.lock:
+                self.done_jobs += len(finished)
+                self.idle.notify_all()
+            for job in finished:
+                console.print(f"[green][*] job {job.id} done in {time.time() - job.received:.1f}s[/green]")
+
+    def _forget(self, host):
+        # the last target on this host is done: per-host state goes, and the
+        # address's too once no other name in flight is on it
+        index = get_index()
+        ip = index.ip(host)
+        index.forget(host)
+        gone = [host] if ip == host or index.hosts(ip) else [host, ip]
+        get_liveness().forget(gone)
+        get_limiter().forget(gone)
+
+    def _checkpoint(self):
+        try:
+            if self.store:
+                self.store.flush()
+            if self.cache:
+                self.cache.prune()
+            get_metrics().write_textfile(os.path.join(self.output, "metrics.prom"))
+            # shared per-address results and DNS answers past their TTL
+            get_index().purge()
+            get_resolver().purge()
+        except (OSError, sqlite3.Error) as e:
+            console.print(f"[red][!] checkpoint failed: {e}[/red]")
+
+    def status(self):
+        with self.lock:
+            return {
+                "jobs": {j.id: {"targets": len(j.targets), "pending": len(j.pending)} for j in self.jobs.values()},
+                "in_flight": len(self.waiting),
+                "done_jobs": self.done_jobs,
+                "stages": {level: pipe.stats() for level, pipe in self.pipes.items()},
+                "stopping": self.stopping.is_set(),
+            }
+
+    def drain(self, timeout=None):
+        # stop taking jobs and wait for the ones already in
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.idle:
+            self.stopping.set()
+            while self.waiting:
+                left = None if deadline is None else deadline - time.monotonic()
+                if left is not None and left <= 0:
+                    return False
+                self.idle.wait(left)
+        for pipe in self.pipes.values():
+            pipe.stop()
+        return True
+
+# ================= SPOOL =================
+
+class Spool:
+    def __init__(self, daemon, root=SPOOL_DIR, poll=POLL):
+        self.daemon = daemon
+        self.root = root
+        self.poll = poll
+        self.pid = os.getpid()
+        for sub in SPOOL_SUBDIRS:
+            os.makedirs(os.path.join(root, sub), exist_ok=True)
+
+    def _dir(self, sub):
+        return os.path.join(self.root, sub)
+
+    def recover(self):
+        # jobs claimed by a daemon that died go back to incoming/
+        n = 0
+        for name in os.listdir(self._dir("working")):
+            pid, _, rest = name.partition("-")
+            if not pid.isdigit() or not rest or _pid_alive(int(pid)):
+                continue
+            try:
+                os.replace(os.path.join(self._dir("working"), name), os.path.join(self._dir("incoming"), rest))
+                n += 1
+            except OSError:
+                pass
+        return n
+
+    def _incoming(self):
+        entries = []
+        with os.scandir(self._dir("incoming")) as it:
+            for e in it:
+                if e.is_file() and not e.name.startswith(".") and not e.name.endswith(".tmp"):
+                    entries.append((e.stat().st_mtime, e.name))
+        return [name for _m, name in sorted(entries)]
+
+    def _fail(self, path, name, error):
+        os.replace(path, os.path.join(self._dir("failed"), name))
+        with open(os.path.join(self._dir("failed"), os.path.splitext(name)[0] + ".error"), "w", encoding="utf-8") as f:
+            f.write(f"{error}\n")
+        console.print(f"[red][!] spool job {name} failed: {error}[/red]")
+
+    def claim(self, name):
+        src = os.path.join(self._dir("incoming"), name)
+        path = os.path.join(self._dir("working"), f"{self.pid}-{name}")
+        try:
+            os.rename(src, path)
+        except OSError:
+            return None  # another daemon got it
+        try:
+            with open(path, encoding="utf-8") as f:
+                job = parse_job(f.read(), self.daemon.level, os.path.splitext(name)[0])
+        except (OSError, UnicodeDecodeError, ValueError) as e:
+            self._fail(path, name, e)
+            return None
+        job.on_finish.append(partial(self._finish, path))
+        return job
+
+    def _finish(self, path, job):
+        out = os.path.join(self._dir("done"), f"{job.id}.json")
+        with open(out + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(job.record(), f, indent=2, default=str)
+        os.replace(out + ".tmp", out)
+        os.remove(path)
+
+    def run(self):
+        while not self.daemon.stopping.is_set():
+            for name in self._incoming():
+                if self.daemon.stopping.is_set():
+                    break
+                job = self.claim(name)
+                if not job:
+                    continue
+                try:
+                    self.daemon.submit(job)
+                except RuntimeError:
+                    # stopped since the check above; the file stays in
+                    # working/ and the next daemon's recover() requeues it
+                    console.print(f"[yellow][*] spool job {name} left for the next daemon[/yellow]")
+                    return
+            self.daemon.stopping.wait(self.poll)
+
+# ================= SOCKET =================
+
+# One JSON object per line in each direction:
+#   {"targets": [...], "level": "2", "wait": true}  -> {"id": ..., "queued": n}
+#                                                     then, with wait, the job record
+#   {"cmd": "status"}                               -> Daemon.status()
+
+class _Handler(socketserver.StreamRequestHandler):
+    def _send(self, obj):
+        self.wfile.write((json.dumps(obj, default=str) + "\n").encode("utf-8"))
+        self.wfile.flush()
+
+    def handle(self):
+        daemon = self.server.daemon
+        for line in self.rfile:
+            line = line.decode("utf-8", "replace").strip()
+            if not line:
+                continue
+            try:
+                spec = json.loads(line)
+                if not isinstance(spec, dict):
+                    raise ValueError("expected a JSON object")
+                if spec.get("cmd") == "status":
+                    self._send(daemon.status())
+                    continue
+                job = daemon.submit(parse_job(line, daemon.level))
+            except (ValueError, RuntimeError) as e:
+                self._send({"error": str(e)})
+                continue
+            self._send({"id": job.id, "queued": len(job.targets)})
+            if spec.get("wait"):
+                job.done.wait()
+                self._send(job.record())
+
+class SocketServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, daemon, path=SOCKET_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            os.remove(path)  # stale from a previous run
+        super().__init__(path, _Handler)
+        os.chmod(path, 0o600)
+        self.daemon = daemon
+        self.path = path
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+# ================= RUN =================
+
+def serve(daemon, spool=None, socket_path=None):
+    # Blocks until SIGTERM/SIGINT; the first one finishes the jobs already
+    # taken, a second one exits at once (claimed spool jobs are requeued by
+    # the next daemon to start).
+    def stop(signum, frame):
+        if daemon.stopping.is_set():
+            console.print("[red][!] exiting without waiting[/red]")
+            os._exit(1)
+        console.print("[yellow][*] stopping: finishing jobs in flight...[/yellow]")
+        daemon.stopping.set()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    server = SocketServer(daemon, socket_path).start() if socket_path else None
+    if spool:
+        requeued = spool.recover()
+        if requeued:
+            console.print(f"[yellow][*] requeued {requeued} job(s) left by a stopped daemon[/yellow]")
+    console.print(f"[cyan][*] daemon {os.getpid()} waiting for jobs"
+                  f"{f' in {spool.root}' if spool else ''}{f' on {socket_path}' if socket_path else ''}[/cyan]")
+    try:
+        if spool:
+            spool.run()
+        else:
+            while not daemon.stopping.wait(1.0):
+                pass
+    finally:
+        if server:
+            server.close()
+        daemon.drain()
+        daemon._checkpoint()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import time
+import datetime
+import threading
+
+JOURNAL_NAME = "journal.jsonl"
+
+# Group commit: appends go to the file buffer at once and are fsynced
+# together every SYNC_INTERVAL seconds, or sooner once SYNC_EVERY records are
+# waiting. A crash loses at most that window, and those stages simply run
+# again on --resume.
+SYNC_INTERVAL = 0.2
+SYNC_EVERY = 2000
+
+# Stages whose result is also in-process state (liveness verdicts gate the
+# stages after it) or is worked out from the others (Risk), so a target that
+# still has work reruns them on resume.
+VOLATILE = ("Liveness", "Risk")
+
+# Record layout, one JSON object per line:
+#
+#   {"type": "run",    "level": str, "started": ISO-8601, "compacted": bool}
+#                      again for each resumed run; the last one counts
+#   {"type": "stage",  "target": str, "stage": str, "data": object}
+#   {"type": "target", "target": str}                  every stage is in
+#   {"type": "done",   "target": str, "data": {...}}   compacted target
+#
+# A torn last line (the process died mid-write) is ignored on replay.
+
+def replay(path):
+    # (header, {target: {stage: data}}, {finished targets})
+    header, data, finished = None, {}, set()
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return None, data, finished
+    with f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            kind = rec.get("type")
+            if kind == "run":
+                header = rec
+            elif kind == "stage":
+                data.setdefault(rec["target"], {})[rec["stage"]] = rec["data"]
+            elif kind == "target":
+                finished.add(rec["target"])
+            elif kind == "done":
+                data[rec["target"]] = rec["data"]
+                finished.add(rec["target"])
+    return header, data, finished
+
+def interrupted(path):
+    # True when the last run in path never got to compact(); only run
+    # records are parsed
+    header = None
+    try:
+        with open(path, "rb") as f:
+            for line in f:
+                if b'"type":"run"' not in line:
+                    continue
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue
+                if rec.get("type") == "run":
+                    header = rec
+    except FileNotFoundError:
+        return False
+    return header is not None and not header.get("compacted")
+
+def resume_state(path, level, targets, include=None):
+    # (prefilled, finished) for the targets of this run: finished targets are
+    # not scanned again, the rest skip the stages already journaled.
+    # include(target): also take journaled targets outside `targets`, e.g.
+    # names the previous run discovered through expansion.
+    header, data, finished = replay(path)
+    if header and header.get("level") != level:
+        raise ValueError(f"{path} is a level {header.get('level')} run, not level {level}")
+    wanted = set(targets)
+    prefilled = {}
+    for target, stages in data.items():
+        if target not in wanted:
+            if not (include and include(target)):
+                continue
+            wanted.add(target)
+        if target not in finished:
+            stages = {s: v for s, v in stages.items() if s not in VOLATILE}
+        if stages:
+            prefilled[target] = stages
+    return prefilled, finished & wanted
+
+def _fsync_dir(path):
+    try:
+        fd = os.open(os.path.dirname(path) or ".", os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+# ================= JOURNAL =================
+
+class Journal:
+    # Write-ahead log of finished (target, stage) results. Takes the same
+    # stage()/target() calls as JSONLSink, so it goes wherever a sink does.
+    # A new run does not replace an interrupted one's journal unless told to
+    # (fresh=True); its results are what --resume needs.
+    def __init__(self, path, level, resume=False, fresh=False, sync_interval=SYNC_INTERVAL,
+                 sync_every=SYNC_EVERY):
+        if not resume and not fresh and interrupted(path):
+            raise ValueError(f"{path} holds an interrupted run: --resume to continue it, "
+                             f"--fresh to start over")
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.level = level
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.closed = False
+        self.pending = 0
+        self.records = 0
+        self.syncs = 0
+
+        new = not resume or not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, "wb" if new else "ab")
+        if not new:
+            with open(path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                torn = f.read(1) != b"\n"
+            if torn:
+                self.file.write(b"\n")
+        # a resumed run has its own header, so a compacted journal it
+        # appends to reads as interrupted until it compacts in turn
+        self._write({"type": "run", "level": level, "compacted": False,
+                     "started": datetime.datetime.now().isoformat(timespec="seconds")})
+        self.sync()
+        self.flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self.flusher.start()
+
+    def _write(self, record):
+        line = (json.dumps(record, separators=(",", ":"), default=str) + "\n").encode("utf-8")
+        with self.lock:
+            self.file.write(line)
+            self.pending += 1
+            self.records += 1
+            if self.pending >= self.sync_every:
+                self.wake.set()
+
+    def stage(self, target, stage, result):
+        self._write({"type": "stage", "target": target, "stage": stage, "data": result})
+
+    def target(self, target, data):
+        self._write({"type": "target", "target": target})
+
+    def sync(self):
+        with self.lock:
+            if self.file.closed:
+                return
+            self.file.flush()
+            fd = self.file.fileno()
+            had = self.pending
+            self.pending = 0
+        # outside the lock, so writers keep filling the buffer meanwhile
+        os.fsync(fd)
+        if had:
+            self.syncs += 1
+
+    def _flush_loop(self):
+        while not self.closed:
+            self.wake.wait(self.sync_interval)
+            self.wake.clear()
+            self.sync()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.wake.set()
+        self.flusher.join()
+        self.sync()
+        with self.lock:
+            self.file.close()
+
+    def compact(self):
+        # After a completed run: one "done" record per target, written to a
+        # temp file and renamed over the journal, so a crash here leaves
+        # either the old journal or the new one.
+        self.close()
+        header, data, finished = replay(self.path)
+        tmp = self.path + ".tmp"
+        start = time.perf_counter()
+        with open(tmp, "wb") as f:
+            def put(record):
+                f.write((json.dumps(record, separators=(",", ":"), default=str) + "\n").encode("utf-8"))
+
+            put(dict(header or {"type": "run", "level": self.level}, compacted=True))
+            for target, stages in data.items():
+                if target in finished:
+                    put({"type": "done", "target": target, "data": stages})
+                else:
+                    # still resumable stage by stage
+                    for stage, value in stages.items():
+                        put({"type": "stage", "target": target, "stage": stage, "data": value})
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        _fsync_dir(self.path)
+        return {"targets": len(data), "finished": len(finished), "seconds": round(time.perf_counter() - start, 3)}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
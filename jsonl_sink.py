@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import datetime
+import threading
+
+from riskscore import risk_of
+
+# Record layout (one compact JSON object per line), schema version 1:
+#
+#   {"v": 1, "type": "stage",  "ts": ISO-8601 UTC, "target": str, "stage": str,
+#    "ok": bool, "error": str (only when ok is false), "data": object}
+#   {"v": 1, "type": "target", "ts": ..., "target": str, "stages": [str], "ok": bool,
+#    "risk": {"high": int, "medium": int, "low": int, "score": int}}
+#
+# "stage" records are written the moment a stage finishes; a "target" record
+# closes each target. Fields are only ever added under the same version.
+SCHEMA_VERSION = 1
+
+OUTPUT_DIR = "reports"
+MAX_BYTES = 100 * 1024 * 1024
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="milliseconds")
+
+def _open_stream(path, compress):
+    if compress == "gzip":
+        import gzip
+        return gzip.open(path, "ab")
+    if compress == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError("zstd output needs the 'zstandard' package (pip install zstandard)")
+        return zstandard.ZstdCompressor().stream_writer(open(path, "ab"), closefd=True)
+    return open(path, "ab")
+
+def _flush(stream, compress):
+    # gzip/zstd flushes end a block so `zcat`/`zstdcat -f` on a live file
+    # sees every record written so far
+    if compress == "zstd":
+        import zstandard
+        stream.flush(zstandard.FLUSH_BLOCK)
+    else:
+        stream.flush()
+
+class JSONLSink:
+    # Appends records to <dir>/<name>-<start>-<seq>.jsonl[.gz|.zst] and
+    # starts a new segment once the current one passes max_bytes
+    # (uncompressed). Safe to share between worker threads.
+    def __init__(self, directory=OUTPUT_DIR, name="results", compress=None, max_bytes=MAX_BYTES):
+        if compress not in (None, "gzip", "zstd"):
+            raise ValueError(f"unknown compression: {compress}")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.name = name
+        self.compress = compress
+        self.max_bytes = max_bytes
+        self.started = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.lock = threading.Lock()
+        self.seq = 0
+        self.size = 0
+        self.records = 0
+        self.stream = None
+        self.path = None
+        self.paths = []
+
+    def _ext(self):
+        return {"gzip": ".jsonl.gz", "zstd": ".jsonl.zst"}.get(self.compress, ".jsonl")
+
+    def _rotate(self):
+        if self.stream is not None:
+            self.stream.close()
+        self.seq += 1
+        self.path = os.path.join(self.directory, f"{self.name}-{self.started}-{self.seq:04d}{self._ext()}")
+        self.paths.append(self.path)
+        self.stream = _open_stream(self.path, self.compress)
+        self.size = 0
+
+    def emit(self, record):
+        line = (json.dumps(record, separators=(",", ":"), default=str) + "\n").encode("utf-8")
+        with self.lock:
+            if self.stream is None or (self.size and self.size + len(line) > self.max_bytes):
+                self._rotate()
+            self.stream.write(line)
+            _flush(self.stream, self.compress)
+            self.size += len(line)
+            self.records += 1
+
+    def stage(self, target, stage, result):
+        failed = isinstance(result, dict) and "error" in result
+        record = {"v": SCHEMA_VERSION, "type": "stage", "ts": _now(), "target": target,
+                  "stage": stage, "ok": not failed}
+        if failed:
+            record["error"] = str(result["error"])
+        record["data"] = result
+        self.emit(record)
+
+    def target(self, target, data):
+        self.emit({
+            "v": SCHEMA_VERSION, "type": "target", "ts": _now(), "target": target,
+            "stages": list(data),
+            "ok": not any(isinstance(v, dict) and "error" in v for v in data.values()),
+            "risk": {k: v for k, v in risk_of(data).items() if k != "findings"},
+        })
+
+    def close(self):
+        with self.lock:
+            if self.stream is not None:
+                self.stream.close()
+                self.stream = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class Tee:
+    # Several sinks behind the single `sink` argument the engines take.
+    def __init__(self, *sinks):
+        self.sinks = [s for s in sinks if s is not None]
+
+    def stage(self, target, stage, result):
+        for s in self.sinks:
+            s.stage(target, stage, result)
+
+    def target(self, target, data):
+        for s in self.sinks:
+            s.target(target, data)
+
+def tee(*sinks):
+    # None, the one sink given, or a Tee of them
+    sinks = [s for s in sinks if s is not None]
+    if len(sinks) < 2:
+        return sinks[0] if sinks else None
+    return Tee(*sinks)
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+
+import time
+import errno
+import inspect
+import socket
+import threading
+from collections import deque, Counter
+from concurrent.futures import ThreadPoolExecutor
+
+# Connect timeout for the pre-check. Ports are probed in parallel, so a fully
+# filtered host costs PROBE_TIMEOUT once instead of every stage's timeout.
+PROBE_TIMEOUT = 2.0
+PROBE_PORTS = (80, 443)
+
+# Adaptive timeouts: RTT_FACTOR x the RTT_PERCENTILE of the last RTT_SAMPLES
+# observations for the host, kept between the floors and the stage's own
+# fixed timeout.
+RTT_SAMPLES = 32
+RTT_PERCENTILE = 0.95
+RTT_FACTOR = 4.0
+MIN_CONNECT = 1.0
+MIN_READ = 3.0
+
+def tcp_probe(host, port, timeout=PROBE_TIMEOUT):
+    # (state, connect seconds or None); state is open, closed, filtered,
+    # unreachable or unresolved
+    start = time.perf_counter()
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return "open", time.perf_counter() - start
+    except socket.gaierror:
+        return "unresolved", None
+    except ConnectionRefusedError:
+        # a RST still comes back from a live host, and it is a clean RTT sample
+        return "closed", time.perf_counter() - start
+    except OSError as e:
+        if e.errno in (errno.EHOSTUNREACH, errno.ENETUNREACH):
+            return "unreachable", None
+        return "filtered", None
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+# ================= TRACKER =================
+
+class Liveness:
+    # One shared instance (see get_liveness). check() records a verdict per
+    # host; gate() wraps a stage so it returns at once for a host that cannot
+    # answer it; timeouts() turns observed RTTs into per-host timeouts.
+    def __init__(self, probe_timeout=PROBE_TIMEOUT):
+        self.probe_timeout = probe_timeout
+        self.lock = threading.Lock()
+        self.verdicts = {}
+        self.aliases = {}
+        self.connect = {}
+        self.response = {}
+        self.checks = 0
+        self.check_seconds = 0.0
+        self.saved = 0.0
+        self.skipped = Counter()
+        self.forgotten_down = 0
+
+    # ---------- pre-check ----------
+
+    def check(self, host, ports=PROBE_PORTS):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(ports)) as pool:
+            probes = dict(zip(ports, pool.map(lambda p: tcp_probe(host, p, self.probe_timeout), ports)))
+        states = {p: state for p, (state, _rtt) in probes.items()}
+        for state, rtt in probes.values():
+            if rtt is not None:
+                self.observe(host, rtt)
+
+        if "open" in states.values():
+            verdict = "up"
+        elif "closed" in states.values():
+            verdict = "closed"
+        else:
+            verdict = "down"
+        result = {"state": verdict, "ports": {f"{p}/tcp": s for p, s in states.items()}}
+        rtts = [rtt for _s, rtt in probes.values() if rtt is not None]
+        if rtts:
+            result["rtt_ms"] = round(min(rtts) * 1000, 1)
+
+        self.record(host, states)
+        with self.lock:
+            self.checks += 1
+            self.check_seconds += time.perf_counter() - start
+        return result
+
+    def record(self, host, states):
+        # {port: state}; also for a check() result shared from another name
+        with self.lock:
+            self.verdicts[host] = states
+
+    def alias(self, host, address):
+        # a name checked through its address (see hostindex): its verdict and
+        # RTT samples are the address's
+        if host != address:
+            with self.lock:
+                self.aliases[host] = address
+
+    def verdict(self, host):
+        with self.lock:
+            return self.verdicts.get(self.aliases.get(host, host))
+
+    def forget(self, hosts):
+        # drops what is known about hosts no longer being scanned, so a
+        # daemon does not keep every host it ever saw; down counts stay
+        with self.lock:
+            for host in hosts:
+                states = self.verdicts.pop(host, None)
+                if states and all(v not in ("open", "closed") for v in states.values()):
+                    self.forgotten_down += 1
+                self.aliases.pop(host, None)
+                self.connect.pop(host, None)
+                self.response.pop(host, None)
+
+    # ---------- short-circuit ----------
+
+    def blocked(self, host, port=None):
+        # (reason, silent) when a stage needing `port` (None: any port) cannot
+        # succeed, else None. silent: nothing answered, so the stage would
+        # have sat out its whole timeout rather than failing fast.
+        states = self.verdict(host)
+        if not states:
+            return None
+        if port is None:
+            if all(s not in ("open", "closed") for s in states.values()):
+                return (f"host down: no reply on {', '.join(map(str, states))}",
+                        "filtered" in states.values())
+            return None
+        state = states.get(port)
+        if state is None or state == "open":
+            return None
+        return f"{port}/tcp {state}", state == "filtered"
+
+    def gate(self, host, section, func, port=None, budget=0.0):
+        # budget: what the stage would have spent timing out, credited as
+        # saved when it is skipped for a port that never answered
+        def skipped():
+            blocked = self.blocked(host, port)
+            if blocked is None:
+                return None
+            reason, silent = blocked
+            self.skip(section, budget if silent else 0.0)
+            return {"error": f"skipped: {reason}", "skipped": True}
+
+        if inspect.iscoroutinefunction(func):
+            async def gated_async(arg):
+                return skipped() or await func(arg)
+            return gated_async
+
+        def gated(arg):
+            return skipped() or func(arg)
+        return gated
+
+    def skip(self, section, saved=0.0):
+        with self.lock:
+            self.skipped[section] += 1
+            self.saved += saved
+
+    # ---------- adaptive timeouts ----------
+
+    def observe(self, host, seconds, kind="connect"):
+        samples = self.connect if kind == "connect" else self.response
+        with self.lock:
+            host = self.aliases.get(host, host)
+            samples.setdefault(host, deque(maxlen=RTT_SAMPLES)).append(seconds)
+
+    def timeouts(self, host, ceiling):
+        # (connect, read) for requests, each capped at `ceiling`; None when
+        # nothing has been observed for the host yet
+        with self.lock:
+            host = self.aliases.get(host, host)
+            connect = list(self.connect.get(host, ()))
+            response = list(self.response.get(host, ()))
+        if not connect and not response:
+            return None
+        c = min(ceiling, max(MIN_CONNECT, RTT_FACTOR * percentile(connect, RTT_PERCENTILE))) if connect else ceiling
+        r = min(ceiling, max(MIN_READ, RTT_FACTOR * percentile(response, RTT_PERCENTILE))) if response else ceiling
+        return c, r
+
+    def tighten(self, host, timeout):
+        # replaces a flat requests timeout with the host's adaptive one
+        if not isinstance(timeout, (int, float)):
+            return timeout
+        adaptive = self.timeouts(host, timeout)
+        return adaptive or timeout
+
+    def socket_timeout(self, host, ceiling):
+        adaptive = self.timeouts(host, ceiling)
+        return max(adaptive) if adaptive else ceiling
+
+    def nmap_args(self, host):
+        with self.lock:
+            host = self.aliases.get(host, host)
+            connect = list(self.connect.get(host, ()))
+        if not connect:
+            return []
+        p = percentile(connect, RTT_PERCENTILE)
+        return ["--initial-rtt-timeout", f"{max(100, int(p * 2000))}ms",
+                "--max-rtt-timeout", f"{max(250, int(p * RTT_FACTOR * 1000))}ms"]
+
+    # ---------- reporting ----------
+
+    def summary(self):
+        with self.lock:
+            down = self.forgotten_down + sum(1 for s in self.verdicts.values()
+                                             if all(v not in ("open", "closed") for v in s.values()))
+            return {
+                "checked": self.checks,
+                "down": down,
+                "check_seconds": round(self.check_seconds, 2),
+                "skipped": dict(self.skipped),
+                "saved_seconds": round(self.saved, 1),
+            }
+
+_default = None
+_default_lock = threading.Lock()
+
+def get_liveness():
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = Liveness()
+        return _default
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+
+import os
+import time
+import random
+import inspect
+import threading
+import contextvars
+from contextlib import contextmanager
+
+METRICS_PATH = os.path.join("reports", "metrics.prom")
+METRICS_PORT = 9464
+
+# Histogram bucket bounds in seconds for stage wall time.
+BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 180, 600)
+COUNTERS = ("bytes_in", "bytes_out", "connections", "retries")
+# Stage times kept per stage for percentiles: a uniform sample of every call
+# so far, so a daemon that runs for weeks holds a fixed amount.
+RESERVOIR = 2048
+
+# Records being measured, innermost last. A context variable rather than a
+# thread-local so coroutines sharing the event loop thread each credit their
+# own call.
+_stack = contextvars.ContextVar("metrics_stack", default=())
+# Worker threads a stage fans out to (see dirprobe) credit the same record.
+_add_lock = threading.Lock()
+
+def add(field, n=1):
+    # Credits the call being measured on this thread or task (see
+    # Metrics.measure). Byte counts are what the client sees: request/response
+    # headers plus bodies as sent or as announced by Content-Length, DNS
+    # packets as sent and received. No-op when nothing is being measured.
+    stack = _stack.get()
+    if stack:
+        with _add_lock:
+            stack[-1][field] += n
+
+def _percentile(samples, q):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+# ================= REGISTRY =================
+
+class StageMetrics:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.slowest = 0.0
+        self.samples = []
+        self.buckets = [0] * len(BUCKETS)
+        self.totals = dict.fromkeys(COUNTERS, 0)
+
+    def observe(self, record):
+        self.calls += 1
+        self.errors += record["error"]
+        self.seconds += record["seconds"]
+        self.slowest = max(self.slowest, record["seconds"])
+        if len(self.samples) < RESERVOIR:
+            self.samples.append(record["seconds"])
+        else:
+            i = random.randrange(self.calls)
+            if i < RESERVOIR:
+                self.samples[i] = record["seconds"]
+        for i, bound in enumerate(BUCKETS):
+            if record["seconds"] <= bound:
+                self.buckets[i] += 1
+        for field in COUNTERS:
+            self.totals[field] += record[field]
+
+class Metrics:
+    # Per-target, per-stage records plus per-stage aggregates. One shared
+    # instance (see get_metrics) so every executor reports into the same place.
+    # Per-target records are only kept until the target's report is out (see
+    # forget); the aggregates cover every call.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stages = {}
+        self.targets = {}
+
+    @contextmanager
+    def measure(self, target, stage):
+        record = dict.fromkeys(COUNTERS, 0)
+        token = _stack.set(_stack.get() + (record,))
+        start = time.perf_counter()
+        try:
+            yield record
+        except Exception:
+            record["error"] = 1
+            raise
+        finally:
+            _stack.reset(token)
+            record["seconds"] = time.perf_counter() - start
+            record.setdefault("error", 0)
+            self.observe(target, stage, record)
+
+    def wrap(self, target, stage, func):
+        if inspect.iscoroutinefunction(func):
+            async def measured_async(arg):
+                with self.measure(target, stage) as record:
+                    value = await func(arg)
+                    record["error"] = int(isinstance(value, dict) and "error" in value)
+                    return value
+            return measured_async
+
+        def measured(arg):
+            with self.measure(target, stage) as record:
+                value = func(arg)
+                record["error"] = int(isinstance(value, dict) and "error" in value)
+                return value
+        return measured
+
+    def observe(self, target, stage, record):
+        # also for records measured elsewhere, e.g. in a render process
+        record = {**dict.fromkeys(COUNTERS, 0), "error": 0, **record}
+        with self.lock:
+            self.stages.setdefault(stage, StageMetrics()).observe(record)
+            self.targets.setdefault(target, {})[stage] = record
+
+    def target(self, target):
+        with self.lock:
+            return {stage: dict(r) for stage, r in self.targets.get(target, {}).items()}
+
+    def forget(self, target):
+        with self.lock:
+            self.targets.pop(target, None)
+
+    def summary(self):
+        with self.lock:
+            return {name: {
+                "calls": s.calls,
+                "errors": s.errors,
+                "seconds": round(s.seconds, 3),
+                "p50": round(_percentile(s.samples, 0.5), 3),
+                "p95": round(_percentile(s.samples, 0.95), 3),
+                "p99": round(_percentile(s.samples, 0.99), 3),
+                "max": round(s.slowest, 3),
+                **s.totals,
+            } for name, s in self.stages.items()}
+
+    # ---------- Prometheus text format ----------
+
+    def prometheus(self):
+        out = []
+        with self.lock:
+            stages = sorted(self.stages.items())
+            out.append("# HELP blacktrace_stage_seconds Wall time of one stage call for one target.")
+            out.append("# TYPE blacktrace_stage_seconds histogram")
+            for name, s in stages:
+                for bound, n in zip(BUCKETS, s.buckets):
+                    out.append(f'blacktrace_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {n}')
+                out.append(f'blacktrace_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {s.calls}')
+                out.append(f'blacktrace_stage_seconds_sum{{stage="{name}"}} {s.seconds:.6f}')
+                out.append(f'blacktrace_stage_seconds_count{{stage="{name}"}} {s.calls}')
+            for field, help_text in (("errors", "Stage calls that returned an error."),
+                                     ("bytes_in", "Bytes received by a stage."),
+                                     ("bytes_out", "Bytes sent by a stage."),
+                                     ("connections", "New connections opened by a stage."),
+                                     ("retries", "Retried requests and queries.")):
+                metric = f"blacktrace_stage_{field}_total"
+                out.append(f"# HELP {metric} {help_text}")
+                out.append(f"# TYPE {metric} counter")
+                for name, s in stages:
+                    value = s.errors if field == "errors" else s.totals[field]
+                    out.append(f'{metric}{{stage="{name}"}} {value}')
+            out.append("# HELP blacktrace_targets Targets measured and not yet reported.")
+            out.append("# TYPE blacktrace_targets gauge")
+            out.append(f"blacktrace_targets {len(self.targets)}")
+        return "\n".join(out) + "\n"
+
+    def write_textfile(self, path=METRICS_PATH):
+        # atomic, for node_exporter's textfile collector or a plain scrape
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.prometheus())
+        os.replace(tmp, path)
+        return path
+
+    def serve(self, port=METRICS_PORT, host="127.0.0.1"):
+        # GET /metrics on a daemon thread; returns the server (call shutdown())
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+    # ---------- console ----------
+
+    def print_table(self, console):
+        from rich.table import Table
+        from rich import box
+
+        table = Table(title="STAGE METRICS", box=box.ROUNDED)
+        for col in ("Stage", "Calls", "Errors", "p50 s", "p95 s", "Max s", "Total s",
+                    "KB in", "KB out", "Conns", "Retries"):
+            table.add_column(col, justify="right" if col != "Stage" else "left")
+        for name, s in self.summary().items():
+            table.add_row(name, str(s["calls"]), str(s["errors"]), str(s["p50"]), str(s["p95"]),
+                          str(s["max"]), str(s["seconds"]), f"{s['bytes_in'] / 1024:.1f}",
+                          f"{s['bytes_out'] / 1024:.1f}", str(s["connections"]), str(s["retries"]))
+        console.print(table)
+
+_default = None
+_default_lock = threading.Lock()
+
+def get_metrics():
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = Metrics()
+        return _default
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import threading
+import subprocess
+import xml.etree.ElementTree as ET
+from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+NMAP_PORTS = "21,22,23,80,443,445,3389"
+NMAP_TIMEOUT = 180
+CHUNK = 64 * 1024
+
+# ================= XML PARSING =================
+
+def _host_records(host):
+    addr = None
+    for a in host.findall("address"):
+        if a.get("addrtype") in ("ipv4", "ipv6"):
+            addr = a.get("addr")
+            break
+    names = [h.get("name") for h in host.findall("hostnames/hostname") if h.get("name")]
+    hostname = names[0] if names else None
+
+    for port in host.findall("ports/port"):
+        state = port.find("state")
+        service = port.find("service")
+        yield {
+            "host": addr,
+            "hostname": hostname,
+            "port": int(port.get("portid")),
+            "protocol": port.get("protocol"),
+            "state": state.get("state") if state is not None else None,
+            "service": service.get("name") if service is not None else None,
+            "product": service.get("product") if service is not None else None,
+            "version": service.get("version") if service is not None else None,
+        }
+
+def iter_nmap_xml(stream):
+    # stream: binary file object (nmap stdout or a recorded .xml). Each <host>
+    # is turned into records and dropped from the tree as soon as it closes,
+    # so memory stays at one host no matter how long the scan is.
+    parser = ET.XMLPullParser(events=("start", "end"))
+    root = None
+    for chunk in iter(lambda: stream.read(CHUNK), b""):
+        parser.feed(chunk)
+        for event, elem in parser.read_events():
+            if event == "start":
+                if root is None:
+                    root = elem
+                continue
+            if elem.tag == "host":
+                yield from _host_records(elem)
+                elem.clear()
+                if root is not None and elem in root:
+                    root.remove(elem)
+    parser.close()
+
+def parse_nmap_file(path):
+    with open(path, "rb") as f:
+        return list(iter_nmap_xml(f))
+
+# ================= RUNNER =================
+
+def nmap_command(hosts, ports=NMAP_PORTS, extra=()):
+    return ["nmap", "-sV", "-Pn", "-p", ports, *extra, "-oX", "-", *hosts]
+
+def stream_nmap(hosts, ports=NMAP_PORTS, timeout=NMAP_TIMEOUT, extra=()):
+    # Yields port records while nmap is still running. Raises
+    # subprocess.TimeoutExpired if the run goes past timeout.
+    proc = subprocess.Popen(nmap_command(hosts, ports, extra),
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    expired = threading.Event()
+
+    def kill():
+        expired.set()
+        proc.kill()
+
+    timer = threading.Timer(timeout, kill)
+    timer.start()
+    try:
+        try:
+            yield from iter_nmap_xml(proc.stdout)
+        except ET.ParseError:
+            # a killed nmap leaves the document unterminated
+            if not expired.is_set():
+                raise
+        proc.wait()
+    finally:
+        timer.cancel()
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        proc.stdout.close()
+
+    if expired.is_set():
+        raise subprocess.TimeoutExpired(proc.args, timeout)
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, proc.args)
+
+def nmap_available():
+    return shutil.which("nmap") is not None
+
+# ================= SHARDED SCHEDULER =================
+
+SHARD_SIZE = 16
+SHARD_RETRIES = 1
+
+def shards(hosts, size=SHARD_SIZE):
+    return [hosts[i:i + size] for i in range(0, len(hosts), size)]
+
+def _scan_shard(shard, ports, timeout, extra, limiter=None):
+    wanted = set(shard)
+    found = {h: [] for h in shard}
+    with ExitStack() as stack:
+        # paced like any other request to these hosts; a timeout backs them off
+        slots = [stack.enter_context(limiter.slot(h, hold=False)) for h in shard] if limiter else []
+        for rec in stream_nmap(shard, ports, timeout, extra):
+            # nmap reports the name we passed as a "user" hostname, bare IPs as the address
+            key = rec["hostname"] if rec["hostname"] in wanted else rec["host"]
+            if key in found:
+                found[key].append(rec)
+        for s in slots:
+            s.ok()
+    return found
+
+def run_sharded(hosts, ports=NMAP_PORTS, workers=None, shard_size=SHARD_SIZE,
+                timeout=NMAP_TIMEOUT, max_rate=None, retries=SHARD_RETRIES, limiter=None):
+    # Splits hosts into shards and runs one nmap per shard, `workers` at a
+    # time (default: one per core). max_rate is the packets/s budget for the
+    # whole run and is divided evenly across the parallel processes. A shard
+    # that times out is split in half and requeued; single hosts get
+    # `retries` more attempts before being reported as timed out.
+    hosts = list(dict.fromkeys(hosts))
+    if not nmap_available():
+        return {h: {"error": "nmap not installed"} for h in hosts}
+
+    workers = max(1, workers or os.cpu_count() or 1)
+    extra = ["--max-rate", str(max(1, int(max_rate) // workers))] if max_rate else []
+    results = {}
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = {pool.submit(_scan_shard, s, ports, timeout, extra, limiter): (s, 0)
+                   for s in shards(hosts, shard_size)}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                shard, attempt = pending.pop(fut)
+                try:
+                    for h, recs in fut.result().items():
+                        results[h] = {"ports": recs}
+                    continue
+                except subprocess.TimeoutExpired:
+                    if len(shard) > 1:
+                        half = len(shard) // 2
+                        retry = [(shard[:half], attempt), (shard[half:], attempt)]
+                    elif attempt < retries:
+                        retry = [(shard, attempt + 1)]
+                    else:
+                        results[shard[0]] = {"error": f"nmap timed out after {timeout}s"}
+                        retry = []
+                except Exception as e:
+                    for h in shard:
+                        results[h] = {"error": str(e)}
+                    retry = []
+                for s, a in retry:
+                    pending[pool.submit(_scan_shard, s, ports, timeout, extra, limiter)] = (s, a)
+
+    return {h: results[h] for h in hosts}
+
+# ================= PIPELINE SHARDS =================
+
+# How long a partly filled shard waits for more hosts before it runs.
+SHARD_LINGER = 2.0
+
+class _Shard:
+    def __init__(self):
+        self.hosts = {}
+        self.timer = None
+        self.results = {}
+        self.done = threading.Event()
+
+class ShardBatcher:
+    # The Pipeline's Nmap stage under --nmap-shard: each worker's scan(host)
+    # joins the shard being filled and blocks until it has run. A shard runs
+    # once shard_size hosts are in or `linger` seconds after its first host,
+    # `workers` nmap processes at a time; max_rate is split across them.
+    def __init__(self, shard_size=SHARD_SIZE, workers=None, max_rate=None, ports=NMAP_PORTS,
+                 timeout=NMAP_TIMEOUT, linger=SHARD_LINGER, limiter=None):
+        self.shard_size = max(1, shard_size)
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.rate = max(1, int(max_rate) // self.workers) if max_rate else None
+        self.ports = ports
+        self.timeout = timeout
+        self.linger = linger
+        self.limiter = limiter
+        self.lock = threading.Lock()
+        self.filling = None
+        self.pool = ThreadPoolExecutor(max_workers=self.workers)
+
+    def scan(self, host):
+        with self.lock:
+            shard = self.filling
+            if shard is None:
+                shard = self.filling = _Shard()
+                shard.timer = threading.Timer(self.linger, self._flush, (shard,))
+                shard.timer.daemon = True
+                shard.timer.start()
+            shard.hosts[host] = None
+            if len(shard.hosts) >= self.shard_size:
+                self._flush_locked(shard)
+        shard.done.wait()
+        return shard.results.get(host) or {"error": "nmap did not report this host"}
+
+    def _flush(self, shard):
+        with self.lock:
+            self._flush_locked(shard)
+
+    def _flush_locked(self, shard):
+        if self.filling is not shard:
+            return
+        self.filling = None
+        shard.timer.cancel()
+        self.pool.submit(self._run, shard)
+
+    def _run(self, shard):
+        hosts = list(shard.hosts)
+        try:
+            # one process per shard; a timed-out shard is split and retried
+            shard.results = run_sharded(hosts, self.ports, workers=1, shard_size=len(hosts),
+                                        timeout=self.timeout, max_rate=self.rate, limiter=self.limiter)
+        except Exception as e:
+            shard.results = {h: {"error": str(e)} for h in hosts}
+        finally:
+            shard.done.set()
+
+    def close(self):
+        with self.lock:
+            if self.filling is not None:
+                self._flush_locked(self.filling)
+        self.pool.shutdown(wait=True)
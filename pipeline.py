@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+
+import time
+import queue
+import inspect
+import threading
+from functools import partial
+
+from pool import HostPool
+from liveness import get_liveness
+from ratelimit import get_limiter
+from hostindex import get_index
+from riskscore import score_batch
+from metrics import get_metrics
+from reporter import console, index_note, liveness_note, scan_plan, target_host
+
+# Worker threads per stage. A target leaves a stage as soon as that stage is
+# done with it, so a slow nmap queue never holds up DNS/HTTP for the others.
+STAGE_WORKERS = {
+    "DNS": 32,
+    "Liveness": 32,
+    "HTTP": 32,
+    "TLS": 16,
+    "Directories": 16,
+    "Nmap": 4,
+    "Expansion": 2,
+    "Risk": 1,
+    "Report": 2,
+}
+
+# Finished targets scored together in one riskscore table pass.
+RISK_BATCH = 256
+
+# ================= STAGE =================
+
+class Stage:
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.busy = 0
+        self.done = 0
+        self.errors = 0
+        self.seconds = 0.0
+
+    def record(self, seconds, failed):
+        with self.lock:
+            self.busy -= 1
+            self.done += 1
+            self.seconds += seconds
+            if failed:
+                self.errors += 1
+
+    def snapshot(self, elapsed):
+        with self.lock:
+            return {
+                "workers": self.workers,
+                "queued": self.queue.qsize(),
+                "busy": self.busy,
+                "done": self.done,
+                "errors": self.errors,
+                "per_sec": round(self.done / elapsed, 2) if elapsed else 0.0,
+                "avg_s": round(self.seconds / self.done, 3) if self.done else 0.0,
+            }
+
+# ================= PIPELINE =================
+
+class Pipeline:
+    def __init__(self, level, workers=None, report=None, session=None, cache=None, sink=None, on_done=None,
+                 expander=None, async_http=False, wordlist=None, nmap_shards=None):
+        # on_done(job): called with each finished job ({"target", "data",
+        # "report"}) instead of keeping it in self.results, for a pipeline
+        # that runs indefinitely (see jobqueue.py).
+        # expander: an expansion.Expander; adds an Expansion stage after TLS
+        # that queues in-scope names found in SANs and DNS into this run.
+        # async_http: HTTP fetches run on asyncprobe's event loop; the HTTP
+        # workers only hand them over, so in-flight fetches hold no thread.
+        # wordlist: paths file for the Directories stage (levels 2 and 3).
+        # nmap_shards: an nmapxml.ShardBatcher; the Nmap workers wait on its
+        # shards, so there are enough of them to fill every process.
+        self.level = level
+        self.async_http = async_http
+        self.wordlist = wordlist
+        self.nmap_shards = nmap_shards
+        self.report = report
+        self.on_done = on_done
+        self.expander = expander
+        self.session = session
+        self.cache = cache
+        self.sink = sink
+        sizes = dict(STAGE_WORKERS, **(workers or {}))
+        if nmap_shards:
+            sizes["Nmap"] = max(sizes["Nmap"], nmap_shards.shard_size * nmap_shards.workers)
+        self.order = [section for section, *_ in scan_plan(level, "localhost")]
+        if expander:
+            self.order.insert(self.order.index("TLS") + 1, "Expansion")
+        self.order.append("Risk")
+        if report:
+            self.order.append("Report")
+        self.stages = {name: Stage(name, sizes.get(name, 4)) for name in self.order}
+        self.results = {}
+        self.reports = {}
+        self.lock = threading.Lock()
+        self.finished = threading.Condition(self.lock)
+        self.started = None
+        self.liveness_before = None
+        self.index_before = None
+        self.threads = []
+        self.own_session = False
+        self.expected = 0
+
+    def _next(self, job, index):
+        # stages already filled in (a resumed run) are passed over
+        while index < len(self.order) and self.order[index] in job["data"]:
+            index += 1
+        if index < len(self.order):
+            self.stages[self.order[index]].queue.put((job, index))
+            return
+        # the report has its stage metrics by now
+        get_metrics().forget(job["target"])
+        if self.sink:
+            try:
+                self.sink.target(job["target"], job["data"])
+            except Exception as e:
+                self._lost(job, "result", e)
+        if self.on_done:
+            try:
+                self.on_done(job)
+            except Exception as e:
+                self._lost(job, "on_done", e)
+            return
+        with self.finished:
+            self.results[job["target"]] = job["data"]
+            if self.report:
+                self.reports[job["target"]] = job.get("report")
+            self.finished.notify_all()
+
+    def _work(self, stage):
+        while True:
+            item = stage.queue.get()
+            if item is None:
+                return
+            job, index = item
+            with stage.lock:
+                stage.busy += 1
+            start = time.perf_counter()
+            error = None
+            try:
+                if stage.name == "Report":
+                    job["report"] = self.report(job["target"], job["data"])
+                elif stage.name == "Risk":
+                    self._score(stage, job, index, start)
+                    continue
+                elif stage.name == "Expansion":
+                    section, found = self.expander.expand(job["data"], job["depth"])
+                    job["data"]["Expansion"] = section
+                    for name in found:
+                        self.submit(name, depth=job["depth"] + 1)
+                else:
+                    func, arg = job["plan"][stage.name]
+                    if inspect.iscoroutinefunction(func):
+                        # the shared event loop runs it; this worker moves on
+                        from asyncprobe import get_async_http
+                        fut = get_async_http().submit(func(arg))
+                        fut.add_done_callback(partial(self._landed, stage, job, index, start))
+                        continue
+                    job["data"][stage.name] = func(arg)
+            except Exception as e:
+                error = e
+            self._forward(stage, job, index, start, error)
+
+    def _score(self, stage, job, index, start):
+        # scores this target with whatever else is already waiting, in one
+        # score_batch call; each keeps its share of the time
+        batch = [(job, index)]
+        while len(batch) < RISK_BATCH:
+            try:
+                item = stage.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # stop() asked; finish this batch first
+                stage.queue.put(None)
+                break
+            with stage.lock:
+                stage.busy += 1
+            batch.append(item)
+        error = None
+        try:
+            scores = score_batch({i: j["data"] for i, (j, _) in enumerate(batch)}, detail=True)
+            for i, (j, _) in enumerate(batch):
+                j["data"]["Risk"] = scores[i]
+        except Exception as e:
+            error = e
+        share = (time.perf_counter() - start) / len(batch)
+        for j, i in batch:
+            self._forward(stage, j, i, time.perf_counter() - share, error)
+
+    def _landed(self, stage, job, index, start, fut):
+        # on the event loop thread, when a coroutine stage is done
+        error = fut.exception()
+        if error is None:
+            job["data"][stage.name] = fut.result()
+        self._forward(stage, job, index, start, error)
+
+    def _forward(self, stage, job, index, start, error=None):
+        if error is not None and stage.name != "Report":
+            job["data"][stage.name] = {"error": str(error)}
+        value = job["data"].get(stage.name)
+        failed = error is not None or isinstance(value, dict) and "error" in value
+        if self.sink and stage.name != "Report":
+            try:
+                self.sink.stage(job["target"], stage.name, value)
+            except Exception as e:
+                failed = True
+                self._lost(job, stage.name, e)
+        stage.record(time.perf_counter() - start, failed)
+        self._next(job, index + 1)
+
+    def _lost(self, job, what, error):
+        # a sink or callback that fails (disk full, closed socket) is reported
+        # and the target carries on; raising here would kill the worker and
+        # leave run() waiting for a target that never arrives
+        console.print(f"[red][!] {job['target']}: {what} not recorded: {error}[/red]")
+
+    def submit(self, target, prefilled=None, depth=0):
+        plan = {section: (func, arg) for section, _m, func, arg
+                in scan_plan(self.level, target, self.session, self.cache, self.async_http,
+                                self.wordlist, self.nmap_shards)}
+        if prefilled and "DNS" in prefilled:
+            # DNS will not run again, so teach the index from the resumed result
+            get_index().observe(target_host(target), prefilled["DNS"])
+        with self.lock:
+            self.expected += 1
+        self._next({"target": target, "plan": plan, "data": dict(prefilled or {}), "depth": depth}, 0)
+
+    def stats(self):
+        elapsed = time.perf_counter() - self.started if self.started else 0.0
+        return {name: stage.snapshot(elapsed) for name, stage in self.stages.items()}
+
+    def start(self):
+        self.own_session = self.session is None
+        if self.own_session:
+            self.session = HostPool()
+        self.started = time.perf_counter()
+        self.liveness_before = get_liveness().summary()
+        self.index_before = get_index().summary()
+        for stage in self.stages.values():
+            for _ in range(stage.workers):
+                t = threading.Thread(target=self._work, args=(stage,), daemon=True)
+                t.start()
+                self.threads.append(t)
+
+    def stop(self):
+        # only once every submitted target has finished; a job still between
+        # stages would find the next stage's workers gone
+        for stage in self.stages.values():
+            for _ in range(stage.workers):
+                stage.queue.put(None)
+        for t in self.threads:
+            t.join()
+        self.threads = []
+        if self.async_http:
+            from asyncprobe import get_async_http
+            get_async_http().close()
+        if self.own_session:
+            self.session.close()
+            self.session = None
+
+    def run(self, targets, monitor=None, prefilled=None, finished=()):
+        # monitor: seconds between progress prints, None to stay quiet.
+        # prefilled/finished come from journal.resume_state(): finished
+        # targets are returned as they are, the rest only run missing stages.
+        targets = list(dict.fromkeys(targets))
+        prefilled = prefilled or {}
+        if self.expander:
+            self.expander.seed(targets)
+        self.start()
+        for t in targets:
+            if t in finished:
+                with self.finished:
+                    self.expected += 1
+                    self.results[t] = prefilled.get(t, {})
+            else:
+                self.submit(t, prefilled.get(t))
+
+        last = time.perf_counter()
+        with self.finished:
+            # expected grows while the Expansion stage queues new names
+            while len(self.results) < self.expected:
+                self.finished.wait(monitor)
+                if monitor and time.perf_counter() - last >= monitor:
+                    last = time.perf_counter()
+                    depth = " ".join(f"{n}:{s.queue.qsize()}" for n, s in self.stages.items())
+                    console.print(f"[dim][*] {len(self.results)}/{self.expected} done | queued {depth}[/dim]")
+
+        self.stop()
+        # seed targets first, then what expansion added
+        results = {t: self.results[t] for t in targets}
+        results.update(self.results)
+        return results
+
+    def print_stats(self):
+        from rich.table import Table
+        from rich import box
+
+        table = Table(title="PIPELINE STAGES", box=box.ROUNDED)
+        for col in ("Stage", "Workers", "Queued", "Busy", "Done", "Errors", "Per sec", "Avg s"):
+            table.add_column(col, justify="right" if col != "Stage" else "left")
+        for name, s in self.stats().items():
+            table.add_row(name, str(s["workers"]), str(s["queued"]), str(s["busy"]), str(s["done"]),
+                          str(s["errors"]), str(s["per_sec"]), str(s["avg_s"]))
+        console.print(table)
+        for note in (liveness_note(self.liveness_before), index_note(self.index_before)):
+            if note:
+                console.print(note)
+        slowed = sorted(h for h, st in get_limiter().stats().items() if st["backoffs"])
+        if slowed:
+            console.print(f"[dim][*] Rate limited: backed off {len(slowed)} host(s): {', '.join(slowed[:10])}"
+                          f"{' ...' if len(slowed) > 10 else ''}[/dim]")
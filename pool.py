@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+
+import time
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util import parse_url
+
+from ratelimit import get_limiter
+from dnsresolver import get_resolver
+from liveness import get_liveness
+import metrics
+
+# Hosts kept in the pool manager at once, and keep-alive sockets kept per host.
+POOL_CONNECTIONS = 256
+PER_HOST = 4
+
+# ================= COUNTERS =================
+
+class PoolStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+
+    def add(self, field):
+        with self.lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def snapshot(self):
+        with self.lock:
+            reused = max(0, self.requests - self.connections)
+            return {
+                "requests": self.requests,
+                "connections": self.connections,
+                "reused": reused,
+                "reuse_ratio": round(reused / self.requests, 3) if self.requests else 0.0,
+            }
+
+def _resolved(base):
+    class ResolvedConnection(base):
+        def _new_conn(self):
+            # dial the address from the shared resolver cache; the name is
+            # back in place for the Host header, SNI and certificate checks
+            name = self._dns_host
+            self._dns_host = get_resolver().address(name)
+            try:
+                return super()._new_conn()
+            finally:
+                self._dns_host = name
+    return ResolvedConnection
+
+def _counting_pool(base, stats):
+    class CountingPool(base):
+        ConnectionCls = _resolved(base.ConnectionCls)
+
+        def _new_conn(self):
+            stats.add("connections")
+            metrics.add("connections")
+            return super()._new_conn()
+    return CountingPool
+
+def _header_size(headers):
+    return sum(len(k) + len(str(v)) + 4 for k, v in headers.items()) + 2
+
+def _request_size(request):
+    body = request.body or b""
+    return len(request.method) + len(request.path_url) + 11 + _header_size(request.headers) + len(body)
+
+def _response_size(request, r):
+    # the body has not been read yet here, so go by what the server
+    # announced; chunked bodies count headers only
+    length = r.headers.get("Content-Length")
+    body = int(length) if length and length.isdigit() and request.method != "HEAD" else 0
+    return 15 + len(r.reason or "") + _header_size(r.headers) + body
+
+class CountingAdapter(HTTPAdapter):
+    def __init__(self, stats, limiter=None, liveness=None, **kwargs):
+        self.stats = stats
+        self.limiter = limiter
+        self.liveness = liveness
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _counting_pool(HTTPConnectionPool, self.stats),
+            "https": _counting_pool(HTTPSConnectionPool, self.stats),
+        }
+
+    def _timed_send(self, host, request, kwargs):
+        # feeds response times to the liveness tracker, which hands back a
+        # per-host timeout in place of the flat one
+        if self.liveness is None:
+            return super().send(request, **kwargs)
+        kwargs["timeout"] = self.liveness.tighten(host, kwargs.get("timeout"))
+        start = time.perf_counter()
+        try:
+            r = super().send(request, **kwargs)
+        except requests.Timeout:
+            self.liveness.observe(host, time.perf_counter() - start, "response")
+            raise
+        self.liveness.observe(host, time.perf_counter() - start, "response")
+        return r
+
+    def send(self, request, **kwargs):
+        self.stats.add("requests")
+        host = parse_url(request.url).host
+        if self.limiter is None:
+            r = self._timed_send(host, request, kwargs)
+        else:
+            with self.limiter.slot(host) as slot:
+                r = self._timed_send(host, request, kwargs)
+                slot.status(r.status_code, r.headers.get("Retry-After"))
+        metrics.add("bytes_out", _request_size(request))
+        metrics.add("bytes_in", _response_size(request, r))
+        return r
+
+# ================= SESSION POOL =================
+
+class HostPool:
+    # One requests.Session shared by every stage of a scan. urllib3 keeps a
+    # keep-alive pool per host, so fetch/check_path/simple_dirs against the
+    # same host reuse the TCP+TLS connection instead of handshaking per path.
+    # Requests are paced per host by the shared RateLimiter and get adaptive
+    # timeouts from the shared Liveness tracker; pass False to opt out.
+    def __init__(self, pool_connections=POOL_CONNECTIONS, per_host=PER_HOST, block=True, limiter=None,
+                 liveness=None):
+        self.stats = PoolStats()
+        self.session = requests.Session()
+        adapter = CountingAdapter(
+            self.stats,
+            limiter=get_limiter() if limiter is None else limiter or None,
+            liveness=get_liveness() if liveness is None else liveness or None,
+            pool_connections=pool_connections,
+            pool_maxsize=per_host,
+            pool_block=block,
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get(self, url, **kwargs):
+        return self.session.get(url, **kwargs)
+
+    def head(self, url, **kwargs):
+        return self.session.head(url, **kwargs)
+
+    def snapshot(self):
+        return self.stats.snapshot()
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+
+import time
+import socket
+import asyncio
+import subprocess
+import threading
+from contextlib import asynccontextmanager, contextmanager
+
+from hostindex import get_index
+
+# Per-host pacing. Each host starts at START_RATE requests/s with START_CONCURRENCY
+# requests in flight and moves between the floors and the operator's ceilings:
+# +RATE_STEP req/s and +1 slot per window of healthy responses, halved on a
+# timeout, connection failure, 429 or 503 (at most once per BACKOFF_COOLDOWN,
+# so one burst of failures counts as one signal).
+START_RATE = 10.0
+MAX_RATE = 50.0
+MIN_RATE = 0.5
+RATE_STEP = 1.0
+START_CONCURRENCY = 2
+MAX_CONCURRENCY = 4
+BACKOFF = 0.5
+BACKOFF_COOLDOWN = 1.0
+MAX_RETRY_AFTER = 60.0
+
+THROTTLE_STATUS = (429, 503)
+# How often a coroutine waiting for a free concurrency slot looks again.
+SLOT_POLL = 0.05
+
+def _is_timeout(exc):
+    import requests
+    return isinstance(exc, (requests.Timeout, requests.ConnectionError, subprocess.TimeoutExpired,
+                            socket.timeout, TimeoutError, ConnectionError))
+
+def _retry_after(value):
+    try:
+        return min(MAX_RETRY_AFTER, max(0.0, float(value)))
+    except (TypeError, ValueError):
+        return None
+
+# ================= HOST STATE =================
+
+class HostLimit:
+    def __init__(self, rate, max_rate, concurrency, max_concurrency):
+        self.rate = rate
+        self.max_rate = max_rate
+        self.limit = float(concurrency)
+        self.max_concurrency = max_concurrency
+        self.tokens = 1.0
+        self.stamp = time.monotonic()
+        self.inflight = 0
+        self.paused_until = 0.0
+        self.last_backoff = 0.0
+        self.cond = threading.Condition()
+        self.stats = {"requests": 0, "backoffs": 0, "throttled": 0, "timeouts": 0, "waited": 0.0}
+
+    def _refill(self, now):
+        self.tokens = min(max(1.0, self.rate), self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def _wait(self, hold):
+        # seconds until a call may go, None until a slot frees, 0 to go now
+        now = time.monotonic()
+        self._refill(now)
+        if now < self.paused_until:
+            return self.paused_until - now
+        if hold and self.inflight >= int(self.limit):
+            return None
+        if self.tokens < 1.0:
+            return (1.0 - self.tokens) / self.rate
+        return 0
+
+    def _take(self, hold, start):
+        self.tokens -= 1.0
+        self.inflight += hold
+        self.stats["requests"] += 1
+        self.stats["waited"] += time.monotonic() - start
+
+    def acquire(self, hold=True):
+        # hold=False paces the call without taking a concurrency slot, for
+        # long runs like nmap that should not lock HTTP out of the host
+        start = time.monotonic()
+        with self.cond:
+            while True:
+                wait = self._wait(hold)
+                if wait == 0:
+                    break
+                self.cond.wait(wait)
+            self._take(hold, start)
+
+    def try_acquire(self, hold=True, start=None):
+        # acquire() without blocking: 0 once taken, else what _wait() says
+        with self.cond:
+            wait = self._wait(hold)
+            if wait == 0:
+                self._take(hold, start or time.monotonic())
+            return wait
+
+    def release(self, outcome, retry_after=None, hold=True):
+        # outcome: "ok", "throttled", "timeout" or None (says nothing about load)
+        with self.cond:
+            self.inflight -= hold
+            now = time.monotonic()
+            if outcome in ("throttled", "timeout"):
+                self.stats[outcome if outcome == "throttled" else "timeouts"] += 1
+                if retry_after:
+                    self.paused_until = max(self.paused_until, now + retry_after)
+                if now - self.last_backoff >= BACKOFF_COOLDOWN:
+                    self.last_backoff = now
+                    # the floor never lifts a ceiling set below it
+                    self.rate = min(self.max_rate, max(MIN_RATE, self.rate * BACKOFF))
+                    self.limit = max(1.0, self.limit * BACKOFF)
+                    self.tokens = min(self.tokens, 0.0)
+                    self.stats["backoffs"] += 1
+            elif outcome == "ok":
+                self.rate = min(self.max_rate, self.rate + RATE_STEP / max(1.0, self.rate))
+                self.limit = min(float(self.max_concurrency), self.limit + 1.0 / self.limit)
+            self.cond.notify_all()
+
+    def snapshot(self):
+        with self.cond:
+            return dict(self.stats, rate=round(self.rate, 2), concurrency=int(self.limit),
+                        waited=round(self.stats["waited"], 3))
+
+class AddressCap:
+    # calls in flight to one address, whichever name they went out as
+    def __init__(self, limit):
+        self.limit = limit
+        self.inflight = 0
+        self.cond = threading.Condition()
+
+    def acquire(self):
+        with self.cond:
+            while self.inflight >= self.limit:
+                self.cond.wait()
+            self.inflight += 1
+
+    def try_acquire(self):
+        with self.cond:
+            if self.inflight >= self.limit:
+                return False
+            self.inflight += 1
+            return True
+
+    def release(self):
+        with self.cond:
+            self.inflight -= 1
+            self.cond.notify()
+
+# ================= LIMITER =================
+
+class Slot:
+    def __init__(self):
+        self.outcome = None
+        self.retry_after = None
+
+    def ok(self):
+        self.outcome = "ok"
+
+    def status(self, code, retry_after=None):
+        if code in THROTTLE_STATUS:
+            self.outcome = "throttled"
+            self.retry_after = _retry_after(retry_after)
+        else:
+            self.outcome = "ok"
+
+class RateLimiter:
+    # Shared by every stage that talks to a host (see get_limiter): HTTP
+    # requests through HostPool, directory probes and nmap runs all take a
+    # slot from the same per-host state, so a host that starts answering 429
+    # slows down everything aimed at it. Ceilings are the operator's limits;
+    # adaptation never goes above them. Pacing is per name: vhosts behind one
+    # load balancer or CDN address each get their own budget.
+    # max_per_address: opt-in cap on calls in flight to one address across
+    # all the names on it (see hostindex); None for no cap.
+    def __init__(self, rate=START_RATE, max_rate=MAX_RATE, concurrency=START_CONCURRENCY,
+                 max_concurrency=MAX_CONCURRENCY, max_per_address=None):
+        self.max_rate = max_rate
+        self.rate = min(rate, max_rate)
+        self.max_concurrency = max_concurrency
+        self.concurrency = min(concurrency, max_concurrency)
+        self.max_per_address = max_per_address
+        self.hosts = {}
+        self.addresses = {}
+        self.lock = threading.Lock()
+
+    def host(self, host):
+        with self.lock:
+            h = self.hosts.get(host)
+            if h is None:
+                h = self.hosts[host] = HostLimit(self.rate, self.max_rate, self.concurrency,
+                                                 self.max_concurrency)
+            return h
+
+    def address(self, host, hold=True):
+        # the AddressCap a call to host also takes, or None
+        if not hold or not self.max_per_address:
+            return None
+        ip = get_index().ip(host)
+        with self.lock:
+            cap = self.addresses.get(ip)
+            if cap is None:
+                cap = self.addresses[ip] = AddressCap(self.max_per_address)
+            return cap
+
+    @contextmanager
+    def slot(self, host, hold=True):
+        # with limiter.slot(host) as s: r = ...; s.status(r.status_code, r.headers.get("Retry-After"))
+        h = self.host(host)
+        cap = self.address(host, hold)
+        h.acquire(hold)
+        if cap:
+            cap.acquire()
+        s = Slot()
+        try:
+            yield s
+        except Exception as e:
+            h.release("timeout" if _is_timeout(e) else None, hold=hold)
+            raise
+        finally:
+            if cap:
+                cap.release()
+        h.release(s.outcome, s.retry_after, hold)
+
+    @asynccontextmanager
+    async def aslot(self, host, hold=True):
+        # slot() for coroutines: waits on the event loop, not the thread
+        h = self.host(host)
+        cap = self.address(host, hold)
+        start = time.monotonic()
+        while True:
+            wait = h.try_acquire(hold, start)
+            if wait == 0:
+                break
+            await asyncio.sleep(SLOT_POLL if wait is None else wait)
+        while cap and not cap.try_acquire():
+            await asyncio.sleep(SLOT_POLL)
+        s = Slot()
+        try:
+            yield s
+        except Exception as e:
+            h.release("timeout" if _is_timeout(e) else None, hold=hold)
+            raise
+        finally:
+            if cap:
+                cap.release()
+        h.release(s.outcome, s.retry_after, hold)
+
+    def forget(self, hosts):
+        # hosts no longer being scanned; one with calls in flight or a
+        # Retry-After still running keeps its state
+        now = time.monotonic()
+        with self.lock:
+            for host in hosts:
+                cap = self.addresses.get(host)
+                if cap is not None and not cap.inflight:
+                    del self.addresses[host]
+                h = self.hosts.get(host)
+                if h is None:
+                    continue
+                with h.cond:
+                    if h.inflight or h.paused_until > now:
+                        continue
+                del self.hosts[host]
+
+    def stats(self):
+        with self.lock:
+            hosts = dict(self.hosts)
+        return {host: h.snapshot() for host, h in hosts.items()}
+
+_default = None
+_default_lock = threading.Lock()
+
+def get_limiter():
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = RateLimiter()
+        return _default
+
+def configure(**ceilings):
+    # Replaces the shared limiter, e.g. configure(max_rate=5, max_concurrency=2,
+    # max_per_address=16).
+    global _default
+    with _default_lock:
+        _default = RateLimiter(**ceilings)
+        return _default
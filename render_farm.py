@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import datetime
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from metrics import get_metrics
+from riskscore import exposed
+
+# Workers start from a clean process, never a fork of the scanner: a fork
+# would copy its threads' held locks (logging, urllib3 pools, the shared
+# registries) into a child that can then deadlock on them.
+START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+# ================= WORKER =================
+
+def _render(payload, text, directory=None):
+    # Runs in a child process. Gets a compact JSON string, not live objects,
+    # and hands back the file names plus a small summary row.
+    import time
+    import reporter
+
+    target, data, stage_metrics = json.loads(payload)
+    start = time.perf_counter()
+    out = {"pdf": reporter.generate_pdf(target, data, stage_metrics, directory)}
+    out["seconds"] = time.perf_counter() - start
+    if text:
+        import reporter1
+        out["txt"] = reporter1.save_report(target, data, directory or reporter.REPORT_DIR)
+    out["summary"] = summarize(target, data)
+    return out
+
+def summarize(target, data):
+    from reporter import risk_counts
+
+    high, medium, low = risk_counts(data)
+    http = data.get("HTTP") or {}
+    tls = data.get("TLS") or {}
+    dirs = data.get("Directories") or {}
+    return {
+        "target": target,
+        "high": high,
+        "medium": medium,
+        "low": low,
+        "http_status": http.get("status", "error" if "error" in http else None),
+        "tls_valid_to": tls.get("valid_to"),
+        "exposed_paths": sorted(p for p, s in dirs.items() if exposed(s)),
+        "errors": sorted(s for s, v in data.items() if isinstance(v, dict) and "error" in v),
+    }
+
+def _payload(target, data):
+    # the parent's stage metrics travel along for the report's metrics table
+    stage_metrics = get_metrics().target(target)
+    return json.dumps([target, data, stage_metrics], separators=(",", ":"), default=str)
+
+# ================= FARM =================
+
+class RenderFarm:
+    # Report rendering is CPU-bound pure Python, so it goes to a process pool
+    # (one process per core by default) rather than the scan threads.
+    def __init__(self, workers=None, text=True, directory=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.text = text
+        self.directory = directory
+        self.pool = ProcessPoolExecutor(max_workers=self.workers,
+                                        mp_context=multiprocessing.get_context(START_METHOD))
+        self.summaries = {}
+        self.lock = threading.Lock()
+
+    def _keep(self, out):
+        target = out["summary"]["target"]
+        get_metrics().observe(target, "Report", {"seconds": out["seconds"]})
+        with self.lock:
+            self.summaries[target] = out["summary"]
+        return out
+
+    def render(self, target, data):
+        # blocking; suits the pipeline's Report stage with `workers` threads
+        out = self.pool.submit(_render, _payload(target, data), self.text, self.directory).result()
+        return self._keep(out)["pdf"]
+
+    def render_all(self, results):
+        futures = [self.pool.submit(_render, _payload(t, d), self.text, self.directory)
+                   for t, d in results.items()]
+        files = {}
+        for fut in as_completed(futures):
+            out = self._keep(fut.result())
+            files[out["summary"]["target"]] = out
+        return files
+
+    def portfolio(self):
+        with self.lock:
+            rows = [self.summaries[t] for t in sorted(self.summaries)]
+        return generate_portfolio(rows, self.directory)
+
+    def close(self):
+        self.pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# ================= PORTFOLIO REPORT =================
+
+def generate_portfolio(rows, directory=None):
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table as PDFTable
+    from reportlab.lib.pagesizes import A4, landscape
+    from xml.sax.saxutils import escape
+    from reporter import pdf_styles, REPORT_DIR, TABLE_CHUNK
+
+    directory = directory or REPORT_DIR
+    os.makedirs(directory, exist_ok=True)
+    filename = os.path.join(directory, f"BLACKTRACE_portfolio_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf")
+    st = pdf_styles()
+
+    totals = [sum(r[k] for r in rows) for k in ("high", "medium", "low")]
+    elements = [
+        Paragraph("BLACKTRACE Portfolio Report", st["h1"]),
+        Spacer(1, 12),
+        Paragraph(f"Targets: {len(rows)}", st["normal"]),
+        Paragraph(f"Date: {datetime.datetime.now()}", st["normal"]),
+        Spacer(1, 10),
+        Paragraph(f"Risk Summary: [High: {totals[0]}, Medium: {totals[1]}, Low: {totals[2]}]", st["risk"]),
+        Spacer(1, 20),
+    ]
+
+    header = ["Target", "High", "Med", "Low", "HTTP", "TLS valid to", "Exposed paths", "Errors"]
+    # worst first
+    rows = sorted(rows, key=lambda r: (-r["high"], -r["medium"], -r["low"], r["target"]))
+    for i in range(0, max(len(rows), 1), TABLE_CHUNK):
+        table = [[Paragraph(f"<b>{h}</b>", st["normal"]) for h in header]]
+        for r in rows[i:i + TABLE_CHUNK]:
+            cells = [r["target"], r["high"], r["medium"], r["low"], r["http_status"], r["tls_valid_to"],
+                     ", ".join(r["exposed_paths"]), ", ".join(r["errors"])]
+            table.append([Paragraph(escape(str(c if c is not None else "-")), st["wrap"]) for c in cells])
+        elements.append(PDFTable(table, repeatRows=1, style=st["table"],
+                                 colWidths=[150, 35, 35, 35, 45, 130, 180, 120]))
+
+    SimpleDocTemplate(filename, pagesize=landscape(A4)).build(elements)
+    return filename
@@ -1,31 +1,62 @@
 #!/usr/bin/env python3
 
 import os
-import socket
-import ssl
-import shutil
+import re
+import sys
 import datetime
-import subprocess
-from urllib.parse import urlparse, urljoin
-import requests
-
-from rich.console import Console
-from rich.panel import Panel
-from rich.table import Table
-from rich import box
-
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table as PDFTable, TableStyle
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.pagesizes import A4
-
-console = Console()
+from functools import partial
+from urllib.parse import urlparse
+from xml.sax.saxutils import escape
+
+from pool import HostPool
+from nmapxml import NMAP_PORTS, NMAP_TIMEOUT, nmap_available, stream_nmap
+from dnsresolver import get_resolver
+from cache import ResultCache
+from ratelimit import get_limiter
+from liveness import PROBE_PORTS, get_liveness
+from hostindex import get_index
+from metrics import get_metrics
+import metrics
+from riskscore import LEVEL, SEVERITIES, default_rules, risk_of
+
+# reportlab and rich are imported where they are used, so a quiet headless
+# scan that writes no PDF never loads them (see bench/bench_startup.py)
+class LazyConsole:
+    # stands in for rich's Console until something is actually printed
+    def __init__(self):
+        self.__dict__.update(_console=None, quiet=False)
+
+    def _get(self):
+        if self._console is None:
+            from rich.console import Console
+            self.__dict__["_console"] = Console(quiet=self.quiet)
+        return self._console
+
+    def __getattr__(self, name):
+        return getattr(self._get(), name)
+
+    def __setattr__(self, name, value):
+        if name == "quiet":
+            self.__dict__["quiet"] = value
+        if name != "quiet" or self._console is not None:
+            setattr(self._get(), name, value)
+
+    def print(self, *args, **kwargs):
+        if not self.quiet:
+            self._get().print(*args, **kwargs)
+
+console = LazyConsole()
 TIMEOUT = 10
+TLS_PORT = 443
+REPORT_DIR = "reports"
 USER_AGENT = "BLACKTRACE/1.0"
 
 # ================= BANNER =================
 
 def banner():
+    from rich.panel import Panel
+    from rich import box
+
     os.system("clear")
     console.print(Panel("""
 ██████╗ ██╗      █████╗  ██████╗██╗  ██╗████████╗██████╗  █████╗  ██████╗███████╗
@@ -42,6 +73,9 @@ def banner():
 # ================= MENU =================
 
 def menu():
+    from rich.table import Table
+    from rich import box
+
     table = Table(title="SCAN LEVEL", box=box.ROUNDED)
     table.add_column("Option", justify="center", style="cyan")
     table.add_column("Mode", style="green")
@@ -60,14 +94,15 @@ def normalize(target):
 
 def resolve_dns(host):
     try:
-        return socket.gethostbyname_ex(host)
+        return get_resolver().lookup(host)
     except Exception as e:
         return {"error": str(e)}
 
-def fetch(url):
+def fetch(url, session=None):
+    if session is None:
+        import requests as session
     try:
-        r = requests.get(url, timeout=TIMEOUT,
-                         headers={"User-Agent": USER_AGENT})
+        r = session.get(url, timeout=TIMEOUT, headers={"User-Agent": USER_AGENT})
         return {
             "status": r.status_code,
             "headers": dict(r.headers)
@@ -76,203 +111,445 @@ def fetch(url):
         return {"error": str(e)}
 
 def tls_info(host):
+    from tlsharvest import get_harvester
+
     try:
-        ctx = ssl.create_default_context()
-        with socket.create_connection((host, 443), timeout=TIMEOUT) as sock:
-            with ctx.wrap_socket(sock, server_hostname=host) as ssock:
-                cert = ssock.getpeercert()
-        return {
-            "issuer": cert.get("issuer"),
-            "valid_from": cert.get("notBefore"),
-            "valid_to": cert.get("notAfter")
+        harvester = get_harvester()
+        timeout = get_liveness().socket_timeout(host, TIMEOUT)
+        result = harvester.report(harvester.handshake(host, TLS_PORT, mode="tls", timeout=timeout))
+        if "error" in result:
+            return {"error": result["error"]}
+        leaf = result["certificates"][0]
+        if "error" in leaf:
+            return {"error": leaf["error"]}
+        info = {
+            "issuer": leaf["issuer"],
+            "subject": leaf["subject"],
+            "valid_from": leaf["valid_from"],
+            "valid_to": leaf["valid_to"],
+            "san": [v for _kind, v in leaf["san"]],
+            "protocol": result["protocol"],
+            "cipher": result["cipher"],
+            "fingerprint": leaf["fingerprint"],
+            "verified": result["verified"],
         }
+        if not result["verified"]:
+            # untrusted chain or wrong name: read anyway, and say why
+            info["validation_error"] = result["validation_error"]
+        return info
     except Exception as e:
         return {"error": str(e)}
 
-def simple_dirs(base):
-    paths = ["/admin","/login","/.git","/.env","/backup","/api"]
-    results = {}
-    for p in paths:
-        try:
-            r = requests.get(urljoin(base,p), timeout=TIMEOUT)
-            results[p] = r.status_code
-        except:
-            results[p] = "error"
-    return results
+DIR_PATHS = ["/admin","/login","/.git","/.env","/backup","/api"]
+
+def simple_dirs(base, session=None, wordlist=None):
+    # the built-in list goes through the same soft-404 aware scanner as a
+    # wordlist; being short, it keeps its full table with the misses as 404
+    from dirprobe import dirscan
+    if wordlist:
+        return dirscan(base, wordlist, session)
+    found = dirscan(base, DIR_PATHS, session, misses=True)
+    return {p: found[p] for p in DIR_PATHS}
 
 def run_nmap(host):
-    if shutil.which("nmap") is None:
+    if not nmap_available():
         return {"error": "nmap not installed"}
 
     try:
-        out = subprocess.check_output(
-            ["nmap","-sV","-Pn","-p","21,22,23,80,443,445,3389",host],
-            timeout=180, universal_newlines=True
-        )
-        return {"output": out[:3000]}
+        with get_limiter().slot(host, hold=False) as slot:
+            # nmap would look the name up itself; give it the cached address
+            address = get_resolver().address(host)
+            ports = list(stream_nmap([address], extra=get_liveness().nmap_args(host)))
+            slot.ok()
+        return {"ports": ports}
     except Exception as e:
         return {"error": str(e)}
 
-# ================= PDF REPORT =================
-
-from reportlab.platypus import Preformatted
-from reportlab.lib.styles import ParagraphStyle
-from reportlab.lib.units import inch
+def format_port(p):
+    service = " ".join(x for x in (p.get("product"), p.get("version")) if x)
+    return f"{p['port']}/{p['protocol']:<5} {p['state']:<9} {p.get('service') or '':<14} {service}".rstrip()
 
-def generate_pdf(target, data):
-    os.makedirs("reports", exist_ok=True)
-    filename = f"reports/BLACKTRACE_{target}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+def nmap_lines(nmap):
+    if "ports" in nmap:
+        return [format_port(p) for p in nmap["ports"]]
+    return nmap.get("output", "").splitlines()
 
-    doc = SimpleDocTemplate(filename, pagesize=A4)
-    elements = []
-    styles = getSampleStyleSheet()
+# ================= PDF REPORT =================
 
-    normal = styles["Normal"]
-    wrap_style = ParagraphStyle('wrap', parent=styles['Normal'], fontSize=9, leading=12)
-    mono_style = ParagraphStyle('mono', parent=styles['Normal'], fontName="Courier", fontSize=8, leading=10)
-    risk_style = ParagraphStyle('risk', parent=styles['Normal'], fontSize=10, leading=12)
+# Lines per monospaced block and rows per table. Bigger blocks mean fewer
+# flowables; these sizes still split cleanly across pages.
+NMAP_CHUNK = 250
+TABLE_CHUNK = 200
+# A table row cannot split across pages, so one huge value (a padded header,
+# a long TXT record) would not fit; longer values are cut in the PDF.
+CELL_LIMIT = 1500
+
+_pdf_styles = None
+
+def pdf_styles():
+    # Built once per process and shared by every report.
+    global _pdf_styles
+    if _pdf_styles is None:
+        from reportlab.platypus import TableStyle
+        from reportlab.lib import colors
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+
+        styles = getSampleStyleSheet()
+        _pdf_styles = {
+            "h1": styles["Heading1"],
+            "h2": styles["Heading2"],
+            "h3": styles["Heading3"],
+            "normal": styles["Normal"],
+            "wrap": ParagraphStyle('wrap', parent=styles['Normal'], fontSize=9, leading=12),
+            "risk": ParagraphStyle('risk', parent=styles['Normal'], fontSize=10, leading=12),
+            **{f"mono_{c}": ParagraphStyle(f'mono_{c}', parent=styles['Normal'], fontName="Courier",
+                                           fontSize=8, leading=13, textColor=c if c != "plain" else colors.black)
+               for c in ("plain", "red", "orange", "green")},
+            "table": TableStyle([
+                ('BACKGROUND',(0,0),(-1,0),colors.black),
+                ('TEXTCOLOR',(0,0),(-1,0),colors.white),
+                ('GRID',(0,0),(-1,-1),0.5,colors.grey),
+                ('VALIGN',(0,0),(-1,-1),'TOP')
+            ]),
+        }
+    return _pdf_styles
+
+SEVERITY_COLORS = {"high": "red", "medium": "orange", "low": "green"}
+
+def port_color(line):
+    # text nmap lines: port and service are the first and third fields
+    fields = line.split()
+    if len(fields) < 2 or fields[1] != "open" or not fields[0].split("/")[0].isdigit():
+        return None
+    services = [fields[2].lower()] if len(fields) > 2 else None
+    level = default_rules().port_levels([int(fields[0].split("/")[0])], services)[0]
+    return SEVERITY_COLORS.get(SEVERITIES[level])
+
+def nmap_rows(nmap):
+    # (line, colour) pairs; structured results are scored in one table pass
+    if "ports" not in nmap:
+        return [(line.strip(), port_color(line.strip())) for line in nmap.get("output", "").splitlines()]
+    ports = nmap["ports"]
+    levels = default_rules().port_levels([p["port"] for p in ports],
+                                         [p.get("service") for p in ports])
+    return [(format_port(p), SEVERITY_COLORS.get(SEVERITIES[level]) if p["state"] == "open" else None)
+            for p, level in zip(ports, levels)]
+
+def nmap_flowables(rows, st):
+    # Consecutive lines of the same risk colour share one Preformatted block
+    # (capped at NMAP_CHUNK lines) instead of a Paragraph + Spacer per line.
+    from reportlab.platypus import Preformatted
+
+    block, color = [], None
+    for line, c in rows:
+        if block and (c != color or len(block) >= NMAP_CHUNK):
+            yield Preformatted("\n".join(block), st["mono_" + (color or "plain")])
+            block = []
+        color = c
+        block.append(line)
+    if block:
+        yield Preformatted("\n".join(block), st["mono_" + (color or "plain")])
+
+def flat_items(content, prefix=""):
+    # nested dicts (HTTP headers) become one row per key rather than one
+    # giant cell that cannot split across pages
+    for k, v in content.items():
+        if isinstance(v, dict) and v:
+            yield from flat_items(v, f"{prefix}{k}.")
+        else:
+            yield f"{prefix}{k}", v
+
+def cell_text(v):
+    text = str(v)
+    if len(text) > CELL_LIMIT:
+        text = f"{text[:CELL_LIMIT]}... ({len(text) - CELL_LIMIT} more characters)"
+    return escape(text)
+
+def table_flowables(content, st):
+    from reportlab.platypus import Paragraph, Table as PDFTable
+    from reportlab.lib.units import inch
+
+    header = [Paragraph("<b>Key</b>", st["normal"]), Paragraph("<b>Value</b>", st["normal"])]
+    rows = [header]
+    for k, v in flat_items(content):
+        rows.append([Paragraph(cell_text(k), st["wrap"]), Paragraph(cell_text(v), st["wrap"])])
+        if len(rows) > TABLE_CHUNK:
+            yield PDFTable(rows, colWidths=[2*inch, 4*inch], style=st["table"])
+            rows = [[Paragraph("<b>Key</b>", st["normal"]), Paragraph("<b>Value</b>", st["normal"])]]
+    if len(rows) > 1 or not content:
+        yield PDFTable(rows, colWidths=[2*inch, 4*inch], style=st["table"])
+
+def risk_counts(data):
+    s = risk_of(data)
+    return s["high"], s["medium"], s["low"]
+
+def metrics_flowables(stages, st):
+    from reportlab.platypus import Paragraph, Table as PDFTable
+    from reportlab.lib.units import inch
+
+    header = ["Stage", "Seconds", "KB in", "KB out", "Conns", "Retries", "Error"]
+    rows = [[Paragraph(f"<b>{h}</b>", st["normal"]) for h in header]]
+    for stage, r in stages.items():
+        cells = [stage, f"{r['seconds']:.2f}", f"{r['bytes_in'] / 1024:.1f}", f"{r['bytes_out'] / 1024:.1f}",
+                 r["connections"], r["retries"], "yes" if r["error"] else ""]
+        rows.append([Paragraph(escape(str(c)), st["wrap"]) for c in cells])
+    yield PDFTable(rows, colWidths=[1.3*inch, 0.8*inch, 0.8*inch, 0.8*inch, 0.7*inch, 0.7*inch, 0.6*inch],
+                   style=st["table"])
+
+def report_flowables(target, data, stage_metrics=None):
+    from reportlab.platypus import Paragraph, Spacer
+
+    st = pdf_styles()
 
     # ---------- Executive Summary with Risk ----------
-    high_risk = 0
-    medium_risk = 0
-    low_risk = 0
-
-    # Count open ports in Nmap scan for risk scoring
-    nmap_output = data.get("Nmap", {}).get("output", "")
-    if nmap_output:
-        for line in nmap_output.splitlines():
-            if "open" in line.lower():
-                port = int(line.split("/")[0])
-                if port in [80,443,3389,445]:
-                    high_risk += 1
-                elif port in [21,22,23]:
-                    medium_risk += 1
-                else:
-                    low_risk += 1
-
-    elements.append(Paragraph("BLACKTRACE Security Assessment Report", styles["Heading1"]))
-    elements.append(Spacer(1, 12))
-    elements.append(Paragraph(f"Target: {target}", normal))
-    elements.append(Paragraph(f"Date: {datetime.datetime.now()}", normal))
-    elements.append(Spacer(1, 20))
+    risk = risk_of(data, detail=True)
+    high_risk, medium_risk, low_risk = risk["high"], risk["medium"], risk["low"]
+
+    yield Paragraph("BLACKTRACE Security Assessment Report", st["h1"])
+    yield Spacer(1, 12)
+    yield Paragraph(f"Target: {escape(target)}", st["normal"])
+    yield Paragraph(f"Date: {datetime.datetime.now()}", st["normal"])
+    yield Spacer(1, 20)
 
     # Executive Summary
-    elements.append(Paragraph("Executive Summary", styles["Heading2"]))
-    elements.append(Spacer(1, 10))
+    yield Paragraph("Executive Summary", st["h2"])
+    yield Spacer(1, 10)
     exec_summary = (
         "This report contains passive and active reconnaissance findings. "
         "Exposed services and configurations should be reviewed immediately."
     )
-    elements.append(Paragraph(exec_summary, normal))
-    elements.append(Spacer(1, 10))
+    yield Paragraph(exec_summary, st["normal"])
+    yield Spacer(1, 10)
 
     risk_summary = f"Risk Summary: [High: {high_risk}, Medium: {medium_risk}, Low: {low_risk}]"
-    elements.append(Paragraph(risk_summary, risk_style))
-    elements.append(Spacer(1, 20))
+    yield Paragraph(risk_summary, st["risk"])
+    yield Spacer(1, 20)
+
+    # open ports are coloured in the Nmap section; list everything else here
+    findings = {f"{kind} {key}": severity for kind, key, severity
+                in sorted(risk["findings"], key=lambda f: -LEVEL[f[2]]) if kind != "port"}
+    if findings:
+        yield Paragraph("Findings", st["h3"])
+        yield Spacer(1, 8)
+        yield from table_flowables(findings, st)
+        yield Spacer(1, 15)
 
     # ---------- Detailed Sections ----------
     for section, content in data.items():
-        elements.append(Paragraph(section, styles["Heading3"]))
-        elements.append(Spacer(1, 8))
+        if section == "Risk":
+            # already in the summary above
+            continue
+        yield Paragraph(escape(section), st["h3"])
+        yield Spacer(1, 8)
 
         if isinstance(content, dict):
-
             # Special case: Nmap
-            if section == "Nmap" and "output" in content:
-
-                for line in content["output"].splitlines():
-
-                    line = line.strip()
-
-                    if "open" in line.lower():
-                        try:
-                            port = int(line.split("/")[0])
-                        except:
-                            port = 0
-
-                        # High Risk
-                        if port in [80, 443, 3389, 445]:
-                            elements.append(
-                                Paragraph(f'<font color="red">{line}</font>', mono_style)
-                            )
-
-                        # Medium Risk
-                        elif port in [21, 22, 23]:
-                            elements.append(
-                                Paragraph(f'<font color="orange">{line}</font>', mono_style)
-                            )
-
-                        # Low Risk
-                        else:
-                            elements.append(
-                                Paragraph(f'<font color="green">{line}</font>', mono_style)
-                            )
-
-                    else:
-                        elements.append(Paragraph(line, mono_style))
-
-                    elements.append(Spacer(1, 3))
-
-                elements.append(Spacer(1, 15))
-                continue
-
-            # Other dictionary content
-            table_data = [
-                [Paragraph("<b>Key</b>", normal), Paragraph("<b>Value</b>", normal)]
-            ]
-
-            for k, v in content.items():
-                table_data.append([
-                    Paragraph(str(k), wrap_style),
-                    Paragraph(str(v), wrap_style)
-                ])
-
-            table = PDFTable(table_data, colWidths=[2*inch, 4*inch])
-            table.setStyle(TableStyle([
-                ('BACKGROUND',(0,0),(-1,0),colors.black),
-                ('TEXTCOLOR',(0,0),(-1,0),colors.white),
-                ('GRID',(0,0),(-1,-1),0.5,colors.grey),
-                ('VALIGN',(0,0),(-1,-1),'TOP')
-            ]))
-
-            elements.append(table)
-            elements.append(Spacer(1, 15))
+            if section == "Nmap" and ("ports" in content or "output" in content):
+                yield from nmap_flowables(nmap_rows(content), st)
+            else:
+                yield from table_flowables(content, st)
         else:
-            elements.append(Paragraph(str(content), wrap_style))
-            elements.append(Spacer(1, 15))
-
-    doc.build(elements)
+            yield Paragraph(escape(str(content)), st["wrap"])
+        yield Spacer(1, 15)
+
+    if stage_metrics:
+        yield Paragraph("Scan Metrics", st["h3"])
+        yield Spacer(1, 8)
+        yield from metrics_flowables(stage_metrics, st)
+
+def report_name(target):
+    # targets may be URLs; keep the file name flat
+    return re.sub(r"[^A-Za-z0-9._-]", "_", target)
+
+def generate_pdf(target, data, stage_metrics=None, directory=None):
+    # stage_metrics: {stage: record} from Metrics.target(); defaults to
+    # whatever this process measured for the target
+    directory = directory or REPORT_DIR
+    os.makedirs(directory, exist_ok=True)
+    filename = os.path.join(directory, f"BLACKTRACE_{report_name(target)}_"
+                                       f"{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf")
+
+    from reportlab.platypus import SimpleDocTemplate
+    from reportlab.lib.pagesizes import A4
+
+    reg = get_metrics()
+    if stage_metrics is None:
+        stage_metrics = reg.target(target)
+    with reg.measure(target, "Report"):
+        doc = SimpleDocTemplate(filename, pagesize=A4)
+        doc.build(list(report_flowables(target, data, stage_metrics)))
     return filename
 
 # ================= MAIN FLOW =================
 
-def run_scan(level, target):
-    data = {}
+def target_host(target):
+    return urlparse(normalize(target)).netloc.split(":")[0]
+
+# what each stage's output depends on besides the target, for the result cache
+STAGE_PARAMS = {
+    # "san": cached TLS results from before SANs were kept would hide them;
+    # "der": nor should ones from before the certificate was parsed from DER
+    "TLS": {"san": True, "der": True, "verify": True},
+    # "misses": the built-in list's table now lists its misses too
+    "Directories": {"paths": DIR_PATHS, "misses": True},
+    "Nmap": {"ports": NMAP_PORTS},
+}
+
+# Worst case a stage spends on a host that never answers; credited as time
+# saved when the liveness check lets it skip that host.
+STAGE_BUDGET = {
+    "HTTP": TIMEOUT,
+    "TLS": TIMEOUT,
+    "Directories": TIMEOUT * len(DIR_PATHS),
+    "Nmap": NMAP_TIMEOUT,
+}
+
+def url_port(url):
+    url = urlparse(url)
+    return url.port or (443 if url.scheme == "https" else 80)
+
+def liveness_ports(level, norm):
+    ports = set(PROBE_PORTS) | {url_port(norm), TLS_PORT}
+    if level == "3":
+        ports |= {int(p) for p in NMAP_PORTS.split(",")}
+    return tuple(sorted(ports))
+
+def check_liveness(host, ports):
+    # once per address: names on one IP share the probe and its verdict
+    index = get_index()
+    live = get_liveness()
+    result = index.share("Liveness", partial(live.check, ports=ports), ports)(host)
+    ip = index.ip(host)
+    live.alias(host, ip)
+    if live.verdict(ip) is None and isinstance(result, dict) and "ports" in result:
+        # a shared result whose verdict was dropped since: the gate needs it
+        live.record(ip, {int(p.split("/")[0]): s for p, s in result["ports"].items()})
+    return result
+
+def wordlist_params(wordlist):
+    # cache key for a Directories run: the file and its mtime, so editing the
+    # wordlist invalidates cached results
+    if not wordlist:
+        return {"paths": DIR_PATHS}
+    try:
+        mtime = os.path.getmtime(wordlist)
+    except OSError:
+        mtime = None
+    return {"wordlist": os.path.abspath(wordlist), "mtime": mtime}
+
+def scan_plan(level, target, session=None, cache=None, async_http=False, wordlist=None, nmap_shards=None):
+    # async_http: the HTTP stage is a coroutine on asyncprobe's shared loop
+    # (the Pipeline runs it there) instead of a blocking requests call.
+    # wordlist: file of paths for the Directories stage instead of DIR_PATHS.
+    # nmap_shards: an nmapxml.ShardBatcher; Nmap runs many hosts per process
     norm = normalize(target)
-    host = urlparse(norm).netloc.split(":")[0]
-
-    console.print("\n[green][*] Resolving DNS...[/green]")
-    data["DNS"] = resolve_dns(host)
-
-    console.print("[green][*] Fetching HTTP...[/green]")
-    data["HTTP"] = fetch(norm)
-
-    console.print("[green][*] Checking TLS...[/green]")
-    data["TLS"] = tls_info(host)
+    host = target_host(target)
+    index = get_index()
+    if async_http:
+        from asyncprobe import get_async_http
+        http = get_async_http().fetch
+    else:
+        http = partial(fetch, session=session)
+
+    plan = [
+        ("DNS", "\n[green][*] Resolving DNS...[/green]", resolve_dns, host),
+        ("Liveness", "[green][*] Checking liveness...[/green]",
+         partial(check_liveness, ports=liveness_ports(level, norm)), host),
+        ("HTTP", "[green][*] Fetching HTTP...[/green]", http, norm),
+        ("TLS", "[green][*] Checking TLS...[/green]", tls_info, host),
+    ]
 
     if level in ["2","3"]:
-        console.print("[green][*] Extended directory scan...[/green]")
-        data["Directories"] = simple_dirs(norm)
+        plan.append(("Directories", "[green][*] Extended directory scan...[/green]", partial(simple_dirs, session=session, wordlist=wordlist), norm))
 
     if level == "3":
-        console.print("[red][*] Running full nmap scan...[/red]")
-        data["Nmap"] = run_nmap(host)
-
+        plan.append(("Nmap", "[red][*] Running full nmap scan...[/red]", index.share("Nmap", nmap_shards.scan if nmap_shards else run_nmap), host))
+
+    if cache is not None:
+        params = dict(STAGE_PARAMS, Directories=wordlist_params(wordlist))
+        plan = [
+            (section, message, func if section == "Liveness" else
+             cache.wrap(target, section, dict(params.get(section, {}), arg=arg), func), arg)
+            for section, message, func, arg in plan
+        ]
+
+    # cached DNS results still teach the index which names share an address
+    plan = [(section, message, index.observing(func) if section == "DNS" else func, arg)
+            for section, message, func, arg in plan]
+
+    # stages that need a port the liveness check found dead return at once
+    live = get_liveness()
+    needs = {"HTTP": url_port(norm), "TLS": TLS_PORT, "Directories": url_port(norm), "Nmap": None}
+    plan = [
+        (section, message, live.gate(host, section, func, needs[section], STAGE_BUDGET[section])
+         if section in needs else func, arg)
+        for section, message, func, arg in plan
+    ]
+
+    # outermost, so cache hits and skips are timed too
+    reg = get_metrics()
+    return [(section, message, reg.wrap(target, section, func), arg) for section, message, func, arg in plan]
+
+def liveness_note(before=None):
+    # what the liveness check skipped since `before` (a Liveness.summary())
+    now = get_liveness().summary()
+    before = before or {"checked": 0, "down": 0, "check_seconds": 0.0, "skipped": {}, "saved_seconds": 0.0}
+    skipped = sum(now["skipped"].values()) - sum(before["skipped"].values())
+    if not skipped:
+        return None
+    return (f"[dim][*] Liveness: {now['down'] - before['down']} host(s) down, {skipped} stage run(s) skipped, "
+            f"up to {now['saved_seconds'] - before['saved_seconds']:.0f}s of timeouts saved "
+            f"(checks took {now['check_seconds'] - before['check_seconds']:.1f}s)[/dim]")
+
+def index_note(before=None):
+    # stage runs the host index saved since `before` (a HostIndex.summary())
+    now = get_index().summary()
+    reused = now["reused"] - (before or {}).get("reused", 0)
+    if not reused:
+        return None
+    return (f"[dim][*] Shared infrastructure: {reused} Liveness/Nmap run(s) reused across "
+            f"{now['names']} name(s) on {now['addresses']} address(es)[/dim]")
+
+def run_scan(level, target, cache=None, sink=None):
+    data = {}
+    before = get_liveness().summary()
+    with HostPool() as pool:
+        for section, message, func, arg in scan_plan(level, target, pool, cache):
+            console.print(message)
+            data[section] = func(arg)
+            if sink:
+                sink.stage(target, section, data[section])
+        stats = pool.snapshot()
+    console.print(f"[dim][*] HTTP: {stats['requests']} requests, "
+                  f"{stats['connections']} connections, {stats['reused']} reused[/dim]")
+    note = liveness_note(before)
+    if note:
+        console.print(note)
+    if sink:
+        sink.target(target, data)
     return data
 
 # ================= ENTRY =================
 
+def report_metrics(path=metrics.METRICS_PATH):
+    reg = get_metrics()
+    if not console.quiet:
+        reg.print_table(console)
+    console.print(f"[dim][*] Metrics written to {reg.write_textfile(path)}[/dim]")
+
+def archive(results):
+    # scan history for fleet-wide queries; optional, needs pyarrow
+    from columnar import ColumnarStore
+    try:
+        ColumnarStore().write(results)
+    except RuntimeError as e:
+        console.print(f"[dim][*] history not archived: {e}[/dim]")
+
 def main():
+    from rich.panel import Panel
+
+    cache = ResultCache()
+
     while True:
         banner()
         menu()
@@ -286,12 +563,33 @@ def main():
             console.print("[red]Invalid option[/red]")
             continue
 
-        target = console.input("\nEnter target domain (example.com) > ")
+        target = console.input("\nEnter target domain (example.com) or @scope.txt > ")
+
+        if target.startswith("@"):
+            from engine import load_scope
+            from pipeline import Pipeline
+            from render_farm import RenderFarm
+            with RenderFarm() as farm:
+                pipe = Pipeline(choice, report=farm.render, cache=cache, workers={"Report": farm.workers})
+                results = pipe.run(load_scope(target[1:]), monitor=5)
+                pipe.print_stats()
+                report_metrics()
+                archive(results)
+                portfolio = farm.portfolio()
+            console.print(Panel(
+                f"[bold green]{len(pipe.reports)} reports generated[/bold green]\n{portfolio}",
+                style="green"
+            ))
+            console.input("\nPress Enter to continue...")
+            continue
 
         console.print("\n[cyan]Starting scan...[/cyan]")
 
-        data = run_scan(choice, target)
+        data = run_scan(choice, target, cache)
+        archive({target: data})
         pdf = generate_pdf(target, data)
+        get_metrics().forget(target)
+        report_metrics()
 
         console.print(Panel(
             f"[bold green]Report generated successfully[/bold green]\n{pdf}",
@@ -301,4 +599,8 @@ def main():
         console.input("\nPress Enter to continue...")
 
 if __name__ == "__main__":
+    # any argument means headless: see cli.py
+    if len(sys.argv) > 1:
+        from cli import cli
+        sys.exit(cli(sys.argv[1:]))
     main()
@@ -10,6 +10,9 @@ import subprocess
 from urllib.parse import urlparse, urljoin
 import requests
 
+from pool import HostPool
+from reporter import report_name
+
 from rich.console import Console
 from rich.panel import Panel
 from rich.progress import track
@@ -59,9 +62,9 @@ def resolve_dns(host):
     except Exception as e:
         return {"error": str(e)}
 
-def fetch(url):
+def fetch(url, session=None):
     try:
-        r = requests.get(url, timeout=TIMEOUT,
+        r = (session or requests).get(url, timeout=TIMEOUT,
                          headers={"User-Agent": USER_AGENT})
         return {
             "status": r.status_code,
@@ -86,17 +89,17 @@ def tls_info(host):
     except Exception as e:
         return {"error": str(e)}
 
-def check_path(base, path):
+def check_path(base, path, session=None):
     try:
-        return fetch(urljoin(base, path))
+        return fetch(urljoin(base, path), session)
     except Exception as e:
         return {"error": str(e)}
 
-def simple_dirs(base):
+def simple_dirs(base, session=None):
     paths = ["/admin","/login","/.git","/.env","/backup","/api"]
     results = {}
     for p in paths:
-        r = fetch(urljoin(base, p))
+        r = fetch(urljoin(base, p), session)
         results[p] = r.get("status")
     return results
 
@@ -114,11 +117,11 @@ def run_nmap(host):
 
 # ================= REPORT =================
 
-def save_report(target, data):
-    if not os.path.exists("reports"):
-        os.makedirs("reports")
+def save_report(target, data, directory="reports"):
+    if not os.path.exists(directory):
+        os.makedirs(directory)
 
-    filename = f"reports/{target}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
+    filename = os.path.join(directory, f"{report_name(target)}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.txt")
 
     with open(filename,"w",encoding="utf-8") as f:
         f.write("SAFE RECON REPORT\n")
@@ -141,19 +144,23 @@ def run_scan(level, target):
     console.print("\n[bold green][*][/bold green] Resolving DNS...")
     data["DNS"] = resolve_dns(host)
 
-    console.print("[bold green][*][/bold green] Fetching HTTP info...")
-    data["HTTP"] = fetch(norm)
+    pool = HostPool()
+    try:
+        console.print("[bold green][*][/bold green] Fetching HTTP info...")
+        data["HTTP"] = fetch(norm, pool)
 
-    console.print("[bold green][*][/bold green] Checking TLS...")
-    data["TLS"] = tls_info(host)
+        console.print("[bold green][*][/bold green] Checking TLS...")
+        data["TLS"] = tls_info(host)
 
-    console.print("[bold green][*][/bold green] Checking robots & security.txt...")
-    data["robots"] = check_path(norm,"/robots.txt")
-    data["securitytxt"] = check_path(norm,"/.well-known/security.txt")
+        console.print("[bold green][*][/bold green] Checking robots & security.txt...")
+        data["robots"] = check_path(norm,"/robots.txt", pool)
+        data["securitytxt"] = check_path(norm,"/.well-known/security.txt", pool)
 
-    if level in ["2","3"]:
-        console.print("[bold green][*][/bold green] Running extended directory scan...")
-        data["Directories"] = simple_dirs(norm)
+        if level in ["2","3"]:
+            console.print("[bold green][*][/bold green] Running extended directory scan...")
+            data["Directories"] = simple_dirs(norm, pool)
+    finally:
+        pool.close()
 
     if level == "3":
         console.print("[bold red][*][/bold red] Running active nmap scan...")
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+
+import ssl
+import json
+import datetime
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from itertools import repeat
+
+SEVERITIES = ("none", "low", "medium", "high")
+LEVEL = {name: i for i, name in enumerate(SEVERITIES)}
+WEIGHTS = (0, 1, 5, 10)
+
+# (kind, match, severity)
+#   port     open port number or "lo-hi" range
+#   service  nmap service name on an open port (catches non-standard ports)
+#   path     directory probe answered below 400, or 401/403 (see exposed())
+#   header   security header missing from a successful HTTP response
+#   cert     certificate expires within <match> days (0 = already expired)
+# An open port or exposed path no rule names scores DEFAULT_PORT/DEFAULT_PATH.
+RULES = [
+    ("port", 80, "high"), ("port", 443, "high"), ("port", 3389, "high"), ("port", 445, "high"),
+    ("port", 21, "medium"), ("port", 22, "medium"), ("port", 23, "medium"),
+    ("service", "ms-wbt-server", "high"), ("service", "microsoft-ds", "high"),
+    ("service", "telnet", "medium"), ("service", "ftp", "medium"),
+    ("path", "/.git", "high"), ("path", "/.env", "high"), ("path", "/backup", "high"),
+    ("path", "/admin", "medium"), ("path", "/login", "low"), ("path", "/api", "low"),
+    ("header", "strict-transport-security", "low"), ("header", "content-security-policy", "low"),
+    ("header", "x-frame-options", "low"), ("header", "x-content-type-options", "low"),
+    ("cert", 0, "high"), ("cert", 14, "medium"), ("cert", 30, "low"),
+]
+DEFAULT_PORT = "low"
+DEFAULT_PATH = "low"
+
+# A path that answers below 400 is there; one that asks for credentials or
+# refuses them is there too, just behind auth.
+EXPOSED_DENIED = (401, 403)
+
+def exposed(status):
+    return isinstance(status, int) and (status < 400 or status in EXPOSED_DENIED)
+
+# ================= RULE TABLE =================
+
+class RuleTable:
+    # Rules compiled into lookup tables: a 64K bytearray indexed by port
+    # number and dicts for the string-keyed kinds, so scoring is table
+    # lookups driven by map() rather than per-finding branching.
+    def __init__(self, rules=RULES, default_port=DEFAULT_PORT, default_path=DEFAULT_PATH):
+        # open ports no rule names still score default_port
+        self.default_port = LEVEL[default_port]
+        self.ports = bytearray([self.default_port]) * 65536
+        self.services = {}
+        self.paths = {}
+        self.headers = {}
+        cert = {}
+        for kind, match, severity in rules:
+            level = LEVEL[severity]
+            if kind == "port":
+                lo, _, hi = str(match).partition("-")
+                for p in range(int(lo), int(hi or lo) + 1):
+                    self.ports[p] = max(self.ports[p], level)
+            elif kind == "service":
+                self.services[match.lower()] = level
+            elif kind == "path":
+                self.paths[match] = level
+            elif kind == "header":
+                self.headers[match.lower()] = level
+            elif kind == "cert":
+                cert[int(match)] = max(cert.get(int(match), 0), level)
+            else:
+                raise ValueError(f"unknown rule kind: {kind}")
+        self.cert_days = sorted(cert)
+        # a cert expiring in d days takes the highest level of every window
+        # holding it, i.e. every threshold >= d
+        self.cert_levels = bytearray(max(cert[x] for x in self.cert_days[i:])
+                                     for i in range(len(self.cert_days)))
+        self.default_path = LEVEL[default_path]
+
+    @classmethod
+    def load(cls, path):
+        # JSON: {"rules": [[kind, match, severity], ...], "default_port": ..., "default_path": ...}
+        # or just the list of rules
+        with open(path, encoding="utf-8") as f:
+            spec = json.load(f)
+        if isinstance(spec, list):
+            spec = {"rules": spec}
+        return cls([tuple(r) for r in spec["rules"]],
+                   spec.get("default_port", DEFAULT_PORT), spec.get("default_path", DEFAULT_PATH))
+
+    def port_levels(self, ports, services=None):
+        # ports: array/list of port numbers; services: matching nmap service
+        # names (nmap reports them lower-case)
+        levels = map(self.ports.__getitem__, ports)
+        if services is not None and self.services:
+            levels = map(max, levels, map(self.services.get, services, repeat(0)))
+        return bytearray(levels)
+
+    def cert_level(self, days):
+        i = bisect_left(self.cert_days, days)
+        return self.cert_levels[i] if i < len(self.cert_days) else 0
+
+_default = None
+
+def default_rules():
+    global _default
+    if _default is None:
+        _default = RuleTable()
+    return _default
+
+# ================= FINDINGS =================
+
+def _expiry_days(valid_to, now):
+    try:
+        ts = datetime.datetime.fromtimestamp(ssl.cert_time_to_seconds(valid_to), datetime.timezone.utc)
+    except (ValueError, TypeError):
+        try:
+            ts = datetime.datetime.fromisoformat(valid_to)
+        except (ValueError, TypeError):
+            return None
+        if ts.tzinfo is None:
+            ts = ts.replace(tzinfo=datetime.timezone.utc)
+    return (ts - now).days
+
+def open_port_rows(nmap):
+    if not isinstance(nmap, dict):
+        return []
+    if "ports" in nmap:
+        return [p for p in nmap["ports"] if p.get("state") == "open"]
+    # plain-text nmap output from older cached results
+    rows = []
+    for line in nmap.get("output", "").splitlines():
+        fields = line.split()
+        if len(fields) >= 2 and fields[1] == "open" and fields[0].split("/")[0].isdigit():
+            rows.append({"port": int(fields[0].split("/")[0]), "service": fields[2] if len(fields) > 2 else None})
+    return rows
+
+def score_batch(results, rules=None, detail=False, now=None):
+    # results: {target: data}. Returns {target: {"high", "medium", "low",
+    # "score"[, "findings"]}}, findings being (kind, key, severity) tuples.
+    rules = rules or default_rules()
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    targets = list(results)
+
+    # ports from every target go through the tables in one pass
+    port_owner, ports, services = array("I"), array("H"), []
+    # other kinds are few per target; levels resolved while collecting
+    owner, kinds, keys, levels = array("I"), [], [], bytearray()
+
+    for i, target in enumerate(targets):
+        data = results[target]
+        rows = open_port_rows(data.get("Nmap"))
+        if rows:
+            port_owner.extend(repeat(i, len(rows)))
+            ports.extend([p["port"] for p in rows])
+            services.extend([p.get("service") for p in rows])
+
+        dirs = data.get("Directories")
+        if isinstance(dirs, dict) and "error" not in dirs:
+            found = [p for p, s in dirs.items() if exposed(s)]
+            owner.extend(repeat(i, len(found)))
+            kinds.extend(repeat("path", len(found)))
+            keys.extend(found)
+            levels.extend(map(rules.paths.get, found, repeat(rules.default_path)))
+
+        http = data.get("HTTP")
+        if isinstance(http, dict) and isinstance(http.get("status"), int) and 200 <= http["status"] < 300:
+            present = {k.lower() for k in http.get("headers") or {}}
+            for name, level in rules.headers.items():
+                if name not in present:
+                    owner.append(i)
+                    kinds.append("header")
+                    keys.append(name)
+                    levels.append(level)
+
+        tls = data.get("TLS")
+        if isinstance(tls, dict) and tls.get("valid_to"):
+            days = _expiry_days(tls["valid_to"], now)
+            level = 0 if days is None else rules.cert_level(days)
+            if level:
+                owner.append(i)
+                kinds.append("cert")
+                keys.append(f"expires in {days} days" if days >= 0 else f"expired {-days} days ago")
+                levels.append(level)
+
+    port_levels = rules.port_levels(ports, services)
+    counts = Counter(zip(port_owner, port_levels))
+    counts.update(zip(owner, levels))
+
+    scores = {}
+    for i, target in enumerate(targets):
+        n = [counts[(i, level)] for level in range(len(SEVERITIES))]
+        scores[target] = {"high": n[3], "medium": n[2], "low": n[1],
+                          "score": sum(c * w for c, w in zip(n, WEIGHTS))}
+        if detail:
+            scores[target]["findings"] = []
+
+    if detail:
+        for i, p, level in zip(port_owner, ports, port_levels):
+            scores[targets[i]]["findings"].append(("port", p, SEVERITIES[level]))
+        for i, kind, key, level in zip(owner, kinds, keys, levels):
+            scores[targets[i]]["findings"].append((kind, key, SEVERITIES[level]))
+    return scores
+
+def score(data, rules=None, detail=False, now=None):
+    return score_batch({"": data}, rules, detail, now)[""]
+
+def risk_of(data, detail=False):
+    # the score the Pipeline's Risk stage stored with the target's batch, or
+    # a fresh one for data that did not come through it
+    risk = data.get("Risk")
+    if isinstance(risk, dict) and (not detail or "findings" in risk):
+        return risk
+    return score(data, detail=detail)
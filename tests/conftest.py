@@ -0,0 +1,47 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "bench"))
+
+@pytest.fixture(scope="session")
+def standins():
+    # HTTPS stand-in on 127.0.0.1 for *.bench.test, stub DNS and a fake nmap;
+    # see bench/standins.py
+    from standins import StandIns
+
+    st = StandIns()
+    if st.scheme != "https":
+        st.close()
+        pytest.skip("needs the openssl CLI for the stand-in certificate")
+    yield st
+    st.close()
+
+FIXTURES = os.path.join(ROOT, "tests", "fixtures")
+
+FAKE_NMAP = """#!/usr/bin/env python3
+import sys, time
+with open({log!r}, "a") as f:
+    f.write(" ".join(sys.argv[1:]) + "\\n")
+sys.stdout.write(open({xml!r}).read())
+sys.stdout.flush()
+time.sleep({hang!r})
+sys.exit({code!r})
+"""
+
+@pytest.fixture
+def fake_nmap(tmp_path, monkeypatch):
+    # install(fixture): an `nmap` first on PATH that prints a recorded XML
+    # file, then optionally hangs (a run that times out) or exits non-zero.
+    # Each run's arguments are appended to <tmp_path>/calls.
+    def install(fixture, hang=0, code=0):
+        path = tmp_path / "nmap"
+        path.write_text(FAKE_NMAP.format(xml=os.path.join(FIXTURES, fixture), hang=hang, code=code,
+                                         log=str(tmp_path / "calls")))
+        path.chmod(0o755)
+        monkeypatch.setenv("PATH", str(tmp_path) + os.pathsep + os.environ.get("PATH", ""))
+        return str(path)
+    return install
@@ -0,0 +1,76 @@
+import time
+import asyncio
+
+import ratelimit
+from asyncprobe import ConnPool, fetch_async, get_async_http
+from metrics import get_metrics
+from pipeline import Pipeline
+from reporter import target_host
+
+def test_pipeline_async_http(standins):
+    targets = standins.targets(5)
+    before = get_metrics().summary().get("HTTP", {}).get("bytes_in", 0)
+    results = Pipeline("1", async_http=True).run(targets)
+    for t in targets:
+        assert results[t]["HTTP"]["status"] == 200, results[t]["HTTP"]
+        assert results[t]["HTTP"]["headers"]["Content-Type"] == "text/html"
+    # paced, timed and measured like the requests path
+    paced = ratelimit.get_limiter().stats()
+    assert all(paced[target_host(t)]["requests"] >= 1 for t in targets)
+    assert get_metrics().summary()["HTTP"]["bytes_in"] > before
+    assert get_async_http().snapshot()["requests"] >= len(targets)
+
+def test_keep_alive_and_close(standins):
+    base = standins.targets(1)[0]
+
+    async def run():
+        pool = ConnPool()
+        found = [await fetch_async(base + p, pool=pool) for p in ("/", "/admin", "/login", "/missing")]
+        open_writers = [c.writer for conns in pool.idle.values() for c in conns]
+        await pool.close()
+        return found, pool.snapshot(), open_writers
+
+    found, stats, writers = asyncio.run(run())
+    assert [r["status"] for r in found] == [200, 200, 200, 404]
+    assert stats["opened"] == 1 and stats["reused"] == 3
+    assert writers and all(w.transport.is_closing() for w in writers)
+
+def test_rate_ceiling(standins):
+    base = standins.targets(1)[0]
+    ratelimit.configure(max_rate=5)
+    try:
+        async def run():
+            pool = ConnPool()
+            start = time.perf_counter()
+            await asyncio.gather(*(fetch_async(base, pool=pool) for _ in range(6)))
+            await pool.close()
+            return time.perf_counter() - start
+        # one token up front, then five more at 5/s
+        assert asyncio.run(run()) >= 0.9
+    finally:
+        ratelimit.configure()
+
+def test_idle_sockets_bounded(standins):
+    import os
+
+    targets = standins.targets(40)
+
+    async def run():
+        pool = ConnPool(max_hosts=8)
+        before = len(os.listdir("/proc/self/fd"))
+        found = [await fetch_async(t, pool=pool) for t in targets]
+        kept = sum(len(c) for c in pool.idle.values())
+        opened = len(os.listdir("/proc/self/fd")) - before
+        await pool.close()
+        return found, kept, opened, pool
+
+    found, kept, opened, pool = asyncio.run(run())
+    assert all(r["status"] == 200 for r in found)
+    assert len(pool.idle) == 0 and not pool.limits
+    # the kept sockets plus a few the resolver holds, not one per host
+    assert kept <= 8 and opened < 16
+    assert pool.snapshot()["evicted"] == len(targets) - kept
+
+def test_pipeline_closes_async_pool(standins):
+    Pipeline("1", async_http=True).run(standins.targets(3))
+    assert not get_async_http().pool.idle
@@ -0,0 +1,40 @@
+from cache import ResultCache
+
+def age(cache, seconds):
+    with cache.lock:
+        cache.db.execute("UPDATE results SET stored = stored - ?", (seconds,))
+        cache.db.commit()
+
+def rows(path):
+    cache = ResultCache(str(path), max_age=10 ** 9)
+    try:
+        return cache.db.execute("SELECT target, stage FROM results ORDER BY target").fetchall()
+    finally:
+        cache.close()
+
+def test_prune_on_close_and_open(tmp_path):
+    path = tmp_path / "cache.sqlite"
+    cache = ResultCache(str(path), max_age=3600)
+    cache.put("old.test", "DNS", None, {"A": []})
+    age(cache, 7200)
+    cache.put("new.test", "DNS", None, {"A": []})
+    cache.close()
+    assert rows(path) == [("new.test", "DNS")]
+
+    # rows a short-lived run left behind go when the next run opens the file
+    cache = ResultCache(str(path), max_age=10 ** 9)
+    age(cache, 7200)
+    cache.db.close()
+    cache = ResultCache(str(path), max_age=3600)
+    assert cache.stats["pruned"] == 1
+    cache.close()
+
+def test_default_max_age_is_longest_ttl(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache.sqlite"))
+    assert cache.max_age == 24 * 3600
+    cache.put("a.test", "TLS", None, {"san": []})
+    age(cache, 23 * 3600)
+    assert cache.prune() == 0
+    age(cache, 2 * 3600)
+    assert cache.prune() == 1
+    cache.close()
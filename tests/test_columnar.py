@@ -0,0 +1,57 @@
+import datetime
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from columnar import ColumnarStore, rows
+from riskscore import exposed
+
+DAY1 = datetime.datetime(2026, 3, 1, 12, 0, tzinfo=datetime.timezone.utc)
+DAY2 = datetime.datetime(2026, 3, 2, 12, 0, tzinfo=datetime.timezone.utc)
+
+def result(dirs, status=200):
+    return {
+        "DNS": {"A": ["192.0.2.1"], "MX": [{"preference": 10, "exchange": "mx.example"}]},
+        "HTTP": {"status": status, "headers": {"Server": "nginx", "Strict-Transport-Security": "max-age=1"}},
+        "TLS": {"issuer": {"commonName": "CA"}, "valid_from": "Jan  1 00:00:00 2026 GMT",
+                "valid_to": "Jun  1 00:00:00 2026 GMT"},
+        "Directories": dirs,
+        "Nmap": {"ports": [{"host": "192.0.2.1", "port": 443, "protocol": "tcp", "state": "open",
+                            "service": "https", "product": None, "version": None}]},
+    }
+
+def test_round_trip(tmp_path):
+    store = ColumnarStore(str(tmp_path))
+    results = {"a.example": result({"/.env": 200, "/admin": 404}),
+               "b.example": {"HTTP": {"error": "timed out"}, "Directories": {"/api": "reset"}}}
+    written = store.write(results, scanned_at=DAY1)
+    assert set(written) == {"dns", "http", "headers", "tls", "dirs", "nmap"}
+
+    for table, expected in {t: [] for t in written}.items():
+        for target, data in results.items():
+            expected.extend(rows(target, data)[table])
+        got = store.query(table).drop_columns(["scanned_at", "date"]).to_pylist()
+        assert sorted(got, key=repr) == sorted(expected, key=repr), table
+
+    http = {r["target"]: r for r in store.query("http").to_pylist()}
+    assert http["a.example"]["hsts"] and not http["a.example"]["csp"]
+    assert http["b.example"]["error"] == "timed out" and http["b.example"]["status"] is None
+    assert store.query("tls").to_pylist()[0]["valid_to"] == datetime.datetime(2026, 6, 1, tzinfo=datetime.timezone.utc)
+    assert store.cert_expiry_histogram() == {"2026-06": 1}
+
+def test_hosts_with_path(tmp_path):
+    store = ColumnarStore(str(tmp_path))
+    statuses = {"ok.example": 200, "moved.example": 301, "auth.example": 401,
+                "denied.example": 403, "gone.example": 404, "broken.example": 500}
+    store.write({t: {"Directories": {"/admin": s}} for t, s in statuses.items()}, scanned_at=DAY1)
+    store.write({"late.example": {"Directories": {"/admin": 200}}}, scanned_at=DAY2)
+
+    # same rule as the risk score and the snapshot diffs
+    want = sorted(t for t, s in statuses.items() if exposed(s))
+    assert want == ["auth.example", "denied.example", "moved.example", "ok.example"]
+    assert store.hosts_with_path("/admin", until="2026-03-01") == want
+    assert store.hosts_with_path("/admin") == sorted(want + ["late.example"])
+    assert store.hosts_with_path("/admin", since="2026-03-02") == ["late.example"]
+    assert len(store.hosts_with_path("/admin", exposed=False)) == len(statuses) + 1
+    assert store.hosts_with_path("/.git") == []
@@ -0,0 +1,48 @@
+import os
+
+from diffscan import SnapshotStore, changed_only, diff_batch
+from riskscore import score
+
+def scan(status=200, server="nginx", date="Mon", ports=(22, 80)):
+    data = {
+        "HTTP": {"status": status, "headers": {"Server": server, "Date": date}},
+        "Nmap": {"ports": [{"port": p, "protocol": "tcp", "state": "open", "service": "x"} for p in ports]},
+        "TLS": {"valid_to": "2030-01-01T00:00:00+00:00", "issuer": {"commonName": "CA"}},
+    }
+    data["Risk"] = score(data, detail=True)
+    return data
+
+def test_new_unchanged_changed(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    assert store.diff("example.com", scan()) == {"new_target": True}
+    # a volatile header and a recomputed Risk section are not changes
+    again = scan(date="Tue")
+    again["Risk"] = dict(again["Risk"], score=again["Risk"]["score"] + 1)
+    assert store.diff("example.com", again) == {}
+    delta = store.diff("example.com", scan(status=500, ports=(22, 80, 3389)))
+    assert delta["HTTP"] == {"status": {"old": 200, "new": 500}}
+    assert delta["Nmap"] == {"new_open_ports": ["3389/tcp"]}
+    assert "Risk" not in delta
+
+def test_index_persists(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    assert diff_batch(store, {"a.example": scan(), "b.example": scan()}).keys() == {"a.example", "b.example"}
+    reopened = SnapshotStore(str(tmp_path))
+    assert diff_batch(reopened, {"a.example": scan(), "b.example": scan(server="apache")}) == {
+        "b.example": {"HTTP": {"headers": {"changed": {"server": {"old": "nginx", "new": "apache"}}}}}}
+
+def test_targets_that_sanitize_alike(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    store.diff("a.b/x", scan(status=200))
+    store.diff("a.b_x", scan(status=404))
+    assert len([n for n in os.listdir(tmp_path) if n != "index.json"]) == 2
+    assert store.diff("a.b/x", scan(status=301))["HTTP"]["status"] == {"old": 200, "new": 301}
+
+def test_changed_only(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    calls = []
+    report = changed_only(lambda target, data: calls.append(data.get("Changes")) or "report.pdf", store)
+    assert report("example.com", scan()) == "report.pdf"
+    assert report("example.com", scan()) is None
+    report("example.com", scan(status=503))
+    assert calls == [{"new_target": True}, {"HTTP": {"status": {"old": 200, "new": 503}}}]
@@ -0,0 +1,66 @@
+import pytest
+
+import dirprobe
+from dirprobe import ProbeStats, dirscan
+from pool import HostPool
+from reporter import simple_dirs
+
+def test_builtin_list_reports_hits(standins):
+    base = standins.targets(1)[0]
+    pool = HostPool()
+    try:
+        found = simple_dirs(base, session=pool)
+    finally:
+        pool.close()
+    # the whole table, in list order, misses included
+    assert list(found.items()) == [("/admin", 200), ("/login", 200), ("/.git", 403),
+                                   ("/.env", 404), ("/backup", 404), ("/api", 401)]
+
+def test_wordlist_through_pipeline(standins, tmp_path):
+    from pipeline import Pipeline
+    wordlist = tmp_path / "paths.txt"
+    wordlist.write_text("# comment\nadmin\n/api\n/nothing-here\n")
+    target = standins.targets(1)[0]
+    results = Pipeline("2", wordlist=str(wordlist)).run([target])
+    assert results[target]["Directories"] == {"/admin": 200, "/api": 401}
+
+@pytest.fixture(scope="module")
+def soft404(standins):
+    # a second stand-in whose unknown paths answer 200 with a page echoing
+    # the path; closing it puts the session stand-in's settings back
+    from standins import StandIns
+    st = StandIns(soft404=True)
+    yield st
+    st.close()
+
+PATHS = ["/admin", "/login", "/.git", "/api", "/.env", "/backup", "/no-such-page", "/old/site.zip"]
+HITS = {"/admin": 200, "/login": 200, "/.git": 403, "/api": 401}
+
+def test_soft404_dropped_by_length(soft404):
+    stats = ProbeStats()
+    found = dirscan(soft404.targets(1)[0], PATHS, stats=stats)
+    assert found == HITS
+    counts = stats.snapshot()
+    assert counts["soft404"] == 4 and counts["hits"] == 4
+
+def test_builtin_list_on_soft404_host(soft404):
+    pool = HostPool()
+    try:
+        found = simple_dirs(soft404.targets(1)[0], session=pool)
+    finally:
+        pool.close()
+    # /.env and /backup answered 200 but are listed as the misses they are
+    assert found == dict(HITS, **{"/.env": 404, "/backup": 404})
+
+def test_soft404_dropped_by_body_prefix(soft404, monkeypatch):
+    # without a usable Content-Length (chunked, compressed) the verdict falls
+    # to the masked body prefix
+    monkeypatch.setattr(dirprobe, "_length", lambda r: None)
+    stats = ProbeStats()
+    found = dirscan(soft404.targets(1)[0], PATHS, stats=stats)
+    assert found == HITS
+    counts = stats.snapshot()
+    assert counts["soft404"] == 4
+    # the 2 learning GETs, /.git's GET after its 403 HEAD, and one ranged GET
+    # per 200 answer compared on its prefix
+    assert counts["get"] == 2 + 1 + 6
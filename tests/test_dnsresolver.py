@@ -0,0 +1,82 @@
+import threading
+
+import pytest
+
+from dnsresolver import Resolver, resolv_conf
+from standins import StubDNS
+
+@pytest.fixture
+def stub():
+    dns = StubDNS().start()
+    yield dns
+    dns.close()
+
+def resolver(stub, **kwargs):
+    return Resolver(nameservers=["127.0.0.1"], port=stub.port, **dict({"search": []}, **kwargs))
+
+def test_answers_are_cached(stub):
+    r = resolver(stub)
+    found = r.lookup("www.bench.test")
+    assert found["A"] == ["127.0.0.1"] and found["AAAA"] == []
+    asked = stub.queries
+    assert r.lookup("WWW.bench.test.")["A"] == ["127.0.0.1"]
+    assert r.address("www.bench.test") == "127.0.0.1"
+    assert stub.queries == asked
+    assert r.lookup("www.example.invalid") == {"error": "www.example.invalid: NXDOMAIN"}
+
+def test_search_and_ndots(stub):
+    r = resolver(stub, search=["bench.test"], ndots=2)
+    # fewer than ndots dots: the search list first
+    short = r.lookup("web")
+    assert short["fqdn"] == "web.bench.test" and short["A"] == ["127.0.0.1"]
+    assert r.lookup("a.b")["fqdn"] == "a.b.bench.test"
+    # enough dots: as given first, no fqdn when that answers
+    assert "fqdn" not in r.lookup("x.y.bench.test")
+    # a trailing dot turns the search list off
+    assert "error" in r.lookup("web.")
+    assert r.candidates("web") == ["web.bench.test", "web"]
+    assert r.candidates("a.b.c") == ["a.b.c", "a.b.c.bench.test"]
+
+def test_resolv_conf(tmp_path):
+    path = tmp_path / "resolv.conf"
+    path.write_text("# comment\nnameserver 10.0.0.53\ndomain old.test\nsearch corp.test. lab.test\n"
+                    "options rotate ndots:3\n")
+    assert resolv_conf(str(path)) == {"nameservers": ["10.0.0.53"], "search": ["corp.test", "lab.test"],
+                                      "ndots": 3}
+
+def test_lookups_from_many_threads(stub):
+    r = resolver(stub)
+    names = [f"h{i}.bench.test" for i in range(64)]
+    found, errors = {}, []
+
+    def work(chunk):
+        try:
+            for n in chunk:
+                found[n] = r.lookup(n)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=work, args=(names[i::16],)) for i in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
+    assert all(found[n]["A"] == ["127.0.0.1"] for n in names)
+    assert r.endpoints == {}
+
+def test_stages_dial_through_the_cache(standins):
+    import dnsresolver
+    from pool import HostPool
+    from reporter import fetch, tls_info
+
+    r = dnsresolver.get_resolver()
+    name = "dial.bench.test"
+    r.lookup(name)
+    hits = r.stats["cache_hits"]
+    with HostPool() as pool:
+        assert fetch(f"https://{name}:{standins.web_port}/", session=pool)["status"] == 200
+    assert r.stats["cache_hits"] > hits
+    hits = r.stats["cache_hits"]
+    assert "error" not in tls_info(name)
+    assert r.stats["cache_hits"] > hits
@@ -0,0 +1,52 @@
+from expansion import Allowlist, BloomFilter, Expander, SeenSet
+from pipeline import Pipeline
+from standins import ZONE
+
+def found(*san, cname=()):
+    return {"TLS": {"san": list(san)}, "DNS": {"CNAME": list(cname)}}
+
+def test_out_of_scope_never_queued():
+    allow = Allowlist(["example.com", "10.0.0.0/8", "# comment", "*.corp.test"])
+    assert allow.allows("a.b.example.com") and allow.allows("x.corp.test") and allow.allows("10.1.2.3")
+    assert not allow.allows("example.com.evil.net") and not allow.allows("notexample.com")
+    expander = Expander(allow)
+    section, queued = expander.expand(found("www.example.com", "cdn.other.net", "192.0.2.7",
+                                            cname=["EDGE.Other.Net."]))
+    assert queued == ["www.example.com"]
+    assert section["out_of_scope"] == ["192.0.2.7", "cdn.other.net", "edge.other.net"]
+
+def test_each_name_expanded_once():
+    expander = Expander(Allowlist(["example.com"]))
+    expander.seed(["https://example.com"])
+    _, first = expander.expand(found("example.com", "a.example.com", "b.example.com"))
+    _, again = expander.expand(found("a.example.com", "b.example.com", "c.example.com"), depth=1)
+    assert first == ["a.example.com", "b.example.com"]
+    assert again == ["c.example.com"]
+    # past max_depth names are listed but not queued
+    section, deep = expander.expand(found("d.example.com"), depth=2)
+    assert deep == [] and section["depth_limit"]
+
+def test_bloom_has_no_false_negatives():
+    bloom = BloomFilter(capacity=200, error_rate=0.01)
+    names = [f"host{i}.example.com" for i in range(1000)]
+    for n in names:
+        bloom.add(n)
+    assert all(n in bloom for n in names)
+
+def test_seen_set_past_exact_limit():
+    seen = SeenSet(exact_limit=10, capacity=100, error_rate=0.01)
+    names = [f"host{i}.example.com" for i in range(100)]
+    added = [seen.add(n) for n in names]
+    assert all(added[:10])
+    # the Bloom filter alone past the limit: a repeat is never taken for new
+    assert not any(seen.add(n) for n in names)
+    assert len(seen.exact) == 10
+
+def test_pipeline_expands_san_names(standins):
+    # the stand-in certificate's SANs are *.bench.test and bench.test
+    seed = standins.targets(1)[0]
+    expander = Expander(Allowlist([ZONE]), max_depth=1)
+    results = Pipeline("1", expander=expander).run([seed])
+    assert results[seed]["Expansion"]["wildcards"] == [f"*.{ZONE}"]
+    assert results[seed]["Expansion"]["queued"] == [ZONE]
+    assert set(results) == {seed, ZONE}
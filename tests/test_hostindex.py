@@ -0,0 +1,94 @@
+import threading
+import time
+
+from hostindex import HostIndex, addresses
+
+def dns(*ips):
+    return {"A": [ip for ip in ips if ":" not in ip], "AAAA": [ip for ip in ips if ":" in ip]}
+
+def test_addresses_order():
+    assert addresses(dns("2001:db8::1", "192.0.2.9", "192.0.2.10")) == ["192.0.2.9", "192.0.2.10", "2001:db8::1"]
+    assert addresses({"error": "NXDOMAIN"}) == []
+
+def test_names_on_one_address_share_one_run():
+    index = HostIndex()
+    index.observe("a.example", dns("192.0.2.10", "192.0.2.9"))
+    index.observe("b.example", dns("192.0.2.9"))
+    calls = []
+    gate = threading.Event()
+
+    def probe(ip):
+        calls.append(ip)
+        gate.wait(5)
+        return {"state": "up"}
+
+    for section in ("Liveness", "Nmap"):
+        shared = index.share(section, probe)
+        out = {}
+        # both at once: the second waits for the first's run
+        threads = [threading.Thread(target=lambda n=n: out.update({n: shared(n)})) for n in ("a.example", "b.example")]
+        for t in threads:
+            t.start()
+        time.sleep(0.1)
+        gate.set()
+        for t in threads:
+            t.join()
+        gate.clear()
+        assert out["a.example"] == out["b.example"] == {"state": "up", "address": "192.0.2.9"}
+        assert out["a.example"] is not out["b.example"]
+    assert calls == ["192.0.2.9", "192.0.2.9"]
+    assert index.summary()["reused"] == 2
+    assert index.hosts("192.0.2.9") == ["a.example", "b.example"]
+
+def test_own_address_left_out():
+    index = HostIndex()
+    assert index.share("Nmap", lambda ip: {"ports": []})("192.0.2.1") == {"ports": []}
+
+def test_ttl_and_purge():
+    index = HostIndex(ttl=0.05)
+    index.observe("a.example", dns("192.0.2.9"))
+    calls = []
+    shared = index.share("Nmap", lambda ip: calls.append(ip) or {"ports": []})
+    shared("a.example")
+    shared("a.example")
+    assert len(calls) == 1
+    time.sleep(0.1)
+    shared("a.example")
+    assert len(calls) == 2
+    time.sleep(0.1)
+    index.purge()
+    assert not index.results
+
+def test_failed_run_not_shared():
+    index = HostIndex()
+    index.observe("a.example", dns("192.0.2.9"))
+    index.observe("b.example", dns("192.0.2.9"))
+    runs = []
+
+    def flaky(ip):
+        runs.append(ip)
+        if len(runs) == 1:
+            raise OSError("boom")
+        return {"ok": True}
+
+    shared = index.share("Liveness", flaky)
+    try:
+        shared("a.example")
+    except OSError:
+        pass
+    assert shared("b.example") == {"ok": True, "address": "192.0.2.9"}
+    assert len(runs) == 2
+
+def test_pipeline_scans_shared_address_once(standins, fake_nmap, tmp_path, monkeypatch):
+    import hostindex
+    from pipeline import Pipeline
+
+    monkeypatch.setattr(hostindex, "_default", HostIndex())
+    fake_nmap("nmap_normal.xml")
+    targets = standins.targets(3)
+    results = Pipeline("3").run(targets)
+    # every stand-in name is 127.0.0.1: one nmap run, fanned out to each
+    assert len((tmp_path / "calls").read_text().splitlines()) == 1
+    for t in targets:
+        assert results[t]["Nmap"]["address"] == "127.0.0.1"
+        assert results[t]["Liveness"]["address"] == "127.0.0.1"
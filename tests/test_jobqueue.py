@@ -0,0 +1,65 @@
+import os
+import threading
+
+import hostindex
+import liveness
+import ratelimit
+from hostindex import get_index
+from jobqueue import Daemon, Job, Spool
+from liveness import get_liveness
+from ratelimit import get_limiter
+from reporter import target_host
+
+class StoppedDaemon:
+    # stops between the spool's check and its submit
+    level = "1"
+    stopping = threading.Event()
+
+    def submit(self, job):
+        raise RuntimeError("daemon is shutting down")
+
+def test_spool_keeps_job_when_stopping(tmp_path):
+    spool = Spool(StoppedDaemon(), str(tmp_path))
+    (tmp_path / "incoming" / "a.txt").write_text("example.com\n")
+    spool.run()
+    assert os.listdir(tmp_path / "working") == [f"{os.getpid()}-a.txt"]
+    assert not os.listdir(tmp_path / "failed")
+
+def test_host_state_dropped_after_job(standins, tmp_path, monkeypatch):
+    # names earlier tests left on 127.0.0.1 would keep the address in use
+    for module in (hostindex, liveness, ratelimit):
+        monkeypatch.setattr(module, "_default", None)
+    targets = standins.targets(3)
+    d = Daemon("1", output=str(tmp_path))
+    job = d.submit(Job("j1", targets, "1"))
+    assert job.done.wait(60)
+    assert d.drain(10)
+    hosts = {target_host(t) for t in targets}
+    assert not hosts & set(get_limiter().stats())
+    assert not any(get_liveness().verdict(h) for h in hosts)
+    assert not hosts & set(get_index().hosts("127.0.0.1"))
+    assert not d.hosts
+
+class StageLog:
+    def __init__(self):
+        self.stages = []
+
+    def stage(self, target, section, data):
+        self.stages.append((target, section, data))
+
+    def target(self, target, data):
+        pass
+
+def test_dead_host_gated_on_every_job(standins, tmp_path, monkeypatch):
+    # nothing listens on 127.0.0.2; the second job comes within SHARE_TTL
+    for module in (hostindex, liveness, ratelimit):
+        monkeypatch.setattr(module, "_default", None)
+    target = f"http://127.0.0.2:{standins.web_port}"
+    log = StageLog()
+    d = Daemon("1", output=str(tmp_path), sink=log)
+    for n in range(2):
+        assert d.submit(Job(f"dead{n}", [target], "1")).done.wait(60)
+    assert d.drain(10)
+    http = [data for _t, section, data in log.stages if section == "HTTP"]
+    assert len(http) == 2
+    assert all(h.get("skipped") and "closed" in h["error"] for h in http), http
@@ -0,0 +1,37 @@
+import pytest
+
+from journal import Journal, replay
+
+def test_interrupted_journal_kept(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    j = Journal(path, "1")
+    j.stage("example.com", "DNS", {"A": ["192.0.2.1"]})
+    j.close()
+    with pytest.raises(ValueError, match="--resume"):
+        Journal(path, "1")
+    assert replay(path)[1] == {"example.com": {"DNS": {"A": ["192.0.2.1"]}}}
+    Journal(path, "1", fresh=True).close()
+    assert replay(path)[1] == {}
+
+def test_compacted_journal_replaced(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    j = Journal(path, "1")
+    j.stage("example.com", "DNS", {"A": ["192.0.2.1"]})
+    j.target("example.com", {})
+    j.compact()
+    Journal(path, "1").close()
+    assert replay(path)[1] == {}
+
+def test_resumed_run_counts_as_interrupted(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    j = Journal(path, "1")
+    j.stage("a.example", "DNS", {})
+    j.target("a.example", {})
+    j.compact()
+    j = Journal(path, "1", resume=True)
+    j.stage("b.example", "DNS", {})
+    j.close()
+    with pytest.raises(ValueError):
+        Journal(path, "1")
+    header, data, finished = replay(path)
+    assert not header["compacted"] and finished == {"a.example"} and "b.example" in data
@@ -0,0 +1,47 @@
+import liveness
+from liveness import MIN_CONNECT, MIN_READ, Liveness, get_liveness
+from pipeline import Pipeline
+from pool import HostPool
+from reporter import TIMEOUT, fetch, target_host
+
+
+def test_dead_host_skips_stages(standins, monkeypatch):
+    # a filtered host can't be made on loopback, so the probe reports one
+    # address as filtered (liveness runs per address, and every stand-in name
+    # is 127.0.0.1); every other stage still runs as usual
+    dead = f"https://127.0.0.3:{standins.web_port}"
+    real = liveness.tcp_probe
+    monkeypatch.setattr(liveness, "tcp_probe",
+                        lambda host, port, timeout: ("filtered", None) if host == target_host(dead)
+                        else real(host, port, timeout))
+    monkeypatch.setattr(liveness, "_default", Liveness())
+    data = Pipeline("3").run([dead])[dead]
+    assert data["Liveness"]["state"] == "down"
+    for section in ("HTTP", "TLS", "Directories", "Nmap"):
+        assert data[section].get("skipped"), (section, data[section])
+    assert data["HTTP"]["error"] == f"skipped: {standins.web_port}/tcp filtered"
+    assert data["Nmap"]["error"].startswith("skipped: host down: no reply on ")
+    summary = get_liveness().summary()
+    assert summary["skipped"] == {"HTTP": 1, "TLS": 1, "Directories": 1, "Nmap": 1}
+    assert summary["down"] == 1 and summary["saved_seconds"] > 0
+
+def test_tighten_from_observed_rtts(standins, monkeypatch):
+    monkeypatch.setattr(liveness, "_default", Liveness())
+    target = standins.targets(1)[0]
+    host = target_host(target)
+    live = get_liveness()
+    assert live.tighten(host, TIMEOUT) == TIMEOUT
+    assert live.check(host, (standins.web_port,))["state"] == "up"
+    # a local connect is far under the floor, reads not seen yet
+    assert live.tighten(host, TIMEOUT) == (MIN_CONNECT, TIMEOUT)
+    with HostPool() as pool:
+        assert fetch(target, session=pool)["status"] == 200
+    assert live.tighten(host, TIMEOUT) == (MIN_CONNECT, MIN_READ)
+    # never above the stage's own timeout
+    assert live.tighten(host, 0.5) == (0.5, 0.5)
+
+def test_unknown_host_not_blocked():
+    live = Liveness()
+    assert live.blocked("never-checked.example") is None
+    assert live.blocked("never-checked.example", 443) is None
+    assert live.tighten("never-checked.example", TIMEOUT) == TIMEOUT
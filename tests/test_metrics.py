@@ -0,0 +1,37 @@
+import metrics
+from metrics import Metrics
+from pipeline import Pipeline
+
+def test_samples_bounded(monkeypatch):
+    monkeypatch.setattr(metrics, "RESERVOIR", 100)
+    reg = Metrics()
+    for i in range(1000):
+        reg.observe(f"t{i}", "HTTP", {"seconds": i / 1000})
+    s = reg.summary()["HTTP"]
+    assert len(reg.stages["HTTP"].samples) == 100
+    assert s["calls"] == 1000
+    assert s["max"] == 0.999
+    assert 0.3 < s["p50"] < 0.7
+
+def test_targets_dropped_once_done(standins):
+    targets = standins.targets(3)
+    Pipeline("1").run(targets)
+    reg = metrics.get_metrics()
+    assert not any(reg.target(t) for t in targets)
+    assert reg.summary()["HTTP"]["calls"] >= len(targets)
+
+def test_dirscan_probes_credited(standins):
+    from dirprobe import dirscan
+    from standins import EXISTING
+
+    base = standins.targets(1)[0]
+    reg = Metrics()
+    with reg.measure(base, "learn") as learn:
+        dirscan(base, [])
+    with reg.measure(base, "Directories") as record:
+        hits = dirscan(base, list(EXISTING) + ["/missing", "/nope"])
+    assert hits
+    # two soft-404 samples, then seven probes, each a request of its own
+    assert record["bytes_out"] > 3 * learn["bytes_out"]
+    assert record["bytes_in"] > learn["bytes_in"]
+    assert record["connections"] >= 1
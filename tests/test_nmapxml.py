@@ -0,0 +1,148 @@
+import os
+import time
+import subprocess
+import xml.etree.ElementTree as ET
+
+import pytest
+
+import nmapxml
+from nmapxml import _host_records, parse_nmap_file, stream_nmap
+from reporter import run_nmap
+from riskscore import open_port_rows
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+def fixture(name):
+    return os.path.join(FIXTURES, name)
+
+def whole_document(name):
+    # the reference: one ET.parse of the complete document
+    root = ET.parse(fixture(name)).getroot()
+    return [rec for host in root.iter("host") for rec in _host_records(host)]
+
+def streamed(name):
+    # records yielded before the parser gave up, and the error if it did
+    found = []
+    try:
+        with open(fixture(name), "rb") as f:
+            for rec in nmapxml.iter_nmap_xml(f):
+                found.append(rec)
+    except ET.ParseError as e:
+        return found, e
+    return found, None
+
+def by_host(records):
+    hosts = {}
+    for r in records:
+        hosts.setdefault(r["hostname"], []).append(r)
+    return hosts
+
+def text_sections(name):
+    # the plain -oN output split per host, as the old runner stored it
+    sections = {}
+    with open(fixture(name)) as f:
+        for block in f.read().split("Nmap scan report for ")[1:]:
+            sections[block.split()[0]] = block
+    return sections
+
+@pytest.mark.parametrize("chunk", [nmapxml.CHUNK, 7])
+def test_normal_matches_whole_document(monkeypatch, chunk):
+    # small chunks split tags and attributes across feeds
+    monkeypatch.setattr(nmapxml, "CHUNK", chunk)
+    found, error = streamed("nmap_normal.xml")
+    assert error is None
+    assert found == whole_document("nmap_normal.xml")
+    assert len(found) == 21
+    assert found[1] == {"host": "198.51.100.10", "hostname": "scanme.bench.test", "port": 22,
+                        "protocol": "tcp", "state": "open", "service": "ssh",
+                        "product": "OpenSSH", "version": "9.6p1 Ubuntu 3ubuntu13.5"}
+
+def test_normal_matches_text_parser():
+    # the open ports the old text output gave, host by host
+    hosts = by_host(parse_nmap_file(fixture("nmap_normal.xml")))
+    old = text_sections("nmap_normal.nmap")
+    assert set(hosts) == set(old)
+    for name, records in hosts.items():
+        new = [r["port"] for r in open_port_rows({"ports": records})]
+        assert new == [r["port"] for r in open_port_rows({"output": old[name]})]
+
+def test_truncated_keeps_finished_hosts():
+    found, error = streamed("nmap_truncated.xml")
+    assert isinstance(error, ET.ParseError)
+    done = by_host(whole_document("nmap_normal.xml"))
+    assert by_host(found) == {h: done[h] for h in ("scanme.bench.test", "www.bench.test")}
+
+def test_truncated_run_is_an_error(fake_nmap):
+    # nmap died mid-document: an error, as the old check_output runner gave
+    fake_nmap("nmap_truncated.xml", code=1)
+    result = run_nmap("mail.bench.test")
+    assert set(result) == {"error"}
+
+def test_timeout_yields_hosts_then_raises(fake_nmap):
+    fake_nmap("nmap_timeout.xml", hang=30)
+    found = []
+    start = time.monotonic()
+    with pytest.raises(subprocess.TimeoutExpired):
+        for rec in stream_nmap(["scanme.bench.test", "www.bench.test"], timeout=1):
+            found.append(rec)
+    assert time.monotonic() - start < 10
+    assert found == by_host(whole_document("nmap_normal.xml"))["scanme.bench.test"]
+
+def test_normal_run(fake_nmap):
+    fake_nmap("nmap_normal.xml")
+    assert list(stream_nmap(["scanme.bench.test"])) == whole_document("nmap_normal.xml")
+
+# ================= SHARDS =================
+
+HOSTS = ["scanme.bench.test", "www.bench.test", "mail.bench.test"]
+
+def calls(tmp_path):
+    return [line.split() for line in (tmp_path / "calls").read_text().splitlines()]
+
+def test_sharded_splits_rate_as_int(fake_nmap, tmp_path):
+    fake_nmap("nmap_normal.xml")
+    results = nmapxml.run_sharded(HOSTS, shard_size=1, workers=2, max_rate=13)
+    expected = by_host(whole_document("nmap_normal.xml"))
+    assert results == {h: {"ports": expected[h]} for h in HOSTS}
+    runs = calls(tmp_path)
+    assert len(runs) == 3
+    assert all(args[args.index("--max-rate") + 1] == "6" for args in runs)
+
+def test_batcher_fills_one_shard(fake_nmap, tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    fake_nmap("nmap_normal.xml")
+    batcher = nmapxml.ShardBatcher(shard_size=3, workers=1, max_rate=100.0, linger=30)
+    try:
+        with ThreadPoolExecutor(3) as pool:
+            results = dict(zip(HOSTS, pool.map(batcher.scan, HOSTS)))
+    finally:
+        batcher.close()
+    expected = by_host(whole_document("nmap_normal.xml"))
+    assert results == {h: {"ports": expected[h]} for h in HOSTS}
+    (run,) = calls(tmp_path)
+    assert run[-3:] == HOSTS and run[run.index("--max-rate") + 1] == "100"
+
+def test_batcher_flushes_after_linger(fake_nmap, tmp_path):
+    fake_nmap("nmap_normal.xml")
+    batcher = nmapxml.ShardBatcher(shard_size=16, workers=1, linger=0.2)
+    try:
+        start = time.monotonic()
+        assert batcher.scan("www.bench.test")["ports"][0]["service"] == "ftp"
+        assert time.monotonic() - start < 5
+    finally:
+        batcher.close()
+    assert len(calls(tmp_path)) == 1
+
+def test_pipeline_nmap_shards(standins):
+    # the stand-ins' nmap answers four open ports for every host it is given
+    from pipeline import Pipeline
+
+    batcher = nmapxml.ShardBatcher(shard_size=4, workers=1, linger=0.2)
+    try:
+        targets = standins.targets(2)
+        results = Pipeline("3", nmap_shards=batcher).run(targets)
+    finally:
+        batcher.close()
+    for t in targets:
+        assert [p["port"] for p in results[t]["Nmap"]["ports"]] == [22, 80, 443, 8080]
@@ -0,0 +1,42 @@
+import threading
+
+from pipeline import Pipeline
+
+class BrokenSink:
+    # fails on every HTTP stage result and on every finished target
+    def __init__(self):
+        self.stages = []
+
+    def stage(self, target, section, data):
+        if section == "HTTP":
+            raise OSError("No space left on device")
+        self.stages.append((target, section))
+
+    def target(self, target, data):
+        raise OSError("No space left on device")
+
+def test_failing_sink_does_not_hang(standins):
+    targets = standins.targets(3)
+    sink = BrokenSink()
+    pipe = Pipeline("1", sink=sink)
+    done = {}
+    runner = threading.Thread(target=lambda: done.update(pipe.run(targets)), daemon=True)
+    runner.start()
+    runner.join(60)
+    assert not runner.is_alive(), "run() is waiting on a target a dead worker dropped"
+    assert set(done) == set(targets)
+    assert all(done[t]["HTTP"]["status"] == 200 for t in targets)
+    assert {(t, "TLS") for t in targets} <= set(sink.stages)
+    assert pipe.stats()["HTTP"]["errors"] == len(targets)
+
+def test_risk_scored_in_pipeline(standins, monkeypatch):
+    import pipeline
+    batches = []
+    real = pipeline.score_batch
+    monkeypatch.setattr(pipeline, "score_batch", lambda data, **kw: batches.append(len(data)) or real(data, **kw))
+    targets = standins.targets(5)
+    results = Pipeline("1").run(targets)
+    assert sum(batches) == len(targets)
+    for t in targets:
+        risk = results[t]["Risk"]
+        assert {"score", "high", "medium", "low", "findings"} <= set(risk)
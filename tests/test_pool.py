@@ -0,0 +1,40 @@
+from pool import HostPool
+from reporter import TIMEOUT, fetch, tls_info, target_host
+from standins import EXISTING, ZONE
+
+def test_fetch_status_and_headers(standins):
+    target = standins.targets(1)[0]
+    with HostPool() as pool:
+        r = fetch(target, session=pool)
+    assert r["status"] == 200
+    assert r["headers"]["Server"].endswith("bench")
+    assert r["headers"]["Content-Type"] == "text/html"
+
+def test_keep_alive_reuse(standins):
+    base = standins.targets(1)[0]
+    with HostPool() as pool:
+        statuses = {p: pool.get(base + p, timeout=TIMEOUT).status_code for p in list(EXISTING) + ["/missing"]}
+        stats = pool.snapshot()
+    assert statuses == dict(EXISTING, **{"/missing": 404})
+    assert stats["requests"] == len(statuses)
+    assert stats["connections"] == 1
+    assert stats["reused"] == len(statuses) - 1
+
+def test_connections_per_host(standins):
+    # each host name keeps its own socket, reused across rounds
+    bases = standins.targets(3)
+    with HostPool() as pool:
+        for _ in range(3):
+            for b in bases:
+                pool.get(b, timeout=TIMEOUT)
+        stats = pool.snapshot()
+    assert stats["requests"] == 9
+    assert stats["connections"] == 3
+    assert stats["reuse_ratio"] == round(6 / 9, 3)
+
+def test_tls_fields(standins):
+    tls = tls_info(target_host(standins.targets(1)[0]))
+    assert "error" not in tls, tls
+    assert tls["valid_from"] and tls["valid_to"]
+    assert tls["issuer"]
+    assert f"*.{ZONE}" in tls["san"]
@@ -0,0 +1,46 @@
+from ratelimit import BACKOFF, MIN_RATE, RateLimiter
+
+def test_backoff_stays_under_low_ceiling():
+    limiter = RateLimiter(max_rate=0.2)
+    h = limiter.host("slow.example")
+    assert h.rate == 0.2
+    h.last_backoff = -10.0
+    h.release("throttled", hold=False)
+    assert h.rate == 0.2
+
+def test_backoff_floor():
+    h = RateLimiter().host("busy.example")
+    for _ in range(20):
+        h.last_backoff = -10.0
+        h.release("timeout", hold=False)
+    assert h.rate == MIN_RATE
+
+def shared_address(monkeypatch, names):
+    import hostindex
+    index = hostindex.HostIndex()
+    monkeypatch.setattr(hostindex, "_default", index)
+    for name in names:
+        index.observe(name, {"A": ["192.0.2.10"]})
+
+def test_names_on_one_address_keep_their_own_budget(monkeypatch):
+    names = [f"vhost{i}.example" for i in range(8)]
+    shared_address(monkeypatch, names)
+    limiter = RateLimiter(concurrency=1, max_concurrency=1)
+    hosts = [limiter.host(n) for n in names]
+    # one call in flight per name, all at once: none waits on another name
+    assert all(h.try_acquire() == 0 for h in hosts)
+    hosts[0].release("throttled")
+    assert hosts[1].rate == hosts[0].rate / BACKOFF
+
+def test_per_address_cap_is_opt_in(monkeypatch):
+    names = ["a.example", "b.example", "c.example"]
+    shared_address(monkeypatch, names)
+    limiter = RateLimiter(max_per_address=2)
+    held = [limiter.slot(n) for n in names[:2]]
+    for s in held:
+        s.__enter__()
+    cap = limiter.address(names[2])
+    assert cap is limiter.address(names[0]) and not cap.try_acquire()
+    held[0].__exit__(None, None, None)
+    assert cap.try_acquire()
+    assert RateLimiter().address(names[0]) is None
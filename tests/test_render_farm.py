@@ -0,0 +1,15 @@
+import os
+
+from render_farm import START_METHOD, RenderFarm
+
+def test_renders_in_clean_processes(tmp_path):
+    data = {"HTTP": {"status": 200, "headers": {"Server": "bench"}},
+            "TLS": {"valid_to": "2027-01-01T00:00:00+00:00", "san": ["a.test"]},
+            "Nmap": {"ports": [{"port": 22, "protocol": "tcp", "state": "open", "service": "ssh"}]}}
+    with RenderFarm(workers=2, directory=str(tmp_path)) as farm:
+        assert farm.pool._mp_context.get_start_method() == START_METHOD != "fork"
+        files = farm.render_all({"a.test": data, "b.test": data})
+    assert set(files) == {"a.test", "b.test"}
+    for out in files.values():
+        assert os.path.getsize(out["pdf"]) > 0 and os.path.getsize(out["txt"]) > 0
+    assert files["a.test"]["summary"]["http_status"] == 200
@@ -0,0 +1,64 @@
+import datetime
+
+import pytest
+
+from riskscore import RuleTable, exposed, risk_of, score, score_batch
+
+NOW = datetime.datetime(2026, 3, 1, tzinfo=datetime.timezone.utc)
+HEADERS = {"Strict-Transport-Security": "max-age=1", "Content-Security-Policy": "default-src 'self'",
+           "X-Frame-Options": "DENY", "X-Content-Type-Options": "nosniff"}
+
+def findings(data, **kw):
+    return sorted(score(data, detail=True, now=NOW, **kw)["findings"])
+
+@pytest.mark.parametrize("status", [200, 204])
+def test_missing_headers_on_success(status):
+    found = findings({"HTTP": {"status": status, "headers": {"Server": "x"}}})
+    assert [k for kind, k, _ in found if kind == "header"] == sorted(
+        ["strict-transport-security", "content-security-policy", "x-frame-options", "x-content-type-options"])
+    assert findings({"HTTP": {"status": status, "headers": HEADERS}}) == []
+
+@pytest.mark.parametrize("status", [301, 401, 404, 500])
+def test_headers_not_scored_off_success(status):
+    assert findings({"HTTP": {"status": status, "headers": {}}}) == []
+    assert findings({"HTTP": {"error": "timed out"}}) == []
+
+def test_ports_paths_certs():
+    data = {
+        "Nmap": {"ports": [
+            {"port": 3389, "protocol": "tcp", "state": "open", "service": "ms-wbt-server"},
+            {"port": 2222, "protocol": "tcp", "state": "open", "service": "telnet"},
+            {"port": 8081, "protocol": "tcp", "state": "open", "service": "http"},
+            {"port": 25, "protocol": "tcp", "state": "closed", "service": "smtp"}]},
+        "Directories": {"/.git": 403, "/admin": 404, "/api": 200, "/x": "error"},
+        "TLS": {"valid_to": "Mar 10 00:00:00 2026 GMT"},
+    }
+    assert findings(data) == sorted([
+        ("port", 3389, "high"), ("port", 2222, "medium"), ("port", 8081, "low"),
+        ("path", "/.git", "high"), ("path", "/api", "low"),
+        ("cert", "expires in 9 days", "medium")])
+    s = score(data, now=NOW)
+    assert (s["high"], s["medium"], s["low"], s["score"]) == (2, 2, 2, 2 * 10 + 2 * 5 + 2)
+
+def test_expired_cert_and_custom_rules():
+    assert findings({"TLS": {"valid_to": "2026-02-01T00:00:00+00:00"}}) == [("cert", "expired 28 days ago", "high")]
+    rules = RuleTable([("port", "8000-8100", "high"), ("path", "/api", "medium"), ("cert", 7, "low")],
+                      default_port="none")
+    data = {"Nmap": {"ports": [{"port": 8081, "protocol": "tcp", "state": "open"},
+                               {"port": 22, "protocol": "tcp", "state": "open"}]},
+            "Directories": {"/api": 200}, "HTTP": {"status": 200, "headers": {}}}
+    assert score(data, rules=rules, now=NOW) == {"high": 1, "medium": 1, "low": 0, "score": 15}
+
+def test_batch_matches_single():
+    results = {t: {"Nmap": {"ports": [{"port": p, "protocol": "tcp", "state": "open"}]},
+                   "HTTP": {"status": 200, "headers": {}}} for t, p in (("a", 80), ("b", 22), ("c", 9999))}
+    batch = score_batch(results, detail=True, now=NOW)
+    assert batch == {t: score(d, detail=True, now=NOW) for t, d in results.items()}
+
+def test_exposed_and_risk_of():
+    assert [s for s in (200, 302, 401, 403, 404, 500, "error", None) if exposed(s)] == [200, 302, 401, 403]
+    stored = {"high": 0, "medium": 0, "low": 0, "score": 0}
+    data = {"Directories": {"/.env": 200}, "Risk": stored}
+    assert risk_of(data) is stored
+    # a stored score without findings is recomputed when they are asked for
+    assert risk_of(data, detail=True)["findings"] == [("path", "/.env", "high")]
@@ -0,0 +1,52 @@
+from reporter import target_host, tls_info
+from tlsharvest import CertStore, Harvester, get_harvester
+from standins import ZONE
+
+def test_tls_info_goes_through_the_harvester(standins):
+    hosts = [target_host(t) for t in standins.targets(3)]
+    store = get_harvester().store
+    before = store.snapshot()
+    found = [tls_info(h) for h in hosts]
+    assert all("error" not in tls for tls in found), found
+    assert found[0]["issuer"] == {"commonName": ZONE}
+    assert found[0]["valid_to"].endswith("+00:00")
+    assert {tls["fingerprint"] for tls in found} == {found[0]["fingerprint"]}
+    # one wildcard certificate for every host: stored once
+    after = store.snapshot()
+    assert after["seen"] - before["seen"] == 3
+    assert after["unique"] == max(before["unique"], 1)
+
+def test_sessions_are_bounded(standins):
+    harvester = Harvester(sessions=2)
+    hosts = [target_host(t) for t in standins.targets(3)]
+    for h in hosts:
+        assert "error" not in harvester.handshake(h, standins.web_port)
+    assert list(harvester.sessions) == [(h, standins.web_port, h) for h in hosts[1:]]
+    assert all(error is None for _session, error in harvester.sessions.values())
+    # a hit moves to the back, so the next eviction takes the other one
+    harvester.handshake(hosts[1], standins.web_port)
+    harvester.handshake(hosts[0], standins.web_port)
+    assert [k[0] for k in harvester.sessions] == [hosts[1], hosts[0]]
+
+def test_validation_failures_reported(standins):
+    host = target_host(standins.targets(1)[0])
+    harvester = Harvester()
+    ok = harvester.handshake(host, standins.web_port)
+    assert ok["verified"] and "validation_error" not in ok
+    wrong = harvester.handshake(host, standins.web_port, sni="other.example")
+    assert not wrong["verified"] and "other.example" in wrong["validation_error"]
+    # the certificate is still read
+    assert harvester.report(wrong)["certificates"][0]["subject"] == {"commonName": ZONE}
+    # resumed without another verifying attempt, the failure carried over
+    again = harvester.handshake(host, standins.web_port, sni="other.example")
+    assert again["validation_error"] == wrong["validation_error"]
+
+def test_tls_info_verified(standins):
+    tls = tls_info(target_host(standins.targets(1)[0]))
+    assert tls["verified"] is True and "validation_error" not in tls
+
+def test_cert_store_bounded():
+    store = CertStore(size=2)
+    fps = [store.add(bytes([i]) * 8) for i in range(3)]
+    assert list(store.certs) == fps[1:]
+    assert "error" in store.describe(fps[0])
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+
+import ssl
+import socket
+import hashlib
+import datetime
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from reporter import TIMEOUT
+from dnsresolver import get_resolver
+import metrics
+
+WORKERS = 64
+DEFAULT_PORTS = (443, 8443)
+# TLS sessions kept for resumption, and parsed certificates, least recently
+# used dropped first.
+SESSION_CACHE = 4096
+
+# Ports that speak plaintext first and upgrade with STARTTLS.
+STARTTLS_PORTS = {25: "smtp", 587: "smtp", 143: "imap", 110: "pop3", 21: "ftp"}
+
+OIDS = {
+    "2.5.4.3": "commonName",
+    "2.5.4.6": "countryName",
+    "2.5.4.7": "localityName",
+    "2.5.4.8": "stateOrProvinceName",
+    "2.5.4.10": "organizationName",
+    "2.5.4.11": "organizationalUnitName",
+    "1.2.840.113549.1.9.1": "emailAddress",
+    "1.2.840.113549.1.1.1": "rsaEncryption",
+    "1.2.840.10045.2.1": "ecPublicKey",
+    "1.3.101.112": "ed25519",
+    "1.3.101.113": "ed448",
+    "1.2.840.113549.1.1.5": "sha1WithRSAEncryption",
+    "1.2.840.113549.1.1.11": "sha256WithRSAEncryption",
+    "1.2.840.113549.1.1.12": "sha384WithRSAEncryption",
+    "1.2.840.113549.1.1.13": "sha512WithRSAEncryption",
+    "1.2.840.113549.1.1.10": "rsassaPss",
+    "1.2.840.10045.4.3.2": "ecdsa-with-SHA256",
+    "1.2.840.10045.4.3.3": "ecdsa-with-SHA384",
+    "1.2.840.10045.4.3.4": "ecdsa-with-SHA512",
+    "1.2.840.10045.3.1.7": "prime256v1",
+    "1.3.132.0.34": "secp384r1",
+    "1.3.132.0.35": "secp521r1",
+}
+CURVE_BITS = {"prime256v1": 256, "secp384r1": 384, "secp521r1": 521}
+SAN_OID = "2.5.29.17"
+
+# ================= DER =================
+
+def _tlv(buf, off):
+    tag = buf[off]
+    n = buf[off + 1]
+    off += 2
+    if n & 0x80:
+        size = n & 0x7F
+        n = int.from_bytes(buf[off:off + size], "big")
+        off += size
+    return tag, off, off + n
+
+def _children(buf, start, end):
+    while start < end:
+        tag, s, e = _tlv(buf, start)
+        yield tag, s, e
+        start = e
+
+def _oid(raw):
+    parts = [raw[0] // 40, raw[0] % 40]
+    val = 0
+    for b in raw[1:]:
+        val = (val << 7) | (b & 0x7F)
+        if not b & 0x80:
+            parts.append(val)
+            val = 0
+    return ".".join(map(str, parts))
+
+def _name(buf, s, e):
+    out = {}
+    for _t, rs, re_ in _children(buf, s, e):          # SET
+        for _t2, as_, ae in _children(buf, rs, re_):  # SEQ {oid, value}
+            (_, os_, oe), (_, vs, ve) = list(_children(buf, as_, ae))[:2]
+            oid = _oid(buf[os_:oe])
+            out[OIDS.get(oid, oid)] = buf[vs:ve].decode("utf-8", "replace")
+    return out
+
+def _time(buf, tag, s, e):
+    text = buf[s:e].decode()
+    fmt = "%y%m%d%H%M%SZ" if tag == 0x17 else "%Y%m%d%H%M%SZ"
+    return datetime.datetime.strptime(text, fmt).replace(tzinfo=datetime.timezone.utc).isoformat()
+
+def parse_der(der):
+    # Enough of X.509 for reporting: names, validity, SANs, key and signature.
+    _, cs, ce = _tlv(der, 0)
+    tbs, sig_alg, _sig = list(_children(der, cs, ce))[:3]
+    fields = list(_children(der, tbs[1], tbs[2]))
+    if fields[0][0] == 0xA0:  # explicit version
+        fields = fields[1:]
+    serial, _alg, issuer, validity, subject, spki = fields[:6]
+
+    not_before, not_after = list(_children(der, validity[1], validity[2]))[:2]
+    alg_seq, key_bits = list(_children(der, spki[1], spki[2]))[:2]
+    alg_parts = list(_children(der, alg_seq[1], alg_seq[2]))
+    key_alg = OIDS.get(_oid(der[alg_parts[0][1]:alg_parts[0][2]]), "unknown")
+    key_size = None
+    if key_alg == "rsaEncryption":
+        _, ms, _me = _tlv(der, key_bits[1] + 1)          # skip unused-bits byte
+        _, ns, ne = _tlv(der, ms)
+        key_size = int.from_bytes(der[ns:ne], "big").bit_length()
+    elif key_alg == "ecPublicKey" and len(alg_parts) > 1:
+        curve = OIDS.get(_oid(der[alg_parts[1][1]:alg_parts[1][2]]))
+        key_alg = f"ec/{curve}"
+        key_size = CURVE_BITS.get(curve)
+    elif key_alg in ("ed25519", "ed448"):
+        key_size = 256 if key_alg == "ed25519" else 456
+
+    san = []
+    for tag, s, e in fields[6:]:
+        if tag != 0xA3:
+            continue
+        _, xs, xe = _tlv(der, s)
+        for _t, es, ee in _children(der, xs, xe):
+            parts = list(_children(der, es, ee))
+            if _oid(der[parts[0][1]:parts[0][2]]) != SAN_OID:
+                continue
+            _, ss, se = _tlv(der, parts[-1][1])
+            for gtag, gs, ge in _children(der, ss, se):
+                if gtag == 0x82:
+                    san.append(("DNS", der[gs:ge].decode("ascii", "replace")))
+                elif gtag == 0x87:
+                    fam = socket.AF_INET if ge - gs == 4 else socket.AF_INET6
+                    san.append(("IP Address", socket.inet_ntop(fam, der[gs:ge])))
+
+    sig_oid = list(_children(der, sig_alg[1], sig_alg[2]))[0]
+    return {
+        "subject": _name(der, subject[1], subject[2]),
+        "issuer": _name(der, issuer[1], issuer[2]),
+        "serial": der[serial[1]:serial[2]].hex(),
+        "valid_from": _time(der, *not_before),
+        "valid_to": _time(der, *not_after),
+        "san": san,
+        "key": {"algorithm": key_alg, "bits": key_size},
+        "signature": OIDS.get(_oid(der[sig_oid[1]:sig_oid[2]]), "unknown"),
+    }
+
+# ================= STORE =================
+
+class CertRecord:
+    __slots__ = ("der", "fingerprint", "_parsed")
+
+    def __init__(self, der, fingerprint):
+        self.der = der
+        self.fingerprint = fingerprint
+        self._parsed = None
+
+    @property
+    def parsed(self):
+        # parsed on first use only; most certs in a large run are never read
+        if self._parsed is None:
+            try:
+                self._parsed = parse_der(self.der)
+            except Exception as e:
+                self._parsed = {"error": f"unparsable certificate: {e}"}
+        return self._parsed
+
+class CertStore:
+    # Certificates keyed by SHA-256 of the DER, so a wildcard served by
+    # hundreds of hosts is kept and parsed once.
+    def __init__(self, size=SESSION_CACHE):
+        self.lock = threading.Lock()
+        self.size = size
+        self.certs = OrderedDict()
+        self.seen = 0
+
+    def add(self, der):
+        fp = hashlib.sha256(der).hexdigest()
+        with self.lock:
+            self.seen += 1
+            if fp not in self.certs:
+                self.certs[fp] = CertRecord(der, fp)
+            self.certs.move_to_end(fp)
+            while len(self.certs) > self.size:
+                self.certs.popitem(last=False)
+        return fp
+
+    def describe(self, fp):
+        with self.lock:
+            record = self.certs.get(fp)
+        if record is None:
+            return {"error": "certificate dropped from the store", "fingerprint": fp}
+        return dict(record.parsed, fingerprint=fp)
+
+    def snapshot(self):
+        with self.lock:
+            return {"seen": self.seen, "unique": len(self.certs)}
+
+# ================= HANDSHAKES =================
+
+def _expect(f, prefix):
+    while True:
+        line = f.readline()
+        if not line:
+            raise ConnectionError("connection closed during STARTTLS")
+        if not prefix or line.startswith(prefix):
+            # multi-line SMTP replies use "250-"; wait for "250 "
+            if prefix and line[len(prefix):len(prefix) + 1] == b"-":
+                continue
+            return line
+
+def _starttls(sock, mode):
+    f = sock.makefile("rb")
+    try:
+        if mode == "smtp":
+            _expect(f, b"220")
+            sock.sendall(b"EHLO blacktrace.local\r\n")
+            _expect(f, b"250")
+            sock.sendall(b"STARTTLS\r\n")
+            _expect(f, b"220")
+        elif mode == "imap":
+            _expect(f, b"* OK")
+            sock.sendall(b"a1 STARTTLS\r\n")
+            _expect(f, b"a1 OK")
+        elif mode == "pop3":
+            _expect(f, b"+OK")
+            sock.sendall(b"STLS\r\n")
+            _expect(f, b"+OK")
+        elif mode == "ftp":
+            _expect(f, b"220")
+            sock.sendall(b"AUTH TLS\r\n")
+            _expect(f, b"234")
+    finally:
+        f.close()
+
+def _der_chain(ssock):
+    # the chain as the peer sent it (Python 3.13+), else the leaf alone
+    chain = ssock.get_unverified_chain() if hasattr(ssock, "get_unverified_chain") else None
+    return list(chain) if chain else [ssock.getpeercert(binary_form=True)]
+
+class Harvester:
+    # Each handshake verifies chain and hostname first; one that fails is
+    # redone without verification, so expired, self-signed and mismatched
+    # certificates are still read and reported, with why they failed.
+    def __init__(self, store=None, timeout=TIMEOUT, sessions=SESSION_CACHE):
+        self.store = store or CertStore(sessions)
+        self.timeout = timeout
+        self.verify_ctx = ssl.create_default_context()
+        self.ctx = ssl.create_default_context()
+        self.ctx.check_hostname = False
+        self.ctx.verify_mode = ssl.CERT_NONE
+        self.max_sessions = sessions
+        self.sessions = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _session(self, key):
+        # (session, validation error or None); a session only resumes on the
+        # context it came from, which the error says
+        with self.lock:
+            cached = self.sessions.get(key)
+            if cached is not None:
+                self.sessions.move_to_end(key)
+            return cached or (None, None)
+
+    def _keep_session(self, key, session, error):
+        with self.lock:
+            self.sessions[key] = (session, error)
+            self.sessions.move_to_end(key)
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+
+    def _connect(self, host, port, mode, sni, ctx, session, timeout):
+        metrics.add("connections")
+        address = get_resolver().address(host)
+        with socket.create_connection((address, port), timeout=timeout or self.timeout) as sock:
+            if mode != "tls":
+                _starttls(sock, mode)
+            with ctx.wrap_socket(sock, server_hostname=sni, session=session) as ssock:
+                return {
+                    "protocol": ssock.version(),
+                    "cipher": ssock.cipher()[0],
+                    "resumed": ssock.session_reused,
+                    "chain": [self.store.add(d) for d in _der_chain(ssock)],
+                }, ssock.session
+
+    def handshake(self, host, port=443, mode=None, sni=None, timeout=None):
+        mode = mode or STARTTLS_PORTS.get(port, "tls")
+        sni = sni or host
+        key = (host, port, sni)
+        try:
+            session, error = self._session(key)
+            found = None
+            if error is None:
+                try:
+                    found, session = self._connect(host, port, mode, sni, self.verify_ctx, session, timeout)
+                except ssl.SSLCertVerificationError as e:
+                    error, session = e.verify_message or str(e), None
+            if found is None:
+                # known to fail verification: straight to the unverified read
+                found, session = self._connect(host, port, mode, sni, self.ctx, session, timeout)
+            self._keep_session(key, session, error)
+            result = dict(host=host, port=port, mode=mode, sni=sni, verified=error is None, **found)
+            if error:
+                result["validation_error"] = error
+            return result
+        except Exception as e:
+            return {"host": host, "port": port, "mode": mode, "sni": sni, "error": str(e)}
+
+    def harvest(self, endpoints, workers=WORKERS):
+        # endpoints: iterable of host, (host, port) or (host, port, mode)
+        jobs = []
+        for ep in endpoints:
+            if isinstance(ep, str):
+                jobs.extend((ep, p, None) for p in DEFAULT_PORTS)
+            else:
+                jobs.append((ep[0], ep[1], ep[2] if len(ep) > 2 else None))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(lambda j: self.handshake(*j), jobs))
+
+    def report(self, result):
+        # Expand an endpoint result with the parsed chain, tls_info-style.
+        if "error" in result:
+            return result
+        chain = [self.store.describe(fp) for fp in result["chain"]]
+        leaf = chain[0]
+        return dict(result, issuer=leaf.get("issuer"), valid_from=leaf.get("valid_from"),
+                    valid_to=leaf.get("valid_to"), certificates=chain)
+
+_default = None
+_default_lock = threading.Lock()
+
+def get_harvester():
+    # shared by the TLS stage, so sessions and parsed certificates carry over
+    # between targets
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = Harvester()
+        return _default